@@ -0,0 +1,103 @@
+"""
+Cold-start benchmark: time for a fresh process to get every agent prompt ready.
+
+Each sample runs in a new interpreter, once reading the training directories
+and once from a corpus snapshot built for the run:
+
+    python -m benchmarks.cold_start --repeats 5
+    python -m benchmarks.cold_start --compress --json
+
+The OS page cache is not dropped between runs, so the directory numbers are
+a lower bound of what a serverless cold start pays on a fresh filesystem.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+
+def _child(snapshot_path: str = None) -> dict:
+    start = time.perf_counter()
+    from ia_generator.constants.agents import AGENTS
+    from ia_generator.utils.corpus_snapshot import load_corpus_snapshot
+    from ia_generator.utils.utils import build_prompt_prefix
+    imported = time.perf_counter()
+
+    if snapshot_path and load_corpus_snapshot(snapshot_path) is None:
+        raise SystemExit(f"Snapshot {snapshot_path} could not be loaded")
+    prefix_bytes = sum(len(build_prompt_prefix(spec.prompt, spec.training_path)) for spec in AGENTS.values())
+    ready = time.perf_counter()
+    return {"import_seconds": imported - start, "load_seconds": ready - imported, "prefix_bytes": prefix_bytes}
+
+
+def measure(snapshot_path: str = None) -> dict:
+    """
+    Start a new interpreter that loads every corpus and return its timings.
+
+    `process_seconds` also covers interpreter startup.
+    """
+    command = [sys.executable, "-m", "benchmarks.cold_start", "--child"]
+    if snapshot_path:
+        command += ["--snapshot", snapshot_path]
+    start = time.perf_counter()
+    output = subprocess.run(command, cwd=BACKEND_DIR, capture_output=True, text=True, check=True).stdout
+    result = json.loads(output)
+    result["process_seconds"] = time.perf_counter() - start
+    return result
+
+
+def run_cold_start(repeats: int = 5, compress: bool = False) -> dict:
+    """
+    Median timings of `repeats` cold starts from the directories and from a snapshot.
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        from ia_generator.utils.corpus_snapshot import build_snapshot
+
+        snapshot_path = os.path.join(tmp, "corpus.snapshot")
+        build_snapshot(snapshot_path, compress=compress)
+        report = {"snapshot_bytes": os.path.getsize(snapshot_path), "compressed": compress}
+        for mode, path in (("directories", None), ("snapshot", snapshot_path)):
+            samples = [measure(path) for _ in range(repeats)]
+            report[mode] = {
+                key: statistics.median(sample[key] for sample in samples)
+                for key in ("import_seconds", "load_seconds", "process_seconds")
+            }
+            report[mode]["prefix_bytes"] = samples[0]["prefix_bytes"]
+    return report
+
+
+def print_report(report: dict) -> None:
+    print(f"Snapshot: {report['snapshot_bytes']} bytes{' (zlib)' if report['compressed'] else ''}")
+    print(f"{'source':<12} {'load ms':>9} {'import ms':>10} {'process ms':>11}")
+    for mode in ("directories", "snapshot"):
+        row = report[mode]
+        print(f"{mode:<12} {row['load_seconds'] * 1000:>9.1f} {row['import_seconds'] * 1000:>10.1f} {row['process_seconds'] * 1000:>11.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare cold starts from training directories and from a corpus snapshot.")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--compress", action="store_true", help="benchmark a zlib-compressed snapshot")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--snapshot", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(_child(args.snapshot)))
+        return
+    report = run_cold_start(args.repeats, args.compress)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+"""
+Local stand-in for the OpenAI chat completions endpoint.
+
+Used by the test suite and the load-testing harness; it can also run on its own:
+
+    python -m benchmarks.fake_llm_server --port 8099 --latency 0.8 --tokens-per-second 60
+"""
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class FakeLLMServer:
+    """
+    Minimal chat completions server with configurable latency and streaming rate.
+
+    `delay` is the time to first byte, `tokens_per_second` paces streamed
+    fragments (unpaced when 0), and every request body is kept in `requests`.
+    Faults are injected with `fail_next()` or, at random, with `error_rate`;
+    `answer_next()` queues different answers for the next requests.
+    Subclasses can choose the delay and answer per request body by
+    overriding `delay_for()` and `answer_for()`.
+    Every prompt is billed as 10 tokens; like upstream prompt caching, 8 of
+    them are reported as cached when its system message was seen before.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, delay: float = 0.0, tokens_per_second: float = 0.0, answer: str = "Stub answer", error_rate: float = 0.0):
+        self.delay = delay
+        self.tokens_per_second = tokens_per_second
+        self.answer = answer
+        self.error_rate = error_rate
+        self.faults = []
+        self.queued_answers = []
+        self.requests = []
+        self.connections = 0
+        self._prefixes = set()
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self.url = f"http://{host}:{self._server.server_address[1]}/v1"
+
+    def fail_next(self, count: int = 1, status: int = 500, retry_after: float = None) -> None:
+        """
+        Answer the next `count` requests with `status`, optionally with a Retry-After header.
+        """
+        with self._lock:
+            self.faults.extend([(status, retry_after)] * count)
+
+    def answer_next(self, *answers: str) -> None:
+        """
+        Answer the next requests with `answers`, in order, before falling back to `answer`.
+        """
+        with self._lock:
+            self.queued_answers.extend(answers)
+
+    def _next_answer(self) -> str:
+        with self._lock:
+            return self.queued_answers.pop(0) if self.queued_answers else self.answer
+
+    def delay_for(self, body: dict) -> float:
+        return self.delay
+
+    def answer_for(self, body: dict) -> str:
+        return self._next_answer()
+
+    def _next_fault(self):
+        with self._lock:
+            if self.faults:
+                return self.faults.pop(0)
+        if self.error_rate and random.random() < self.error_rate:
+            return 500, None
+        return None
+
+    def _usage(self, body: dict, completion_tokens: int) -> dict:
+        usage = {"prompt_tokens": 10, "completion_tokens": completion_tokens, "total_tokens": 10 + completion_tokens}
+        messages = body.get("messages") or []
+        if messages and messages[0].get("role") == "system":
+            with self._lock:
+                seen = messages[0]["content"] in self._prefixes
+                self._prefixes.add(messages[0]["content"])
+            usage["prompt_tokens_details"] = {"cached_tokens": 8 if seen else 0}
+        return usage
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def setup(self):
+                super().setup()
+                with stub._lock:
+                    stub.connections += 1
+
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                with stub._lock:
+                    stub.requests.append(body)
+                time.sleep(stub.delay_for(body))
+                fault = stub._next_fault()
+                if fault is not None:
+                    self._error(*fault)
+                    return
+                answer = stub.answer_for(body)
+                if body.get("stream"):
+                    self._stream(body, answer)
+                    return
+                payload = json.dumps({
+                    "id": "chatcmpl-stub",
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": body["model"],
+                    "choices": [{
+                        "index": 0,
+                        "message": {"role": "assistant", "content": answer},
+                        "finish_reason": "stop",
+                    }],
+                    "usage": stub._usage(body, 2),
+                }).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def _error(self, status, retry_after):
+                payload = json.dumps({
+                    "error": {"message": f"Injected fault {status}", "type": "server_error", "code": None},
+                }).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                if retry_after is not None:
+                    self.send_header("Retry-After", str(retry_after))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def _stream(self, body, answer):
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                chunks = [
+                    {"choices": [{"index": 0, "delta": {"content": piece}, "finish_reason": None}]}
+                    for piece in re.findall(r"\S+\s*", answer)
+                ]
+                chunks.append({
+                    "choices": [],
+                    "usage": stub._usage(body, len(chunks)),
+                })
+                interval = 1.0 / stub.tokens_per_second if stub.tokens_per_second else 0.0
+                for chunk in chunks:
+                    chunk.update({"id": "chatcmpl-stub", "object": "chat.completion.chunk", "created": 0, "model": body["model"]})
+                    self._write_chunk(f"data: {json.dumps(chunk)}\n\n")
+                    if interval:
+                        time.sleep(interval)
+                self._write_chunk("data: [DONE]\n\n")
+                self.wfile.write(b"0\r\n\r\n")
+
+            def _write_chunk(self, text):
+                data = text.encode("utf-8")
+                self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+                self.wfile.flush()
+
+        return Handler
+
+    def start(self):
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve a fake OpenAI chat completions API.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds before the first byte")
+    parser.add_argument("--tokens-per-second", type=float, default=0.0, help="streaming rate, 0 for unpaced")
+    parser.add_argument("--answer", default="Stub answer")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with 500")
+    args = parser.parse_args()
+
+    server = FakeLLMServer(args.host, args.port, args.latency, args.tokens_per_second, args.answer, args.error_rate)
+    print(f"Fake LLM listening on {server.url}")
+    try:
+        server._server.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
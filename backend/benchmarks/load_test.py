@@ -0,0 +1,276 @@
+"""
+Load-testing harness for the generator API.
+
+Boots the real `create_app()` stack in-process against `FakeLLMServer`, drives
+every agent route plus `/audit_smartcontract` at a fixed concurrency and
+reports latency percentiles, throughput, response bytes (decoded and on the
+wire) and resident memory:
+
+    python -m benchmarks.load_test --concurrency 8 --requests 20 --latency 0.5
+    python -m benchmarks.load_test --stream --tokens-per-second 80 --json
+    python -m benchmarks.load_test --answer-bytes 40000 --no-echo --compare-compression
+
+With `--url` an already running deployment is driven instead (memory is then
+not reported, and upstream latency is whatever that deployment talks to).
+"""
+import argparse
+import json
+import math
+import os
+import resource
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from benchmarks.fake_llm_server import FakeLLMServer
+from ia_generator.constants.agents import AGENTS
+
+ROUTES = [*AGENTS, "audit_smartcontract"]
+SAMPLE_ANSWER = "fn handle() { let state = State::default(); state.counter += 1; }"
+
+
+def rss_bytes() -> int:
+    """
+    Current resident set size of this process (peak RSS where /proc is unavailable).
+    """
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def percentile(samples: list, fraction: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, math.ceil(fraction * len(ordered)) - 1))
+    return ordered[index]
+
+
+def summarize(latencies: list, errors: int, elapsed: float, body_bytes: int = 0, wire_bytes: int = 0) -> dict:
+    return {
+        "requests": len(latencies) + errors,
+        "errors": errors,
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p95_ms": percentile(latencies, 0.95) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "rps": (len(latencies) + errors) / elapsed if elapsed else 0.0,
+        "body_bytes": body_bytes,
+        "wire_bytes": wire_bytes,
+        "bytes_saved": body_bytes - wire_bytes,
+    }
+
+
+def sample_answer(size: int = 0) -> str:
+    """
+    The fake upstream answer, repeated up to about `size` characters (0 keeps it short).
+    """
+    if size <= len(SAMPLE_ANSWER):
+        return SAMPLE_ANSWER
+    return "\n".join(SAMPLE_ANSWER for _ in range(size // (len(SAMPLE_ANSWER) + 1)))
+
+
+def start_app(config_name: str):
+    """
+    Serve `create_app(config_name)` on a free local port; returns `(server, base_url, boot_seconds)`.
+    """
+    from werkzeug.serving import WSGIRequestHandler, make_server
+    from index import create_app
+
+    class QuietHandler(WSGIRequestHandler):
+        def log_request(self, *args, **kwargs):
+            pass
+
+    start = time.perf_counter()
+    app = create_app(config_name)
+    boot_seconds = time.perf_counter() - start
+
+    server = make_server("127.0.0.1", 0, app, threaded=True, request_handler=QuietHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}", boot_seconds
+
+
+def run_load(base_url: str, routes: list, requests_per_route: int, concurrency: int, stream: bool, unique_questions: bool, compression: bool = True, echo_question: bool = True) -> dict:
+    """
+    Send `requests_per_route` POSTs to each route, interleaved, from `concurrency` threads.
+
+    `body_bytes` counts decoded response bodies and `wire_bytes` what was
+    transferred, so their difference is what compression saved. Without
+    `compression` the client asks for uncompressed responses.
+    """
+    plan = [(route, i) for i in range(requests_per_route) for route in routes]
+    results = {route: {"latencies": [], "errors": 0, "body_bytes": 0, "wire_bytes": 0} for route in routes}
+    headers = {} if compression else {"Accept-Encoding": "identity"}
+    body = {} if echo_question else {"echo_question": False}
+    lock = threading.Lock()
+    local = threading.local()
+
+    def send(route: str, i: int) -> None:
+        session = getattr(local, "session", None)
+        if session is None:
+            session = local.session = requests.Session()
+        question = f"Benchmark question {i}" if unique_questions else "Benchmark question"
+        url = f"{base_url}/ia-generator/{route}" + ("?stream=1" if stream else "")
+        start = time.perf_counter()
+        try:
+            response = session.post(url, json={**body, "question": question}, headers=headers, timeout=300)
+            body_bytes = len(response.content)
+            wire_bytes = int(response.headers.get("Content-Length", body_bytes))
+            ok = response.status_code == 200
+        except requests.RequestException:
+            ok = False
+        elapsed = time.perf_counter() - start
+        with lock:
+            if ok:
+                results[route]["latencies"].append(elapsed)
+                results[route]["body_bytes"] += body_bytes
+                results[route]["wire_bytes"] += wire_bytes
+            else:
+                results[route]["errors"] += 1
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(lambda item: send(*item), plan))
+    elapsed = time.perf_counter() - start
+
+    all_latencies = [latency for result in results.values() for latency in result["latencies"]]
+    return {
+        "routes": {
+            route: summarize(result["latencies"], result["errors"], elapsed, result["body_bytes"], result["wire_bytes"])
+            for route, result in results.items()
+        },
+        "total": summarize(
+            all_latencies,
+            sum(result["errors"] for result in results.values()),
+            elapsed,
+            sum(result["body_bytes"] for result in results.values()),
+            sum(result["wire_bytes"] for result in results.values()),
+        ),
+        "seconds": elapsed,
+    }
+
+
+def run_benchmark(concurrency: int = 4, requests_per_route: int = 10, latency: float = 0.0, tokens_per_second: float = 0.0, error_rate: float = 0.0, stream: bool = False, routes: list = None, unique_questions: bool = True, config_name: str = "benchmark", url: str = None, answer_bytes: int = 0, compression: bool = True, echo_question: bool = True) -> dict:
+    routes = routes or ROUTES
+    load = {"compression": compression, "echo_question": echo_question}
+    report = {
+        "concurrency": concurrency,
+        "requests_per_route": requests_per_route,
+        "stream": stream,
+        "upstream_latency_s": latency,
+        "tokens_per_second": tokens_per_second,
+        "upstream_error_rate": error_rate,
+        **load,
+    }
+
+    if url is not None:
+        report.update(run_load(url.rstrip("/"), routes, requests_per_route, concurrency, stream, unique_questions, **load))
+        return report
+
+    fake = FakeLLMServer(delay=latency, tokens_per_second=tokens_per_second, answer=sample_answer(answer_bytes), error_rate=error_rate)
+    fake.start()
+    os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+    os.environ["OPENAI_BASE_URL"] = fake.url
+
+    from ia_generator.services.llm_services import reset_openai_clients
+    reset_openai_clients()
+
+    rss_start = rss_bytes()
+    server, base_url, boot_seconds = start_app(config_name)
+    rss_booted = rss_bytes()
+    try:
+        report.update(run_load(base_url, routes, requests_per_route, concurrency, stream, unique_questions, **load))
+    finally:
+        server.shutdown()
+        fake.stop()
+
+    report.update({
+        "boot_seconds": boot_seconds,
+        "upstream_requests": len(fake.requests),
+        "rss_start_mb": rss_start / 2**20,
+        "rss_booted_mb": rss_booted / 2**20,
+        "rss_end_mb": rss_bytes() / 2**20,
+        "rss_peak_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    })
+    return report
+
+
+def print_report(report: dict) -> None:
+    print(f"{'route':<46} {'reqs':>5} {'err':>4} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'req/s':>8} {'KiB':>9} {'wire KiB':>9}")
+    rows = list(report["routes"].items()) + [("TOTAL", report["total"])]
+    for route, row in rows:
+        print(
+            f"{route:<46} {row['requests']:>5} {row['errors']:>4} "
+            f"{row['p50_ms']:>9.1f} {row['p95_ms']:>9.1f} {row['p99_ms']:>9.1f} {row['rps']:>8.1f} "
+            f"{row['body_bytes'] / 1024:>9.1f} {row['wire_bytes'] / 1024:>9.1f}"
+        )
+    if "rss_end_mb" in report:
+        print(
+            f"\nboot {report['boot_seconds'] * 1000:.0f} ms, upstream calls {report['upstream_requests']}, "
+            f"RSS {report['rss_start_mb']:.1f} -> {report['rss_booted_mb']:.1f} (booted) -> "
+            f"{report['rss_end_mb']:.1f} MB (peak {report['rss_peak_mb']:.1f} MB)"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the generator API against a fake LLM backend.")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--requests", type=int, default=10, help="requests per route")
+    parser.add_argument("--latency", type=float, default=0.0, help="fake upstream time to first byte, seconds")
+    parser.add_argument("--tokens-per-second", type=float, default=0.0, help="fake streaming rate, 0 for unpaced")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of fake upstream calls failing with 500")
+    parser.add_argument("--stream", action="store_true", help="request SSE responses")
+    parser.add_argument("--routes", help="comma-separated subset of routes")
+    parser.add_argument("--repeat-questions", action="store_true", help="reuse one question per route to exercise the caches")
+    parser.add_argument("--config", default="benchmark", help="config name passed to create_app()")
+    parser.add_argument("--url", help="drive a running deployment instead of an in-process app")
+    parser.add_argument("--answer-bytes", type=int, default=0, help="approximate size of the fake upstream answer")
+    parser.add_argument("--no-compression", action="store_true", help="ask for uncompressed responses")
+    parser.add_argument("--no-echo", action="store_true", help="ask answers not to repeat the question")
+    parser.add_argument("--compare-compression", action="store_true", help="run with and without compression and report bytes saved")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args()
+
+    options = {
+        "concurrency": args.concurrency,
+        "requests_per_route": args.requests,
+        "latency": args.latency,
+        "tokens_per_second": args.tokens_per_second,
+        "error_rate": args.error_rate,
+        "stream": args.stream,
+        "routes": args.routes.split(",") if args.routes else None,
+        "unique_questions": not args.repeat_questions,
+        "config_name": args.config,
+        "url": args.url,
+        "answer_bytes": args.answer_bytes,
+        "echo_question": not args.no_echo,
+    }
+    if args.compare_compression:
+        reports = {
+            "identity": run_benchmark(**options, compression=False),
+            "compressed": run_benchmark(**options, compression=True),
+        }
+        if args.json:
+            print(json.dumps(reports, indent=2))
+            return
+        for name, report in reports.items():
+            print(f"== {name} ==")
+            print_report(report)
+            print()
+        identity, compressed = reports["identity"]["total"], reports["compressed"]["total"]
+        saved = identity["wire_bytes"] - compressed["wire_bytes"]
+        print(f"compression saved {saved / 1024:.1f} KiB ({saved / identity['wire_bytes'] * 100 if identity['wire_bytes'] else 0:.1f}% of the wire bytes)")
+        return
+
+    report = run_benchmark(**options, compression=not args.no_compression)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,333 @@
+"""
+Replay captured traffic to compare the latency and throughput of two builds.
+
+Reads a capture written with `TRAFFIC_CAPTURE_PATH` (see
+`ia_generator/utils/traffic_capture.py`), boots `create_app()` against a fake
+upstream that answers every call with the recorded answer after the recorded
+upstream latency, and re-sends the captured requests at their original pace,
+or `--speed` times faster (0 sends them as fast as `--concurrency` allows):
+
+    python -m benchmarks.replay capture.jsonl --output before.json
+    python -m benchmarks.replay capture.jsonl --compare before.json
+
+Reports latency percentiles and throughput per route next to the recorded
+ones. A request counts as an error when its status differs from the
+recorded one.
+"""
+import argparse
+import json
+import os
+import resource
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from benchmarks.fake_llm_server import FakeLLMServer
+from benchmarks.load_test import print_report, rss_bytes, start_app, summarize
+from ia_generator.utils.traffic_capture import read_capture
+
+COMPARED = ("p50_ms", "p95_ms", "p99_ms", "rps")
+
+
+def load_records(path: str, routes: list = None, limit: int = None) -> list:
+    """
+    Replayable records of the capture at `path` in arrival order, optionally only for `routes`.
+    """
+    records = [
+        record for record in read_capture(path)
+        if isinstance(record.get("request"), dict) and (not routes or record.get("route") in routes)
+    ]
+    records.sort(key=lambda record: record.get("ts", 0))
+    return records[:limit] if limit else records
+
+
+def recorded_calls(record: dict) -> list:
+    """
+    `(question, answer, upstream seconds)` of the questions of a record.
+
+    A batch spreads its upstream calls over its items; answers the response
+    does not hold (e.g. of a job) are None.
+    """
+    request, response = record["request"], record.get("response")
+    upstream = [ms / 1000 for ms in record.get("upstream_ms") or ()]
+    if record.get("route") == "batch":
+        items = [item for item in request.get("items") or () if isinstance(item, dict)]
+        results = {result.get("index"): result for result in (response or {}).get("results", ())}
+        return [
+            (item.get("question"), results.get(index, {}).get("answer"), upstream[index::len(items)])
+            for index, item in enumerate(items)
+        ]
+    answer = response.get("answer") if isinstance(response, dict) else None
+    return [(request.get("question"), answer, upstream)]
+
+
+class ReplayLLMServer(FakeLLMServer):
+    """
+    Fake upstream answering each question with its recorded answer after its recorded latency.
+
+    An upstream request belongs to the captured question found in its last
+    user message. Its delay is the next recorded call of that question
+    (their mean once exhausted) times `latency_scale`; unknown questions get
+    `delay` and `answer`.
+    """
+
+    def __init__(self, records: list, latency_scale: float = 1.0, **kwargs):
+        super().__init__(**kwargs)
+        self.latency_scale = latency_scale
+        self.matched = 0
+        self._questions = {}
+        for record in records:
+            for question, answer, upstream in recorded_calls(record):
+                if not isinstance(question, str) or not question:
+                    continue
+                entry = self._questions.setdefault(question, {"answer": None, "delays": deque(), "recorded": []})
+                if answer:
+                    entry["answer"] = answer
+                entry["delays"].extend(upstream)
+                entry["recorded"].extend(upstream)
+        # Longest first, so a question that contains another one is matched first
+        self._by_length = sorted(self._questions, key=len, reverse=True)
+
+    def _entry(self, body: dict):
+        messages = [message for message in body.get("messages") or () if message.get("role") == "user"]
+        content = messages[-1].get("content") if messages else None
+        if not isinstance(content, str):
+            return None
+        entry = self._questions.get(content)
+        if entry is None:
+            entry = next((self._questions[question] for question in self._by_length if question in content), None)
+        return entry
+
+    def delay_for(self, body: dict) -> float:
+        entry = self._entry(body)
+        if entry is None:
+            return self.delay
+        with self._lock:
+            self.matched += 1
+            if entry["delays"]:
+                delay = entry["delays"].popleft()
+            elif entry["recorded"]:
+                delay = sum(entry["recorded"]) / len(entry["recorded"])
+            else:
+                delay = self.delay
+        return delay * self.latency_scale
+
+    def answer_for(self, body: dict) -> str:
+        entry = self._entry(body)
+        if entry is None or entry["answer"] is None:
+            return super().answer_for(body)
+        return entry["answer"]
+
+
+def replay(base_url: str, records: list, speed: float, concurrency: int) -> dict:
+    """
+    Send `records` to `base_url` at their recorded pace divided by `speed` (0: no pacing).
+
+    `max_lag_ms` is how far behind schedule the latest request was sent; a
+    large lag means `concurrency` held the replay back.
+    """
+    routes = sorted({record["route"] for record in records})
+    results = {route: {"latencies": [], "errors": 0, "body_bytes": 0, "wire_bytes": 0} for route in routes}
+    lag = {"max": 0.0}
+    lock = threading.Lock()
+    local = threading.local()
+
+    def send(record: dict, due: float) -> None:
+        session = getattr(local, "session", None)
+        if session is None:
+            session = local.session = requests.Session()
+        url = f"{base_url}/ia-generator/{record['route']}" + ("?stream=1" if record.get("stream") else "")
+        start = time.perf_counter()
+        with lock:
+            lag["max"] = max(lag["max"], start - due)
+        try:
+            response = session.post(url, json=record["request"], headers=record.get("headers") or {}, timeout=300)
+            body_bytes = len(response.content)
+            wire_bytes = int(response.headers.get("Content-Length", body_bytes))
+            ok = response.status_code == record.get("status", 200)
+        except requests.RequestException:
+            ok = False
+        elapsed = time.perf_counter() - start
+        with lock:
+            result = results[record["route"]]
+            if ok:
+                result["latencies"].append(elapsed)
+                result["body_bytes"] += body_bytes
+                result["wire_bytes"] += wire_bytes
+            else:
+                result["errors"] += 1
+
+    first = records[0].get("ts", 0) if records else 0
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for record in records:
+            due = start + ((record.get("ts", first) - first) / speed if speed else 0.0)
+            wait = due - time.perf_counter()
+            if wait > 0:
+                time.sleep(wait)
+            pool.submit(send, record, due)
+    elapsed = time.perf_counter() - start
+
+    all_latencies = [latency for result in results.values() for latency in result["latencies"]]
+    return {
+        "routes": {
+            route: summarize(result["latencies"], result["errors"], elapsed, result["body_bytes"], result["wire_bytes"])
+            for route, result in results.items()
+        },
+        "total": summarize(
+            all_latencies,
+            sum(result["errors"] for result in results.values()),
+            elapsed,
+            sum(result["body_bytes"] for result in results.values()),
+            sum(result["wire_bytes"] for result in results.values()),
+        ),
+        "seconds": elapsed,
+        "max_lag_ms": lag["max"] * 1000,
+    }
+
+
+def recorded_summary(records: list) -> dict:
+    """
+    Latency percentiles, throughput and answer bytes of the captured traffic itself, per route and in total.
+    """
+    span = records[-1].get("ts", 0) - records[0].get("ts", 0) if records else 0.0
+
+    def summary(selected):
+        latencies = [record["latency_ms"] / 1000 for record in selected if record.get("latency_ms") is not None]
+        body_bytes = sum(len(json.dumps(record["response"])) for record in selected if record.get("response") is not None)
+        return summarize(latencies, 0, span, body_bytes, body_bytes)
+
+    routes = sorted({record["route"] for record in records})
+    return {
+        "routes": {route: summary([record for record in records if record["route"] == route]) for route in routes},
+        "total": summary(records),
+    }
+
+
+def run_replay(path: str, speed: float = 1.0, latency_scale: float = 1.0, concurrency: int = 64, routes: list = None, limit: int = None, config_name: str = "benchmark", url: str = None) -> dict:
+    records = load_records(path, routes, limit)
+    if not records:
+        raise ValueError(f"No replayable records in {path}")
+    report = {
+        "capture": path,
+        "records": len(records),
+        "speed": speed,
+        "latency_scale": latency_scale,
+        "concurrency": concurrency,
+        "recorded": recorded_summary(records),
+    }
+
+    if url is not None:
+        report.update(replay(url.rstrip("/"), records, speed, concurrency))
+        return report
+
+    fake = ReplayLLMServer(records, latency_scale)
+    fake.start()
+    os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+    os.environ["OPENAI_BASE_URL"] = fake.url
+
+    from ia_generator.services.llm_services import reset_openai_clients
+    reset_openai_clients()
+
+    rss_start = rss_bytes()
+    server, base_url, boot_seconds = start_app(config_name)
+    rss_booted = rss_bytes()
+    try:
+        report.update(replay(base_url, records, speed, concurrency))
+    finally:
+        server.shutdown()
+        fake.stop()
+
+    report.update({
+        "boot_seconds": boot_seconds,
+        "upstream_requests": len(fake.requests),
+        "upstream_matched": fake.matched,
+        "rss_start_mb": rss_start / 2**20,
+        "rss_booted_mb": rss_booted / 2**20,
+        "rss_end_mb": rss_bytes() / 2**20,
+        "rss_peak_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    })
+    return report
+
+
+def compare_reports(baseline: dict, current: dict) -> dict:
+    """
+    Route -> metric -> `{"baseline", "current", "change_pct"}` for the routes of both reports.
+    """
+    rows = {}
+    names = [name for name in baseline["routes"] if name in current["routes"]] + ["total"]
+    for name in names:
+        before = baseline["total"] if name == "total" else baseline["routes"][name]
+        after = current["total"] if name == "total" else current["routes"][name]
+        rows[name] = {
+            metric: {
+                "baseline": before[metric],
+                "current": after[metric],
+                "change_pct": (after[metric] - before[metric]) / before[metric] * 100 if before[metric] else None,
+            }
+            for metric in COMPARED
+        }
+    return rows
+
+
+def print_comparison(comparison: dict) -> None:
+    print(f"{'route':<46} " + " ".join(f"{metric:>26}" for metric in COMPARED))
+    for name, row in comparison.items():
+        cells = []
+        for metric in COMPARED:
+            cell = row[metric]
+            change = f"{cell['change_pct']:+.1f}%" if cell["change_pct"] is not None else "n/a"
+            cells.append(f"{cell['baseline']:.1f} -> {cell['current']:.1f} ({change})".rjust(26))
+        print(f"{name:<46} " + " ".join(cells))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a traffic capture against the generator API and a fake LLM backend.")
+    parser.add_argument("capture", help="capture file written with TRAFFIC_CAPTURE_PATH (rotated .N.gz segments are read too)")
+    parser.add_argument("--speed", type=float, default=1.0, help="pace multiplier, 0 sends as fast as --concurrency allows")
+    parser.add_argument("--latency-scale", type=float, default=1.0, help="multiplier of the recorded upstream latencies")
+    parser.add_argument("--concurrency", type=int, default=64, help="maximum requests in flight")
+    parser.add_argument("--routes", help="comma-separated subset of routes")
+    parser.add_argument("--limit", type=int, help="replay only the first N records")
+    parser.add_argument("--config", default="benchmark", help="config name passed to create_app()")
+    parser.add_argument("--url", help="drive a running deployment instead of an in-process app")
+    parser.add_argument("--output", help="save the report as JSON, e.g. as the baseline of a later --compare")
+    parser.add_argument("--compare", help="report saved from another build to compare against")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args()
+
+    report = run_replay(
+        args.capture,
+        speed=args.speed,
+        latency_scale=args.latency_scale,
+        concurrency=args.concurrency,
+        routes=args.routes.split(",") if args.routes else None,
+        limit=args.limit,
+        config_name=args.config,
+        url=args.url,
+    )
+    if args.compare:
+        with open(args.compare) as baseline:
+            report["comparison"] = compare_reports(json.load(baseline), report)
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(report, output, indent=2)
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    print("== recorded ==")
+    print_report(report["recorded"])
+    pace = f"speed {args.speed:g}x" if args.speed else "unpaced"
+    print(f"\n== replayed ({report['records']} requests, {pace}, max lag {report['max_lag_ms']:.0f} ms) ==")
+    print_report(report)
+    if "comparison" in report:
+        print(f"\n== compared with {args.compare} ==")
+        print_comparison(report["comparison"])
+
+
+if __name__ == "__main__":
+    main()
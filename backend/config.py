@@ -1,3 +1,4 @@
+import json
 import os
 from dotenv import load_dotenv
 
@@ -14,6 +15,20 @@ def get_openai_api_key() -> str:
     return key
 
 
+def get_openai_base_url():
+    """
+    Optional override of the OpenAI API base URL (e.g. a local stub server).
+    """
+    return os.getenv("OPENAI_BASE_URL") or None
+
+
+def _env_flag(name: str, default: bool = False) -> bool:
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
 class Config:
     """Base configuration."""
     DEBUG = False
@@ -21,8 +36,153 @@ class Config:
 
     API_KEY = os.getenv("API_KEY", "default-token")
 
-    RATELIMIT_DEFAULT = "100/hour"
-    RATELIMIT_STORAGE_URI = "memory://"
+    # Requests per route and client, plus a quota shared by every route measured in
+    # estimated upstream input tokens (units of RATELIMIT_TOKENS_PER_UNIT; at least 1 per request).
+    # "sqlite:///path" shares counters between the worker processes of a host.
+    RATELIMIT_DEFAULT = os.getenv("RATELIMIT_DEFAULT", "100/hour")
+    RATELIMIT_TOKENS = os.getenv("RATELIMIT_TOKENS", "2000/hour")
+    RATELIMIT_TOKENS_PER_UNIT = int(os.getenv("RATELIMIT_TOKENS_PER_UNIT", "1000"))
+    RATELIMIT_STORAGE_URI = os.getenv("RATELIMIT_STORAGE_URI", "memory://")
+
+    LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+
+    # Per-stage latency, size, token and error metrics served at /metrics (Prometheus text format)
+    METRICS_ENABLED = _env_flag("METRICS_ENABLED", default=True)
+
+    # Upstream calls: seconds per attempt, total seconds per call including retries,
+    # retries on timeouts, connection errors, 429 and 5xx (jittered exponential backoff
+    # unless upstream sends Retry-After), and the circuit breaker that fails fast after
+    # consecutive failures until the reset timeout has passed.
+    UPSTREAM_TIMEOUT = float(os.getenv("UPSTREAM_TIMEOUT", "120"))
+    UPSTREAM_DEADLINE = float(os.getenv("UPSTREAM_DEADLINE", "300"))
+    UPSTREAM_MAX_RETRIES = int(os.getenv("UPSTREAM_MAX_RETRIES", "3"))
+    UPSTREAM_BACKOFF_BASE = float(os.getenv("UPSTREAM_BACKOFF_BASE", "0.5"))
+    UPSTREAM_BACKOFF_MAX = float(os.getenv("UPSTREAM_BACKOFF_MAX", "8"))
+    CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "5"))
+    CIRCUIT_RESET_TIMEOUT = float(os.getenv("CIRCUIT_RESET_TIMEOUT", "30"))
+
+    # Model routing: JSON list of rules, first match wins, e.g.
+    # [{"agents": ["*_frontend_agent"], "max_prompt_tokens": 8000, "tiers": ["standard"],
+    #   "model": "gpt-4.1-mini", "fallbacks": ["gpt-4.1"], "latency_slo": 10}]
+    # Unset keeps the built-in rules; unmatched calls use the agent's default model
+    # followed by MODEL_FALLBACKS[model]. Models whose recent error rate exceeds
+    # MODEL_MAX_ERROR_RATE (after MODEL_MIN_SAMPLES calls) are tried last.
+    MODEL_ROUTES = json.loads(os.getenv("MODEL_ROUTES")) if os.getenv("MODEL_ROUTES") else None
+    MODEL_FALLBACKS = json.loads(os.getenv("MODEL_FALLBACKS")) if os.getenv("MODEL_FALLBACKS") else None
+    MODEL_MAX_ERROR_RATE = float(os.getenv("MODEL_MAX_ERROR_RATE", "0.5"))
+    MODEL_MIN_SAMPLES = int(os.getenv("MODEL_MIN_SAMPLES", "5"))
+
+    # Load every training corpus and build agent prompt prefixes at startup
+    PRELOAD_CORPORA = _env_flag("PRELOAD_CORPORA")
+
+    # Corpus snapshot built by `python -m ia_generator.utils.corpus_snapshot`; when the file
+    # is absent or out of date the training directories are read instead. Empty disables it.
+    CORPUS_SNAPSHOT_PATH = os.getenv("CORPUS_SNAPSHOT_PATH", "")
+
+    # Agents listed here send only the top-k most relevant training chunks ("top-k" mode)
+    # instead of their whole training directory ("all" mode).
+    RETRIEVAL_AGENTS = [
+        agent.strip() for agent in os.getenv("RETRIEVAL_AGENTS", "").split(",") if agent.strip()
+    ]
+    RETRIEVAL_TOP_K = int(os.getenv("RETRIEVAL_TOP_K", "4"))
+    RETRIEVAL_TOKEN_BUDGET = int(os.getenv("RETRIEVAL_TOKEN_BUDGET", "12000"))
+    RETRIEVAL_INDEX_DIR = os.getenv(
+        "RETRIEVAL_INDEX_DIR",
+        os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "retrieval"),
+    )
+
+    # JSON list of extra agents ({"name", "prompt" or "prompt_file", "corpus", "handler", ...}),
+    # added to the built-in registry in ia_generator/constants/agents.py
+    AGENTS_FILE = os.getenv("AGENTS_FILE") or None
+
+    # Prompt token budgets: a default for every agent plus "agent=tokens,..." overrides.
+    # Prompts over budget drop their lowest-priority training files first.
+    TOKEN_BUDGET_DEFAULT = int(os.getenv("TOKEN_BUDGET_DEFAULT", "200000"))
+    TOKEN_BUDGETS = {
+        agent.strip(): int(tokens)
+        for agent, _, tokens in (
+            item.partition("=") for item in os.getenv("TOKEN_BUDGETS", "").split(",") if "=" in item
+        )
+    }
+    # "estimate" (offline) or "tiktoken" (needs the package and a cached o200k_base encoding)
+    TOKENIZER = os.getenv("TOKENIZER", "estimate")
+    TOKEN_ESTIMATE_FACTOR = float(os.getenv("TOKEN_ESTIMATE_FACTOR", "1.0"))
+
+    # Response cache: "memory" (per process), "sqlite" (shared on the host) or "none".
+    # Only calls at or below RESPONSE_CACHE_MAX_TEMPERATURE are cached: by default the deterministic
+    # audits and repairs (0.2), not the generators (1.0); raise it to 1.0 to replay generated answers
+    RESPONSE_CACHE_BACKEND = os.getenv("RESPONSE_CACHE_BACKEND", "memory")
+    RESPONSE_CACHE_TTL = int(os.getenv("RESPONSE_CACHE_TTL", "3600"))
+    RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "512"))
+    RESPONSE_CACHE_MAX_BYTES = int(os.getenv("RESPONSE_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+    RESPONSE_CACHE_MAX_TEMPERATURE = float(os.getenv("RESPONSE_CACHE_MAX_TEMPERATURE", "0.5"))
+    RESPONSE_CACHE_PATH = os.getenv(
+        "RESPONSE_CACHE_PATH",
+        os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "responses.sqlite3"),
+    )
+
+    # Near-duplicate answers: "agent=similarity,..." overrides the per-agent thresholds of the
+    # registry (0 < similarity <= 1); questions that similar to a cached one share its answer
+    NEAR_DUPLICATE_THRESHOLDS = {
+        agent.strip(): float(threshold)
+        for agent, _, threshold in (
+            item.partition("=") for item in os.getenv("NEAR_DUPLICATE_THRESHOLDS", "").split(",") if "=" in item
+        )
+    }
+    NEAR_DUPLICATE_MAX_ENTRIES = int(os.getenv("NEAR_DUPLICATE_MAX_ENTRIES", "2048"))
+
+    # Buffered /ia-generator responses are gzip- or brotli-compressed (brotli needs the `brotli`
+    # package) when the client accepts it and the body has at least RESPONSE_COMPRESSION_MIN_BYTES
+    RESPONSE_COMPRESSION = _env_flag("RESPONSE_COMPRESSION", default=True)
+    RESPONSE_COMPRESSION_MIN_BYTES = int(os.getenv("RESPONSE_COMPRESSION_MIN_BYTES", "1024"))
+    # Whether answers repeat the question by default; a request can override it with `echo_question`
+    ECHO_QUESTION = _env_flag("ECHO_QUESTION", default=True)
+
+    # Request body limits in bytes: a default plus "route=bytes,..." overrides (route = last path
+    # segment, e.g. an agent name, `batch` or `jobs`); MAX_CONTENT_LENGTH caps every request
+    REQUEST_SIZE_LIMIT_DEFAULT = int(os.getenv("REQUEST_SIZE_LIMIT_DEFAULT", str(256 * 1024)))
+    REQUEST_SIZE_LIMITS = {
+        "batch": 2 * 1024 * 1024,
+        **{
+            route.strip(): int(size)
+            for route, _, size in (
+                item.partition("=") for item in os.getenv("REQUEST_SIZE_LIMITS", "").split(",") if "=" in item
+            )
+        },
+    }
+    MAX_CONTENT_LENGTH = max(REQUEST_SIZE_LIMIT_DEFAULT, *REQUEST_SIZE_LIMITS.values())
+
+    # Traffic capture for `benchmarks/replay.py`: POSTs to /ia-generator (body, answer, latencies) are
+    # appended to this JSON-lines file, gzipped to `.1.gz`, `.2.gz`... every TRAFFIC_CAPTURE_MAX_BYTES.
+    # `{pid}` in the path gives every worker process its own log. Empty disables the capture.
+    TRAFFIC_CAPTURE_PATH = os.getenv("TRAFFIC_CAPTURE_PATH", "")
+    TRAFFIC_CAPTURE_MAX_BYTES = int(os.getenv("TRAFFIC_CAPTURE_MAX_BYTES", str(64 * 1024 * 1024)))
+    TRAFFIC_CAPTURE_BACKUPS = int(os.getenv("TRAFFIC_CAPTURE_BACKUPS", "5"))
+    TRAFFIC_CAPTURE_SAMPLE_RATE = float(os.getenv("TRAFFIC_CAPTURE_SAMPLE_RATE", "1.0"))
+
+    # /ia-generator/batch: maximum items per request and concurrent upstream calls per batch
+    BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "20"))
+    BATCH_MAX_PARALLELISM = int(os.getenv("BATCH_MAX_PARALLELISM", "4"))
+
+    # Generated Rust is audited in chunks of about this many characters (0 audits it in one pass),
+    # with up to AUDIT_MAX_PARALLELISM chunk audits in flight per request
+    AUDIT_CHUNK_CHARS = int(os.getenv("AUDIT_CHUNK_CHARS", "4000"))
+    AUDIT_MAX_PARALLELISM = int(os.getenv("AUDIT_MAX_PARALLELISM", "4"))
+    # Audits of agents with validation rules only run, as a targeted repair, when the offline
+    # validator finds problems; set to false to always run the full audit
+    AUDIT_VALIDATION_GATE = _env_flag("AUDIT_VALIDATION_GATE", default=True)
+    # Check answers of TypeScript agents against their validation rules and send a targeted
+    # repair when they fail; streamed answers are then sent once checked
+    TYPESCRIPT_REPAIR = _env_flag("TYPESCRIPT_REPAIR")
+
+    # Background jobs (/ia-generator/jobs): worker threads per process, queue bound,
+    # seconds finished jobs are kept, and an optional SQLite file shared by worker processes
+    JOBS_WORKERS = int(os.getenv("JOBS_WORKERS", "2"))
+    JOBS_MAX_QUEUE = int(os.getenv("JOBS_MAX_QUEUE", "100"))
+    JOBS_RETENTION = int(os.getenv("JOBS_RETENTION", "3600"))
+    JOBS_STORE_PATH = os.getenv("JOBS_STORE_PATH") or None
+    JOBS_MAX_WAIT = int(os.getenv("JOBS_MAX_WAIT", "30"))
+    JOBS_RETRY_AFTER = int(os.getenv("JOBS_RETRY_AFTER", "30"))
 
     ALLOWED_ORIGINS = [
         "http://localhost:3000",
@@ -38,15 +198,36 @@ class DevelopmentConfig(Config):
 class ProductionConfig(Config):
     ALLOWED_ORIGINS = ["https://vara-code-gen-ai.vercel.app/"]
     DEBUG = False
+    PRELOAD_CORPORA = _env_flag("PRELOAD_CORPORA", default=True)
+    CORPUS_SNAPSHOT_PATH = os.getenv(
+        "CORPUS_SNAPSHOT_PATH",
+        os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "corpus.snapshot"),
+    )
+    RATELIMIT_STORAGE_URI = os.getenv(
+        "RATELIMIT_STORAGE_URI",
+        "sqlite:///" + os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "ratelimit.sqlite3"),
+    )
+    # Gunicorn runs several workers: a job must be visible to whichever one answers the poll
+    JOBS_STORE_PATH = os.getenv(
+        "JOBS_STORE_PATH",
+        os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "jobs.sqlite3"),
+    ) or None
 
 
 class TestingConfig(Config):
     TESTING = True
     DEBUG = True
+    RESPONSE_CACHE_BACKEND = "none"
+
+
+class BenchmarkConfig(ProductionConfig):
+    """Production settings without rate limiting, used by benchmarks/load_test.py."""
+    RATELIMIT_ENABLED = False
 
 
 config = {
     "development": DevelopmentConfig,
     "production": ProductionConfig,
     "testing": TestingConfig,
+    "benchmark": BenchmarkConfig,
 }
@@ -0,0 +1,56 @@
+"""
+Gunicorn settings for serving `wsgi:app` in production:
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+Upstream LLM calls are I/O bound, so each worker process runs a pool of
+threads (`gthread`). Set GUNICORN_WORKER_CLASS=gevent for cooperative
+workers once gevent is installed.
+"""
+import gc
+import math
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '5000')}"
+
+workers = int(os.getenv("WEB_CONCURRENCY", str(min(multiprocessing.cpu_count() * 2 + 1, 8))))
+worker_class = os.getenv("GUNICORN_WORKER_CLASS", "gthread")
+threads = int(os.getenv("GUNICORN_THREADS", "8"))
+worker_connections = int(os.getenv("GUNICORN_WORKER_CONNECTIONS", "200"))
+
+# Generations plus audits can take minutes; SIGTERM lets in-flight requests
+# and queued background jobs finish for up to `graceful_timeout` seconds,
+# by default the UPSTREAM_DEADLINE of one upstream call (retries included).
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "300"))
+graceful_timeout = int(os.getenv(
+    "GUNICORN_GRACEFUL_TIMEOUT",
+    str(math.ceil(max(float(os.getenv("UPSTREAM_DEADLINE", "300")), 120))),
+))
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", "5"))
+
+# Load the app, and with it every training corpus, once in the master so
+# workers share those pages copy-on-write.
+preload_app = os.getenv("GUNICORN_PRELOAD", "true").lower() in ("1", "true", "yes", "on")
+
+accesslog = os.getenv("GUNICORN_ACCESS_LOG", "-")
+loglevel = os.getenv("LOG_LEVEL", "info").lower()
+
+
+def pre_fork(server, worker):
+    # Keep objects loaded by the master out of the collector so scanning them
+    # does not dirty the shared pages in every worker.
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    from ia_generator.services.llm_services import reset_openai_clients
+
+    # HTTP connection pools must not be shared with the master or sibling workers
+    reset_openai_clients()
+
+
+def worker_exit(server, worker):
+    from ia_generator.services.job_queue import job_queue
+
+    job_queue.shutdown(timeout=graceful_timeout)
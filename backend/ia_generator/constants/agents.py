@@ -0,0 +1,157 @@
+import json
+import os
+from dataclasses import dataclass, fields
+
+from ia_generator.constants.prompt_templates import (
+    SERVICE_SMART_CONTRACT_PROMPT,
+    LIB_SMART_CONTRACT_PROMPT,
+    OPTIMIZATION_SMART_CONTRACT_PROMPT,
+    CLIENT_SERVER_PROMPT,
+    SCRIPT_SERVER_PROMPT,
+    GEARJS_PROMPT,
+    GEARHOOKS_PROMPT,
+    SAILSJS_PROMPT,
+    GASLESS_EZ_WEB3_PROMPT,
+    SIGNLESS_EZ_WEB3_PROMPT,
+    GASLESS_SERVER_SCRIPT_PROMPT,
+)
+from ia_generator.utils.code_validator import check_rules
+
+TRAINING_DATA_DIR = os.path.abspath(
+    os.path.join(os.path.dirname(__file__), "..", "..", "training_data")
+)
+
+HANDLERS = ("smart_contract", "server", "web3_abstraction", "frontend")
+
+
+@dataclass(frozen=True)
+class AgentSpec:
+    """
+    Everything needed to serve an agent route.
+
+    `corpus` is relative to TRAINING_DATA_DIR unless absolute, and `handler`
+    names the controller family (one of HANDLERS). Agents with an
+    `audit_mode` accept `audit` and are reviewed by `audit_model`;
+    `token_budget` caps their prompt size unless TOKEN_BUDGETS overrides it.
+    Agents with a `near_duplicate_threshold` answer questions at least that
+    similar to a cached one from the cache (see NEAR_DUPLICATE_THRESHOLDS).
+    `validation` names the `code_validator.RULES` their output must pass:
+    audits of such agents are skipped when it does, and answers that do not
+    get a targeted repair. Agents with `patch_mode` can answer
+    `"mode": "patch"` requests with a SEARCH/REPLACE patch of the submitted
+    source.
+    """
+    name: str
+    prompt: str
+    corpus: str
+    handler: str
+    model: str = "gpt-4.1"
+    temperature: float = 1.0
+    audit_mode: str = None
+    audit_model: str = "gpt-4.1-mini"
+    token_budget: int = None
+    near_duplicate_threshold: float = None
+    patch_mode: bool = False
+    validation: tuple = ()
+
+    @property
+    def training_path(self) -> str:
+        if os.path.isabs(self.corpus):
+            return os.path.abspath(self.corpus)
+        return os.path.join(TRAINING_DATA_DIR, *self.corpus.split("/"))
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "AgentSpec":
+        """
+        Build a spec from config; the prompt is given inline (`prompt`) or as a file (`prompt_file`).
+        """
+        data = dict(data)
+        prompt_file = data.pop("prompt_file", None)
+        if prompt_file is not None:
+            with open(prompt_file, "r", encoding="utf-8") as f:
+                data["prompt"] = f.read()
+        unknown = set(data) - {field.name for field in fields(cls)}
+        if unknown:
+            raise ValueError(f"Unknown agent settings: {', '.join(sorted(unknown))}")
+        if "validation" in data:
+            data["validation"] = check_rules(data["validation"])
+        spec = cls(**data)
+        if spec.handler not in HANDLERS:
+            raise ValueError(f"Agent `{spec.name}` has unknown handler `{spec.handler}`")
+        return spec
+
+
+# Validation rules (see ia_generator/utils/code_validator.py) taken from the prompt templates
+SERVICE_RULES = ("fence", "balanced", "service_macro", "no_str_ref", "no_floats")
+LIB_RULES = ("balanced", "no_std", "program", "no_str_ref", "no_floats")
+OPTIMIZATION_RULES = ("fence", "balanced", "service_macro", "no_program", "no_str_ref", "no_floats")
+CLIENT_RULES = ("balanced", "no_any")
+TYPESCRIPT_RULES = ("balanced",)
+
+# Agent route name -> spec; agents from the AGENTS_FILE setting are added by `configure_agents`
+AGENTS = {spec.name: spec for spec in (
+    # Smart Contract Agents
+    AgentSpec("service_smartcontract_agent", SERVICE_SMART_CONTRACT_PROMPT, "smart_contract_data/services_data", "smart_contract", audit_mode="state-contract", validation=SERVICE_RULES),
+    AgentSpec("lib_smartcontract_agent", LIB_SMART_CONTRACT_PROMPT, "smart_contract_data/lib_rs_data", "smart_contract", audit_mode="state-contract", validation=LIB_RULES),
+    AgentSpec("optimization_smartcontract_agent", OPTIMIZATION_SMART_CONTRACT_PROMPT, "smart_contract_data/optimization_contracts", "smart_contract", audit_mode="state-contract", patch_mode=True, validation=OPTIMIZATION_RULES),
+
+    # Server Agents
+    AgentSpec("client_server_agent", CLIENT_SERVER_PROMPT, "server_data/client", "server", validation=CLIENT_RULES),
+    AgentSpec("script_server_agent", SCRIPT_SERVER_PROMPT, "server_data/script", "server", validation=TYPESCRIPT_RULES),
+
+    # Web3 Abstraction Agents
+    AgentSpec("gasless_ez_web3abstraction_agent", GASLESS_EZ_WEB3_PROMPT, "web3_abstraction/gasless_ez_transactions", "web3_abstraction", validation=TYPESCRIPT_RULES),
+    AgentSpec("signless_ez_web3abstraction_agent", SIGNLESS_EZ_WEB3_PROMPT, "web3_abstraction/signless_ez_transactions", "web3_abstraction", validation=TYPESCRIPT_RULES),
+    AgentSpec("gasless_server_script_web3abstraction_agent", GASLESS_SERVER_SCRIPT_PROMPT, "web3_abstraction/gasless_server_script", "web3_abstraction", validation=TYPESCRIPT_RULES),
+
+    # Frontend Agents
+    AgentSpec("sailsjs_frontend_agent", SAILSJS_PROMPT, "frontend_data/sails_js", "frontend", validation=TYPESCRIPT_RULES),
+    AgentSpec("gearjs_frontend_agent", GEARJS_PROMPT, "frontend_data/gear_js", "frontend", validation=TYPESCRIPT_RULES),
+    AgentSpec("gearhooks_frontend_agent", GEARHOOKS_PROMPT, "frontend_data/gear_hooks", "frontend", validation=TYPESCRIPT_RULES),
+)}
+_BUILTIN_AGENTS = dict(AGENTS)
+
+
+def configure_agents(config) -> None:
+    """
+    Add or replace agents from the JSON list in the file named by `AGENTS_FILE`.
+    """
+    AGENTS.clear()
+    AGENTS.update(_BUILTIN_AGENTS)
+    path = config.get("AGENTS_FILE")
+    if not path:
+        return
+    with open(path, "r", encoding="utf-8") as f:
+        for data in json.load(f):
+            spec = AgentSpec.from_dict(data)
+            AGENTS[spec.name] = spec
+
+
+def agent_token_budgets() -> dict:
+    return {name: spec.token_budget for name, spec in AGENTS.items() if spec.token_budget is not None}
+
+
+def agent_near_duplicate_thresholds() -> dict:
+    return {
+        name: spec.near_duplicate_threshold
+        for name, spec in AGENTS.items()
+        if spec.near_duplicate_threshold is not None
+    }
+
+
+def agent_training_path(agent: str) -> str:
+    """
+    Absolute path of the training data directory used by `agent`.
+    """
+    return AGENTS[agent].training_path
+
+
+def agent_for_training_path(training_path: str) -> str:
+    """
+    Name of the agent whose corpus lives in `training_path`, or the directory name for unknown paths.
+    """
+    training_path = os.path.abspath(training_path)
+    for agent, spec in AGENTS.items():
+        if spec.training_path == training_path:
+            return agent
+    return os.path.basename(training_path)
@@ -26,6 +26,19 @@ OPTIMIZATION_SMART_CONTRACT_PROMPT = (
     "Do not reintroduce Program or restructure. Always provide full method implementations and use all required imports at the top."
 )
 
+# Appended to a template when the caller sends the current file and asks for a patch
+PATCH_MODE_PROMPT = (
+    "\n\nSystem: The current file is given after the instruction. Do not repeat the whole file: "
+    "answer only with SEARCH/REPLACE blocks, one per change, in this exact format:\n"
+    "<<<<<<< SEARCH\n"
+    "lines copied exactly from the current file, including indentation\n"
+    "=======\n"
+    "the lines that replace them\n"
+    ">>>>>>> REPLACE\n"
+    "Each SEARCH part must match exactly one place in the file and be just long enough to be unique. "
+    "New imports are added with a block that extends the existing `use` lines. No text outside the blocks."
+)
+
 # Server Agents Prompts  
 
 CLIENT_SERVER_PROMPT = (
@@ -0,0 +1,61 @@
+from ia_generator.constants.agents import agent_for_training_path
+from ia_generator.utils.utils import agent_cache_key, agent_cache_scope, build_full_prompt, route_agent_models
+from ia_generator.services.llm_services import generate_openai_chat_response, stream_openai_chat_response
+from ia_generator.services.auditservice import AuditService, typescript_repair_enabled
+from ia_generator.services.model_router import get_served_model, model_router
+from ia_generator.services.near_duplicate_cache import near_duplicate_cache
+from ia_generator.exceptions.exceptions import PromptBudgetError
+
+
+def prepare_agent_call(prompt: str, training_path: str, question: str, model: str, temperature: float, retrieval: dict = None):
+    """
+    Return the prompt messages, cache key and routed models of an agent call.
+
+    The cache key is that of a near-duplicate question when the first
+    routed model has a cached answer for one.
+    """
+    if not isinstance(question, str):
+        raise ValueError("`question` must be a string")
+    try:
+        full_prompt = build_full_prompt(prompt, training_path, question, retrieval)
+        models = route_agent_models(training_path, default_model=model)
+        cache_key = near_duplicate_cache.resolve(
+            agent_for_training_path(training_path),
+            agent_cache_scope(prompt, training_path, model, temperature, retrieval),
+            question,
+            agent_cache_key(prompt, training_path, question, model, temperature, retrieval),
+            temperature,
+            models[0],
+        )
+    except PromptBudgetError:
+        raise
+    except Exception as e:
+        raise RuntimeError(f"Could not load training files: {str(e)}")
+    return full_prompt, cache_key, models
+
+
+def agent_handler(prompt: str, training_path: str, question: str, retrieval: dict = None, stream: bool = False, model: str = "gpt-4.1", temperature: float = 1.0, validation: tuple = (), audit_model: str = "gpt-4.1-mini", language: str = "typescript"):
+    """
+    Answer with the agent's prompt.
+
+    With `validation` rules and TYPESCRIPT_REPAIR on, answers that fail them
+    get a targeted repair, streamed or not; a stream then sends the checked
+    answer in one piece.
+    """
+    full_prompt, cache_key, models = prepare_agent_call(prompt, training_path, question, model, temperature, retrieval)
+
+    if validation and typescript_repair_enabled():
+        answer = model_router.call(models, lambda model: generate_openai_chat_response(full_prompt, model=model, temperature=temperature, cache_key=cache_key))
+        answer = AuditService(model=audit_model, audit_mode="repair").validate_and_repair(answer, validation, language)
+        return answer_events(answer, get_served_model()) if stream else answer
+    if stream:
+        return model_router.stream(models, lambda model: stream_openai_chat_response(full_prompt, model=model, temperature=temperature, cache_key=cache_key))
+    return model_router.call(models, lambda model: generate_openai_chat_response(full_prompt, model=model, temperature=temperature, cache_key=cache_key))
+
+
+def answer_events(answer: str, model: str):
+    """
+    A finished answer as the `(event, data)` pairs of a stream.
+    """
+    yield "token", {"delta": answer}
+    yield "done", {"model": model, "usage": None}
@@ -0,0 +1,46 @@
+from ia_generator.constants.prompt_templates import PATCH_MODE_PROMPT
+from ia_generator.controllers.agent_controller import prepare_agent_call
+from ia_generator.exceptions.exceptions import PatchError
+from ia_generator.services.auditservice import AuditService, audit_gate_enabled
+from ia_generator.services.llm_services import generate_openai_chat_response
+from ia_generator.services.model_router import model_router
+from ia_generator.utils.patches import apply_patch, parse_patch, unified_diff
+from ia_generator.utils.rust_chunks import extract_code
+
+
+def patch_question(question: str, source: str) -> str:
+    return f"{question}\n\nCurrent file:\n```\n{source}\n```"
+
+
+def patch_handler(prompt: str, training_path: str, question: str, source: str, retrieval: dict = None, model: str = "gpt-4.1", temperature: float = 1.0, filename: str = "service.rs", validation: tuple = (), audit_mode: str = "state-contract", audit_model: str = "gpt-4.1-mini"):
+    """
+    Change `source` as asked by `question` with a SEARCH/REPLACE patch instead of a regenerated file.
+
+    The patch must apply cleanly; otherwise the whole file is regenerated
+    from the agent's own prompt. Returns the resulting file (`answer`), its
+    unified diff against `source`, the `mode` that produced it ("patch" or
+    "full") and, after a fallback, the `patch_error`. With `validation`
+    rules and the audit gate on, the resulting file is checked and repaired
+    like any other answer of the agent.
+    """
+    request_text = patch_question(question, source)
+
+    def generate(agent_prompt):
+        full_prompt, cache_key, models = prepare_agent_call(agent_prompt, training_path, request_text, model, temperature, retrieval)
+        return model_router.call(models, lambda model: generate_openai_chat_response(full_prompt, model=model, temperature=temperature, cache_key=cache_key))
+
+    result = {"mode": "patch"}
+    try:
+        patched = apply_patch(source, parse_patch(generate(prompt + PATCH_MODE_PROMPT)))
+    except PatchError as e:
+        answer = generate(prompt)
+        patched = extract_code(answer) or answer
+        result = {"mode": "full", "patch_error": e.message}
+
+    if validation and audit_gate_enabled():
+        # The file itself is never fenced, only a repaired answer may be
+        rules = tuple(rule for rule in validation if rule != "fence")
+        repaired = AuditService(model=audit_model, audit_mode=audit_mode).validate_and_repair(patched, rules)
+        patched = extract_code(repaired) or repaired
+
+    return {"answer": patched, "diff": unified_diff(source, patched, filename), **result}
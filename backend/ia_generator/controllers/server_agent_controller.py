@@ -1,18 +1,5 @@
+from ia_generator.controllers.agent_controller import agent_handler
 
-from ia_generator.utils.utils import load_training_files
-from ia_generator.services.llm_services import generate_openai_chat_response
-from ia_generator.exceptions.exceptions import OpenAIServiceError
 
-def server_agent_handler(prompt: str, training_path: str, question: str):
-    try:
-        training_data = load_training_files(training_path)
-    except Exception as e:
-        raise RuntimeError(f"Could not load training files: {str(e)}")
-
-    full_prompt = (
-        f"{prompt}\n\n"
-        f"Here is additional training data:\n{training_data}\n\n"
-        f"User question:\n{question}"
-    )
-
-    return generate_openai_chat_response(full_prompt, model="gpt-4.1")
+def server_agent_handler(prompt: str, training_path: str, question: str, retrieval: dict = None, stream: bool = False, model: str = "gpt-4.1", temperature: float = 1.0, validation: tuple = (), audit_model: str = "gpt-4.1-mini"):
+    return agent_handler(prompt, training_path, question, retrieval, stream, model, temperature, validation, audit_model)
@@ -1,22 +1,35 @@
+from ia_generator.controllers.agent_controller import answer_events, prepare_agent_call
+from ia_generator.services.llm_services import generate_openai_chat_response, stream_openai_chat_response
+from ia_generator.services.model_router import get_served_model, model_router
+from ..services.auditservice import AuditService, audit_gate_enabled
+from ..utils.rust_chunks import extract_code
 
-from ia_generator.utils.utils import load_training_files
-from ia_generator.services.llm_services import generate_openai_chat_response
-from ia_generator.exceptions.exceptions import OpenAIServiceError
-from ..services.auditservice import AuditService
 
+def smart_contract_handler(prompt: str, training_path: str, question: str, audit: bool = False, retrieval: dict = None, stream: bool = False, model: str = "gpt-4.1", temperature: float = 1.0, audit_mode: str = "state-contract", audit_model: str = "gpt-4.1-mini", validation: tuple = ()):
+    full_prompt, cache_key, models = prepare_agent_call(prompt, training_path, question, model, temperature, retrieval)
 
-def smart_contract_handler(prompt: str, training_path: str, question: str, audit: bool = False):
-    try:
-        training_data = load_training_files(training_path)
-    except Exception as e:
-        raise RuntimeError(f"Could not load training files: {str(e)}")
+    def generate(model):
+        return generate_openai_chat_response(full_prompt, model=model, temperature=temperature, cache_key=cache_key)
 
-    full_prompt = f"{prompt}\n\nHere is additional training data:\n{training_data}\n\nUser question:\n{question}"
+    def generate_stream(model):
+        return stream_openai_chat_response(full_prompt, model=model, temperature=temperature, cache_key=cache_key)
 
-    response = generate_openai_chat_response(full_prompt, model="gpt-4.1")
+    if not audit:
+        if stream:
+            return model_router.stream(models, generate_stream)
+        return model_router.call(models, generate)
 
-    if audit:
-        auditor = AuditService(model="gpt-4.1-mini", audit_mode="state-contract")
-        response = auditor.audit_response(full_prompt, response)
+    auditor = AuditService(model=audit_model, audit_mode=audit_mode)
+    if validation and audit_gate_enabled():
+        # Offline checks stand in for the audit: clean code skips it, violations get a targeted repair
+        answer = auditor.validate_and_repair(model_router.call(models, generate), validation)
+        return answer_events(answer, get_served_model()) if stream else answer
 
-    return response
+    if stream:
+        response = model_router.call(models, generate)
+        # Only the audited answer is final, so that is the pass streamed to the client
+        return auditor.stream_audit_response(extract_code(response) or response)
+
+    # Chunks of the contract are audited while the rest is still being generated
+    generation = model_router.stream(models, generate_stream)
+    return auditor.audit_generated(data["delta"] for event, data in generation if event == "token")
@@ -1,10 +1,49 @@
 class OpenAIServiceError(Exception):
     """
     Custom exception for handling OpenAI-related errors.
+
+    `cause` classifies the failure (e.g. "timeout", "rate_limit", "server_error").
     """
-    def __init__(self, message: str):
+    def __init__(self, message: str, cause: str = "unknown"):
         super().__init__(message)
         self.message = message
+        self.cause = cause
 
     def __str__(self):
         return f"OpenAIServiceError: {self.message}"
+
+
+class JobQueueFullError(Exception):
+    """
+    Raised when the background job queue cannot accept more work.
+    """
+    def __init__(self, message: str):
+        super().__init__(message)
+        self.message = message
+
+
+class PromptBudgetError(Exception):
+    """
+    Raised when a prompt cannot be trimmed to fit the agent's token budget.
+    """
+    def __init__(self, message: str):
+        super().__init__(message)
+        self.message = message
+
+
+class CorpusSnapshotError(Exception):
+    """
+    Raised when a corpus snapshot file is missing, corrupt or was built for other templates.
+    """
+    def __init__(self, message: str):
+        super().__init__(message)
+        self.message = message
+
+
+class PatchError(Exception):
+    """
+    Raised when a model's SEARCH/REPLACE patch cannot be parsed or does not apply cleanly.
+    """
+    def __init__(self, message: str):
+        super().__init__(message)
+        self.message = message
@@ -1,46 +1,126 @@
+import contextvars
+import json
+import math
 import os
+from concurrent.futures import ThreadPoolExecutor
 # === Third-party Libraries ===
 import requests
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, current_app, request, jsonify, stream_with_context
 from requests.exceptions import ConnectionError, Timeout, TooManyRedirects
 
 # === Internal Modules ===
-from ia_generator.exceptions.exceptions import OpenAIServiceError
+from ia_generator.exceptions.exceptions import JobQueueFullError, OpenAIServiceError, PromptBudgetError
+from ia_generator.services import llm_services
 from ia_generator.services.llm_services import generate_openai_chat_response
 from ia_generator.services.auditservice import AuditService
+from ia_generator.services import model_router, near_duplicate_cache, singleflight
+from ia_generator.services.job_queue import job_queue
+from ia_generator.services.response_cache import begin_request, get_cache_status, response_cache
 from ia_generator.utils.utils import load_training_files
+from ia_generator.utils.corpus_cache import corpus_cache
+from ia_generator.constants.agents import AGENTS
+from ia_generator.utils import code_validator, token_budget, traffic_capture
+from ia_generator.utils.compression import response_compressor
+from ia_generator.utils.request_limits import exceeds_size_limit, request_size_limit
+from ia_generator.utils.metrics import metrics
 
 from ia_generator.controllers.frontend_agent_controller import frontend_agent_handler
+from ia_generator.controllers.patch_controller import patch_handler
 from ia_generator.controllers.server_agent_controller import server_agent_handler
 from ia_generator.controllers.smart_contract_controller import smart_contract_handler
 from ia_generator.controllers.web3_abstraction_controller import web3_abstraction_handler
 
-# === Prompts ===
-from ia_generator.constants.prompt_templates import (
-    # Smart Contract Prompts
-    SERVICE_SMART_CONTRACT_PROMPT,
-    LIB_SMART_CONTRACT_PROMPT,
-    OPTIMIZATION_SMART_CONTRACT_PROMPT,
-
-    # Server Prompts
-    CLIENT_SERVER_PROMPT,
-    SCRIPT_SERVER_PROMPT,
-
-    # Frontend Prompts
-    GEARJS_PROMPT,
-    GEARHOOKS_PROMPT,
-    SAILSJS_PROMPT,
+ia_generator_bp = Blueprint('ia_generator', __name__)
 
-    # Web3 Abstraction Prompts
-    GASLESS_EZ_WEB3_PROMPT,
-    SIGNLESS_EZ_WEB3_PROMPT,
-    GASLESS_SERVER_SCRIPT_PROMPT,
-)
 
+@ia_generator_bp.before_request
+def start_response_cache_scope():
+    # `Cache-Control: no-cache` forces a fresh upstream answer (which is still stored)
+    bypass = "no-cache" in request.headers.get("Cache-Control", "")
+    begin_request(bypass=bypass)
+    # `X-Near-Duplicate-Cache: off` only accepts answers cached for this exact question
+    near_duplicate_cache.begin_request(
+        bypass=bypass or request.headers.get("X-Near-Duplicate-Cache", "").lower() == "off"
+    )
+    singleflight.begin_request()
+    token_budget.begin_request()
+    llm_services.begin_request()
+    code_validator.begin_request()
+    traffic_capture.begin_request()
+    # `X-Latency-Tier: fast` asks for the fast models of the routing rules
+    model_router.begin_request(tier=request.headers.get("X-Latency-Tier"))
+    # Agent routes are labelled by agent, other routes by endpoint
+    agent = (request.view_args or {}).get("agent")
+    metrics.set_agent(agent or (request.endpoint.rsplit(".", 1)[-1] if request.endpoint else "unknown"))
+    # Oversized bodies are refused from their Content-Length, before any JSON parsing
+    if request.method == "POST" and exceeds_size_limit(request):
+        return jsonify({"error": f"Request body over the {request_size_limit(request)} byte limit of this route"}), 413
+
+
+@ia_generator_bp.after_request
+def add_cache_status_header(response):
+    status = get_cache_status()
+    if status is not None:
+        response.headers["X-Cache"] = status
+    similarity = near_duplicate_cache.get_similarity()
+    if similarity is not None:
+        # The answer was cached for a near-duplicate question this similar
+        response.headers["X-Cache-Similarity"] = f"{similarity:.2f}"
+    if singleflight.was_coalesced():
+        response.headers["X-Coalesced"] = "true"
+    served_model = model_router.get_served_model()
+    if served_model is not None:
+        response.headers["X-Model"] = served_model
+    accounting = token_budget.get_last_accounting()
+    if accounting is not None:
+        response.headers["X-Prompt-Tokens"] = str(accounting["total_tokens"])
+        if accounting["trimmed_files"]:
+            response.headers["X-Prompt-Trimmed-Files"] = str(len(accounting["trimmed_files"]))
+    validation = code_validator.get_outcome()
+    if validation is not None:
+        # "clean" (the audit was skipped), "repaired", "partial" (repaired answer, some violations left)
+        # or "unrepaired" (original answer kept)
+        response.headers["X-Validation"] = validation
+    usage = llm_services.get_last_usage()
+    if usage is not None:
+        # Share of the prompt upstream served from its prompt cache
+        response.headers["X-Cached-Prompt-Tokens"] = str(usage["cached_tokens"])
+    return response
+
+
+@ia_generator_bp.after_request
+def compress_response(response):
+    return response_compressor.compress(response, request.headers.get("Accept-Encoding", ""))
+
+
+@ia_generator_bp.after_request
+def capture_traffic(response):
+    # Registered last so it runs first, on the uncompressed body
+    capture = traffic_capture.traffic_capture
+    if request.method != "POST" or response.status_code == 413 or not capture.sampled():
+        return response
+    return traffic_capture.capture_response(response, {
+        "route": request.path.rsplit("/", 1)[-1],
+        "agent": (request.view_args or {}).get("agent"),
+        "stream": wants_stream(request),
+        "headers": {name: request.headers[name] for name in traffic_capture.REPLAYED_HEADERS if name in request.headers},
+        "request": request.get_json(silent=True),
+    }, capture_outcome)
+
+
+def capture_outcome() -> dict:
+    """
+    Request fields of a traffic capture record that are only known once the answer is complete.
+    """
+    accounting = token_budget.get_last_accounting()
+    return {
+        "upstream_ms": [round(seconds * 1000, 1) for seconds in llm_services.get_upstream_calls()],
+        "prompt_tokens": accounting["total_tokens"] if accounting is not None else None,
+        "model": model_router.get_served_model(),
+        "cache": get_cache_status(),
+    }
 
 
-ia_generator_bp = Blueprint('ia_generator', __name__)
-
 def get_question_from_request(req):
    
     data = req.get_json(silent=True)
@@ -49,255 +129,341 @@ def get_question_from_request(req):
     return data["question"]
 
 
-@ia_generator_bp.route("/", methods=["GET"])
-def ia_root():
-    return jsonify({"message": "Welcome to the IA Generator"})
+def wants_question_echo(data) -> bool:
+    """
+    Answers repeat the question unless the body sets `"echo_question": false` (default: ECHO_QUESTION).
 
+    Raises `ValueError` when `echo_question` is not a JSON boolean.
+    """
+    echo = data.get("echo_question") if isinstance(data, dict) else None
+    if echo is None:
+        return current_app.config.get("ECHO_QUESTION", True)
+    if not isinstance(echo, bool):
+        raise ValueError("`echo_question` must be true or false")
+    return echo
 
-# === SMART CONTRACT AGENTS ===
 
-@ia_generator_bp.route("/service_smartcontract_agent", methods=["POST"])
-def service_smartcontract_agent():
-    question = get_question_from_request(request)
-    if not question:
-        return jsonify({"error": "Missing `question` field"}), 400
-    try:
-        base_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
-        data_path = os.path.join(base_dir, "training_data", "smart_contract_data", "services_data")
-
-        answer = smart_contract_handler(
-            SERVICE_SMART_CONTRACT_PROMPT,
-            data_path,
-            question
-        )
-        return jsonify({"question": question, "answer": answer})
-    except Exception as e:
-        return jsonify({"error": str(e)}), 500
-
-
-@ia_generator_bp.route("/lib_smartcontract_agent", methods=["POST"])
-def lib_smartcontract_agent():
-    question = get_question_from_request(request)
+def get_retrieval_options(agent: str):
+    """
+    Retrieval settings for agents configured in "top-k" mode, `None` for "all" mode.
+    """
+    if agent not in current_app.config.get("RETRIEVAL_AGENTS", ()):
+        return None
+    return {
+        "top_k": current_app.config["RETRIEVAL_TOP_K"],
+        "token_budget": current_app.config["RETRIEVAL_TOKEN_BUDGET"],
+        "index_dir": current_app.config["RETRIEVAL_INDEX_DIR"],
+    }
+
+
+def get_agent_handler(agent: str):
+    """
+    Controller serving `agent`, chosen by the handler family of its spec.
+    """
+    return {
+        "smart_contract": smart_contract_handler,
+        "server": server_agent_handler,
+        "web3_abstraction": web3_abstraction_handler,
+        "frontend": frontend_agent_handler,
+    }[AGENTS[agent].handler]
+
+
+def build_agent_call(item: dict, stream: bool = False):
+    """
+    Turn a `{agent, question[, audit][, mode, source, filename]}` item into a zero-argument callable.
+
+    `"mode": "patch"` asks an agent with `patch_mode` for a patch of `source`
+    and makes the call return a dict (see `patch_handler`). Request-scoped
+    settings are resolved here, since the app config is not reachable from
+    the worker threads that run the call. Raises `ValueError` for an unknown
+    agent, a missing or non-string question or unsupported options.
+    """
+    agent = item.get("agent")
+    question = item.get("question")
+    if agent not in AGENTS:
+        raise ValueError(f"Unknown agent `{agent}`")
     if not question:
-        return jsonify({"error": "Missing `question` field"}), 400
-    try:
+        raise ValueError("Missing `question` field")
+    if not isinstance(question, str):
+        raise ValueError("`question` must be a string")
+    if "source" in item and not isinstance(item["source"], str):
+        raise ValueError("`source` must be a string")
+
+    spec = AGENTS[agent]
+    mode = item.get("mode", "full")
+    if mode == "patch":
+        if not spec.patch_mode:
+            raise ValueError(f"`mode: patch` is not supported by `{agent}`")
+        source = item.get("source")
+        if not isinstance(source, str) or not source.strip():
+            raise ValueError("`mode: patch` needs the current file in `source`")
+        if stream or item.get("audit"):
+            raise ValueError("`mode: patch` does not support streaming or `audit`")
+        options = {
+            "retrieval": get_retrieval_options(agent),
+            "model": spec.model,
+            "temperature": spec.temperature,
+            "filename": item.get("filename") or "service.rs",
+            "validation": spec.validation,
+            "audit_mode": spec.audit_mode or "state-contract",
+            "audit_model": spec.audit_model,
+        }
+        return lambda: patch_handler(spec.prompt, spec.training_path, question, source, **options)
+    if mode != "full":
+        raise ValueError("`mode` must be `full` or `patch`")
+
+    handler = get_agent_handler(agent)
+    options = {
+        "retrieval": get_retrieval_options(agent),
+        "stream": stream,
+        "model": spec.model,
+        "temperature": spec.temperature,
+        "validation": spec.validation,
+        "audit_model": spec.audit_model,
+    }
+    if item.get("audit"):
+        if spec.audit_mode is None:
+            raise ValueError(f"`audit` is only supported by smart contract agents, not `{agent}`")
+        options.update(audit=True, audit_mode=spec.audit_mode, audit_model=spec.audit_model)
+
+    return lambda: handler(spec.prompt, spec.training_path, question, **options)
+
+
+def answer_fields(answer) -> dict:
+    """
+    Response fields of a call result: patch calls return several, the others a single answer.
+    """
+    return answer if isinstance(answer, dict) else {"answer": answer}
+
+
+def wants_stream(req) -> bool:
+    """
+    Streaming is opt-in with `?stream=1` or `Accept: text/event-stream`.
+    """
+    if req.args.get("stream", "").lower() in ("1", "true", "yes"):
+        return True
+    return "text/event-stream" in req.headers.get("Accept", "")
+
+
+def upstream_error_response(error: OpenAIServiceError):
+    """
+    503 with Retry-After while the circuit breaker is open, 504 when upstream timed out, 500 otherwise.
+    """
+    response = jsonify({"error": str(error)})
+    if error.cause == "circuit_open":
+        response.headers["Retry-After"] = str(math.ceil(current_app.config.get("CIRCUIT_RESET_TIMEOUT", 30)))
+        return response, 503
+    if error.cause == "timeout":
+        return response, 504
+    return response, 500
+
+
+def sse_response(events):
+    """
+    Forward `(event, data)` pairs from the service layer as server-sent events.
+
+    Upstream failures after the stream started are reported as a final `error` event.
+    """
+    def generate():
+        try:
+            for event, data in events:
+                yield f"event: {event}\ndata: {json.dumps(data)}\n\n"
+        except Exception as e:
+            yield f"event: error\ndata: {json.dumps({'error': str(e)})}\n\n"
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
-        base_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
-        data_path = os.path.join(base_dir, "training_data", "smart_contract_data", "lib_rs_data")
-
-        answer = smart_contract_handler(
-            LIB_SMART_CONTRACT_PROMPT,
-            data_path,
-            question
-        )
-        return jsonify({"question": question, "answer": answer})
-    except Exception as e:
-        return jsonify({"error": str(e)}), 500
 
+@ia_generator_bp.route("/", methods=["GET"])
+def ia_root():
+    return jsonify({"message": "Welcome to the IA Generator"})
 
-@ia_generator_bp.route("/optimization_smartcontract_agent", methods=["POST"])
-def optimization_smartcontract_agent():
-    question = get_question_from_request(request)
-    if not question:
-        return jsonify({"error": "Missing `question` field"}), 400
-    try:
 
-        base_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
-        data_path = os.path.join(base_dir, "training_data", "smart_contract_data", "optimization_contracts")
+@ia_generator_bp.route("/corpus_cache", methods=["GET"])
+def corpus_cache_stats():
+    return jsonify(corpus_cache.stats())
 
-        answer = smart_contract_handler(
-            OPTIMIZATION_SMART_CONTRACT_PROMPT,
-            data_path,
-            question
-        )
-        return jsonify({"question": question, "answer": answer})
-    except Exception as e:
-        return jsonify({"error": str(e)}), 500
 
-# === SERVER AGENTS ===
+@ia_generator_bp.route("/response_cache", methods=["GET"])
+def response_cache_stats():
+    return jsonify(response_cache.stats())
 
-@ia_generator_bp.route("/client_server_agent", methods=["POST"])
-def client_server_agent():
-    question = get_question_from_request(request)
-    if not question:
-        return jsonify({"error": "Missing `question` field"}), 400
-    try:
 
-        base_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
-        data_path = os.path.join(base_dir, "training_data", "server_data", "client")
+@ia_generator_bp.route("/prompt_stats", methods=["GET"])
+def prompt_stats():
+    return jsonify(token_budget.prompt_stats.snapshot())
 
-        answer = server_agent_handler(
-            CLIENT_SERVER_PROMPT,
-            data_path,
-            question
-        )
-        return jsonify({"question": question, "answer": answer})
-    except Exception as e:
-        return jsonify({"error": str(e)}), 500
 
+@ia_generator_bp.route("/models", methods=["GET"])
+def model_stats():
+    return jsonify(model_router.model_router.stats())
 
-@ia_generator_bp.route("/script_server_agent", methods=["POST"])
-def script_server_agent():
-    question = get_question_from_request(request)
-    if not question:
-        return jsonify({"error": "Missing `question` field"}), 400
-    try:
 
-        base_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
-        data_path = os.path.join(base_dir, "training_data", "server_data", "script")
+@ia_generator_bp.route("/single_flight", methods=["GET"])
+def single_flight_stats():
+    return jsonify(singleflight.single_flight.stats())
 
-        answer = server_agent_handler(
-            SCRIPT_SERVER_PROMPT,
-            data_path,
-            question
-        )
-        return jsonify({"question": question, "answer": answer})
-    except Exception as e:
-        return jsonify({"error": str(e)}), 500
 
-# === WEB3 ABSTRACTION AGENTS ===
+# === AGENTS ===
 
-@ia_generator_bp.route("/gasless_ez_web3abstraction_agent", methods=["POST"])
-def gasless_ez_agent():
+@ia_generator_bp.route("/<agent>", methods=["POST"])
+def agent_route(agent):
+    """
+    Serve any agent of the registry; see `ia_generator.constants.agents.AGENTS`.
+    """
+    if agent not in AGENTS:
+        return jsonify({"error": f"Unknown agent `{agent}`"}), 404
     question = get_question_from_request(request)
     if not question:
         return jsonify({"error": "Missing `question` field"}), 400
+    if not isinstance(question, str):
+        return jsonify({"error": "`question` must be a string"}), 400
+    data = request.get_json(silent=True)
+    item = {key: data[key] for key in ("mode", "source", "filename") if key in data}
+    stream = wants_stream(request)
     try:
-
-        base_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
-        data_path = os.path.join(base_dir, "training_data", "web3_abstraction", "gasless_ez_transactions")
-
-        answer = web3_abstraction_handler(
-            GASLESS_EZ_WEB3_PROMPT,
-            data_path,
-            question
-        )
-        return jsonify({"question": question, "answer": answer})
-    except Exception as e:
-        return jsonify({"error": str(e)}), 500
-
-
-@ia_generator_bp.route("/signless_ez_web3abstraction_agent", methods=["POST"])
-def signless_ez_agent():
-    question = get_question_from_request(request)
-    if not question:
-        return jsonify({"error": "Missing `question` field"}), 400
+        call = build_agent_call({**item, "agent": agent, "question": question}, stream=stream)
+        echo = {"question": question} if wants_question_echo(data) else {}
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     try:
-
-        base_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
-        data_path = os.path.join(base_dir, "training_data", "web3_abstraction", "signless_ez_transactions")
-
-        answer = web3_abstraction_handler(
-            SIGNLESS_EZ_WEB3_PROMPT,
-            data_path,
-            question
-        )
-        return jsonify({"question": question, "answer": answer})
+        answer = call()
+        if stream:
+            return sse_response(answer)
+        return jsonify({**echo, **answer_fields(answer)})
+    except PromptBudgetError as e:
+        return jsonify({"error": e.message}), 413
+    except OpenAIServiceError as e:
+        return upstream_error_response(e)
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 
-@ia_generator_bp.route("/gasless_server_script_web3abstraction_agent", methods=["POST"])
-def gasless_server_agent():
+@ia_generator_bp.route("/audit_smartcontract", methods=["POST"])
+def audit_smartcontract_agent():
     question = get_question_from_request(request)
-    if not question:
-        return jsonify({"error": "Missing `question` field"}), 400
-    try:
 
-        base_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
-        data_path = os.path.join(base_dir, "training_data", "web3_abstraction", "gasless_server_script")
-
-        answer = web3_abstraction_handler(
-            GASLESS_SERVER_SCRIPT_PROMPT,
-            data_path,
-            question
-        )
-        return jsonify({"question": question, "answer": answer})
-    except Exception as e:
-        return jsonify({"error": str(e)}), 500
-
-
-@ia_generator_bp.route("/sailsjs_frontend_agent", methods=["POST"])
-def sailsjs_frontend_agent():
-    question = get_question_from_request(request)
-    if not question:
-        return jsonify({"error": "Missing `question` field"}), 400
+    if not question or not isinstance(question, str):
+        return jsonify({"error": "Data Error: empty or invalid input"}), 400
     try:
+        echo = {"question": question} if wants_question_echo(request.get_json(silent=True)) else {}
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
 
-        base_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
-        data_path = os.path.join(base_dir, "training_data", "frontend_data", "sails_js")
-
-        answer = frontend_agent_handler(
-            SAILSJS_PROMPT,
-            data_path,
-            question
-        )
-        return jsonify({"question": question, "answer": answer})
-    except Exception as e:
-        return jsonify({"error": str(e)}), 500
-
-
-@ia_generator_bp.route("/gearjs_frontend_agent", methods=["POST"])
-def gearjs_frontend_agent():
-    question = get_question_from_request(request)
-    if not question:
-        return jsonify({"error": "Missing `question` field"}), 400
     try:
 
-        base_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
-        data_path = os.path.join(base_dir, "training_data", "frontend_data", "gear_js")
-
-        answer = frontend_agent_handler(
-            GEARJS_PROMPT,
-            data_path,
-            question
-        )
-        return jsonify({"question": question, "answer": answer})
-    except Exception as e:
-        return jsonify({"error": str(e)}), 500
+        auditor = AuditService(model="gpt-4.1", audit_mode="service-contract")
+        if wants_stream(request):
+            return sse_response(auditor.stream_audit_response(question))
 
+        audited_answer = auditor.audit_code(question)
 
-@ia_generator_bp.route("/gearhooks_frontend_agent", methods=["POST"])
-def gearhooks_frontend_agent():
-    question = get_question_from_request(request)
-    if not question:
-        return jsonify({"error": "Missing `question` field"}), 400
-    try:
+        return jsonify({
+            **echo,
+            "answer": audited_answer
+        })
 
-        base_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
-        data_path = os.path.join(base_dir, "training_data", "frontend_data", "gear_hooks")
+    except OpenAIServiceError as e:
+        return upstream_error_response(e)
 
-        
-        answer = frontend_agent_handler(
-            GEARHOOKS_PROMPT,
-            data_path,
-            question
-        )
-        return jsonify({"question": question, "answer": answer})
     except Exception as e:
-        return jsonify({"error": str(e)}), 500
+        return jsonify({"error": f"Unexpected error: {str(e)}"}), 500
 
 
-@ia_generator_bp.route("/audit_smartcontract", methods=["POST"])
-def audit_smartcontract_agent():
-    question = get_question_from_request(request)
-
-    if not question:
+# === BATCH ===
+
+@ia_generator_bp.route("/batch", methods=["POST"])
+def batch_agent():
+    data = request.get_json(silent=True) or {}
+    items = data.get("items")
+    if not isinstance(items, list) or not items:
+        return jsonify({"error": "Missing `items` list"}), 400
+
+    max_items = current_app.config.get("BATCH_MAX_ITEMS", 20)
+    if len(items) > max_items:
+        return jsonify({"error": f"A batch accepts at most {max_items} items"}), 400
+
+    max_parallelism = current_app.config.get("BATCH_MAX_PARALLELISM", 4)
+    parallelism = data.get("parallelism", max_parallelism)
+    if not isinstance(parallelism, int) or parallelism < 1:
+        return jsonify({"error": "`parallelism` must be a positive integer"}), 400
+    parallelism = min(parallelism, max_parallelism, len(items))
+
+    calls = []
+    for item in items:
+        if not isinstance(item, dict):
+            calls.append((None, None, "Each item must be an object"))
+            continue
+        try:
+            calls.append((item.get("agent"), build_agent_call(item), None))
+        except ValueError as e:
+            calls.append((item.get("agent"), None, str(e)))
+
+    contexts = [contextvars.copy_context() for _ in calls]
+    with ThreadPoolExecutor(max_workers=parallelism) as pool:
+        futures = [
+            pool.submit(context.run, call) if call is not None else None
+            for context, (_, call, _) in zip(contexts, calls)
+        ]
+
+        results = []
+        for index, ((agent, _, error), future) in enumerate(zip(calls, futures)):
+            if future is not None:
+                try:
+                    answer = future.result()
+                    model = contexts[index].run(model_router.get_served_model)
+                    results.append({"index": index, "agent": agent, "model": model, **answer_fields(answer)})
+                    continue
+                except Exception as e:
+                    error = str(e)
+            results.append({"index": index, "agent": agent, "error": error})
+
+    failed = sum(1 for result in results if "error" in result)
+    return jsonify({"results": results, "succeeded": len(results) - failed, "failed": failed})
+
+
+# === JOBS ===
+
+@ia_generator_bp.route("/jobs", methods=["POST"])
+def submit_job():
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
         return jsonify({"error": "Data Error: empty or invalid input"}), 400
+    try:
+        call = build_agent_call(data)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
 
     try:
+        job = job_queue.submit(call, description={"agent": data["agent"]})
+    except JobQueueFullError as e:
+        response = jsonify({"error": e.message})
+        response.headers["Retry-After"] = str(current_app.config.get("JOBS_RETRY_AFTER", 30))
+        return response, 429
 
-        auditor = AuditService(model="gpt-4.1", audit_mode="service-contract")
-        audited_answer = auditor.audit_response(question)
+    response = jsonify(job.to_dict())
+    response.headers["Location"] = f"{request.script_root}{request.path}/{job.id}"
+    return response, 202
 
-        return jsonify({
-            "question": question,
-            "answer": audited_answer
-        })
 
-    except OpenAIServiceError as e:
-        return jsonify({"error": str(e)}), 500
+@ia_generator_bp.route("/jobs/<job_id>", methods=["GET"])
+def get_job(job_id):
+    try:
+        wait = float(request.args.get("wait", 0))
+    except ValueError:
+        return jsonify({"error": "`wait` must be a number of seconds"}), 400
+    wait = min(max(wait, 0.0), current_app.config.get("JOBS_MAX_WAIT", 30))
+
+    job = job_queue.wait(job_id, wait) if wait else job_queue.get(job_id)
+    if job is None:
+        return jsonify({"error": f"Unknown job `{job_id}`"}), 404
+    return jsonify(job)
 
-    except Exception as e:
-        return jsonify({"error": f"Unexpected error: {str(e)}"}), 500
 
+@ia_generator_bp.route("/jobs", methods=["GET"])
+def job_queue_stats():
+    return jsonify(job_queue.stats())
@@ -1,8 +1,134 @@
-import openai
-from openai import OpenAI
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+
 from ..exceptions.exceptions import OpenAIServiceError
+from .llm_services import (
+    generate_openai_chat_response,
+    generate_openai_chat_response_async,
+    stream_openai_chat_response,
+)
+from .model_router import get_served_model, model_router, set_served_model
+from .response_cache import content_version, get_cache_status, make_cache_key, merge_cache_status
+from ..utils.token_budget import token_counter
+from ..utils.metrics import metrics
+from ..utils.rust_chunks import RustChunker, extract_code
+from ..utils import code_validator
 from config import get_openai_api_key
 
+AUDIT_PROMPTS = {
+    "service-contract": (
+        "You are an expert auditor of smart contracts written in Rust for the Vara Network.\n"
+        "Only analyze and revise the code in the section marked as 'User code'.\n"
+        "Never include or reintroduce the `Program` definition or its implementation, under any circumstances. It already exists and must not be duplicated."
+        "System: Do not generate the `Program` struct, the `#[program]` block, or any module-level declarations. These are already defined elsewhere. Only audit and correct the user-defined logic inside services or modules as provided."
+        "Do not change the existing layout, naming conventions, or structure. Do not reformat or restructure. Only modify exactly what is requested."
+        "Your task is to **only** review the Rust code provided and apply changes **strictly where necessary**.\n"
+        "- Preserve the module organization, import structure, and state definitions as shared by the user.\n"
+        "Ensure that the main state struct is annotated **only** with the macro `#[derive(Debug, Clone, Default)]`"
+        " Be aware that `exec::block_height()` returns a `u32`. If this value is assigned to a field or variable of a larger numeric type (e.g., `u64`, `u128`), cast it explicitly using `as`, such as `exec::block_height() as u64`, to avoid type mismatch errors."
+        "If you detect that a function is unnecessarily generic (e.g., uses trait bounds like `M: AsMut<T> + Default` or generic map access), simplify it to use **explicit and concrete types** defined in the service, unless generics are explicitly required by the rest of the codebase."
+        "Always ensure that events are emitted using the pattern `self.emit_event(...).expect(.....)` to guarantee proper error handling and avoid silent failures."
+        "- Do not change the overall architecture.\n"
+        "- Only correct logic errors, unsafe patterns, or missing elements required for correct functionality or security.\n"
+        "- Avoid over-engineering or unnecessary optimization.\n"
+        "- Replace all floating-point numbers with `u128`\n"
+        "- Use safe arithmetic operations (addition, multiplication, division)\n"
+        "- Validate all function inputs to avoid overflows or panics\n"
+        "- Replace all `&str` with `String`\n"
+        "-Ensure the main service struct is always public for example: pub struct Service;"
+        "Critical: Validate that all string inputs have a maximum character length limit and ensure there is no overflow and add a brief inline comment using the format `// Auditor: [explanation of the change]`."
+        "Critical: Integers (u128, etc.): guard against overflows using safe arithmetic (checked_*, saturating_*) and add a brief inline comment using the format `// Auditor: [explanation of the change]`."
+        "Critical: Maps or storage collections: limit the number of entries to avoid unbounded growth and add a brief inline comment using the format `// Auditor: [explanation of the change]`."
+        "Critical: Vectors (Vec<T>): limit the maximum number of elements to prevent DoS attacks and add a brief inline comment using the format `// Auditor: [explanation of the change]`. "
+        "Critical: Ensure that whenever encode_call(...) is used in any contract call, the import use sails_rs::calls::ActionIo; is included."
+        "Critical: Ensure that all arithmetic in the smart contract uses overflow-safe methods like checked_*, U256, and try_into() with proper validations. Automatically correct unsafe math or unchecked casts to prevent silent overflows and add a brief inline comment using the format `// Auditor: [explanation of the change]`. "
+        "Avoid Rust borrow conflicts (E0502): perform immutable borrows before mutable ones, and ensure they don't overlap."
+        "Ensure that all structs, especially those containing nested types (e.g. enums or tuples), include all necessary traits in the #[derive(...)] macro to guarantee correct compilation and compatibility with serialization and copying mechanisms."
+        "- Fix borrow checker conflicts (e.g., overlapping mutable/immutable borrows) by reordering, cloning, or temporary variables\n"
+        "When you make a change, add a brief inline comment using the format `// Auditor: [explanation of the change]`."
+        "Do not include explanations outside the code.\n"
+        "\nUser code:\n{question}\n\nOnly return the final corrected Rust code — no explanations, no extra text."
+    ),
+    "lib-contract": (
+        "Review the following Rust service code and correct any errors or biases.\n"
+        "- Replace floating-point numbers with `u128`\n"
+        "- Use safe arithmetic for addition/multiplication/division\n"
+        "- Validate all function inputs\n"
+        "- Ensure `#[service]` macro is present in the struct\n"
+        "- Replace all `&str` with `String`\n"
+        "- Only return code for `service.rs`\n"
+        "- Fix borrow checker conflicts by reordering, cloning, or storing values\n\n"
+        "Input:\n{question}\n\nReturn only the revised Rust code."
+    ),
+    "frontend": (
+        "Review the following answer and correct any errors or biases, ensuring it is accurate and neutral.\n\n"
+        "Original question: {question}\n"
+        "Return the final revised and corrected version."
+    ),
+    "server": (
+        "Review the following answer and correct any errors or biases, ensuring it is accurate and neutral.\n\n"
+        "Original question: {question}\n"
+        "Return the final revised and corrected version."
+    ),
+    "web3-abstraction": (
+        "Review the following answer and correct any errors or biases, ensuring it is accurate and neutral.\n\n"
+        "Original question: {question}\n"
+        "Return the final revised and corrected version."
+    ),
+    "default": (
+        "Please review and correct the following answer. Add clarifications if needed:\n\n"
+        "Original question: {question}\n"
+        "Return the final improved version."
+    ),
+}
+
+# Targeted fix of the violations found by `code_validator`, sent instead of a full audit
+REPAIR_PROMPT = (
+    "You fix specific problems that a validator found in generated {language} code.\n"
+    "Fix only the listed problems. Keep everything else unchanged: layout, naming, comments and structure.\n"
+    "Return the whole corrected code in a single ```{fence} block, with no explanations."
+)
+
+# Language -> (name in the repair prompt, fence tag)
+_LANGUAGES = {"rust": ("Rust", "rust"), "typescript": ("TypeScript", "typescript")}
+
+# Each template splits into static instructions (system message) and the part around the audited answer
+_AUDIT_PROMPT_PARTS = {mode: template.split("{question}", 1) for mode, template in AUDIT_PROMPTS.items()}
+
+_chunking = {"chunk_chars": 4000, "max_workers": 4}
+_gate = {"enabled": True, "typescript_repair": False}
+
+
+def configure_audit_chunking(config) -> None:
+    """
+    Set how generated code is split for auditing, from the Flask config.
+    """
+    _chunking["chunk_chars"] = config.get("AUDIT_CHUNK_CHARS", 4000) or None
+    _chunking["max_workers"] = config.get("AUDIT_MAX_PARALLELISM", 4)
+
+
+def configure_audit_gate(config) -> None:
+    """
+    Whether audits of agents with validation rules run only when the offline validator finds problems.
+    """
+    _gate["enabled"] = config.get("AUDIT_VALIDATION_GATE", True)
+
+
+def audit_gate_enabled() -> bool:
+    return _gate["enabled"]
+
+
+def configure_typescript_repair(config) -> None:
+    """
+    Whether answers of TypeScript agents with validation rules are checked and repaired.
+    """
+    _gate["typescript_repair"] = config.get("TYPESCRIPT_REPAIR", False)
+
+
+def typescript_repair_enabled() -> bool:
+    return _gate["typescript_repair"]
+
+
 class AuditService:
    
     def __init__(self, model: str = "gpt-4.1-mini", audit_mode: str = "service-contract"):
@@ -14,94 +140,154 @@ class AuditService:
 
     def audit_response(self, question: str, temperature: float = 0.2) -> str:
       
-        openai.api_key = self.api_key
-        client = OpenAI()
-
         review_prompt = self._build_review_prompt(question)
+        cache_key = self._cache_key(review_prompt, temperature)
+        with metrics.timer("audit"):
+            return model_router.call(self._models(review_prompt), lambda model: generate_openai_chat_response(
+                review_prompt, model, temperature,
+                cache_key=cache_key,
+                error_prefix="Audit Error",
+            ))
+
+    def audit_code(self, code: str, temperature: float = 0.2) -> str:
+        """
+        Audit a whole answer; large Rust code is audited in chunks, see `audit_generated`.
+        """
+        return self.audit_generated([code], temperature)
+
+    def audit_generated(self, fragments, temperature: float = 0.2) -> str:
+        """
+        Audit code arriving as text `fragments`, e.g. the tokens of a generation stream.
+
+        Only the code is audited, not the prose or fences around it. Code is
+        cut after `impl` blocks into chunks of about `AUDIT_CHUNK_CHARS`; each
+        chunk is audited as soon as it is complete, in parallel with the rest
+        of the generation and with the other chunks, and the audited chunks
+        are joined back in order.
+        """
+        chunker = RustChunker(_chunking["chunk_chars"])
+        pool = ThreadPoolExecutor(max_workers=_chunking["max_workers"])
+        futures = []
+        contexts = []
+        generated = []
+
+        def submit(chunks):
+            for chunk in chunks:
+                contexts.append(contextvars.copy_context())
+                futures.append(pool.submit(contexts[-1].run, self.audit_response, chunk, temperature))
 
         try:
-            response = client.chat.completions.create(
-                model=self.model,
-                temperature=temperature,
-                store=True,
-                messages=[{"role": "user", "content": review_prompt}],
+            for fragment in fragments:
+                generated.append(fragment)
+                submit(chunker.feed(fragment))
+            submit(chunker.close())
+
+            if not chunker.clean:
+                # Several code blocks: audit the answer in one pass, as a whole
+                for future in futures:
+                    future.cancel()
+                answer = "".join(generated)
+                return self.audit_response(extract_code(answer) or answer, temperature)
+
+            audited = [future.result() for future in futures]
+        finally:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+        merge_cache_status(context.run(get_cache_status) for context in contexts)
+        set_served_model(contexts[-1].run(get_served_model))
+
+        if len(audited) == 1:
+            return audited[0]
+        merged = "\n\n".join((extract_code(chunk) or chunk).strip("\n") for chunk in audited)
+        return f"```rust\n{merged}\n```" if chunker.fenced else merged
+
+    def repair_response(self, answer: str, violations: list, language: str = "rust", temperature: float = 0.2) -> str:
+        """
+        Ask for a fix of only the `violations` found in `answer`.
+        """
+        repair_prompt = self._build_repair_prompt(answer, violations, language)
+        cache_key = self._cache_key(repair_prompt, temperature)
+        with metrics.timer("repair"):
+            return model_router.call(self._models(repair_prompt), lambda model: generate_openai_chat_response(
+                repair_prompt, model, temperature,
+                cache_key=cache_key,
+                error_prefix="Repair Error",
+            ))
+
+    def validate_and_repair(self, answer: str, rules, language: str = "rust", temperature: float = 0.2) -> str:
+        """
+        Check `answer` offline against `rules` and send a repair request only for what fails.
+
+        A clean answer is returned as it is, without any upstream call. The
+        repaired answer is only returned when it fails fewer rules than the
+        original (`PARTIAL` when it still fails some). The outcome is
+        recorded for the `X-Validation` header.
+        """
+        with metrics.timer("validate"):
+            violations = code_validator.validate(answer, rules, language)
+        if not violations:
+            code_validator.record_outcome(code_validator.CLEAN)
+            return answer
+
+        repaired = self.repair_response(answer, violations, language, temperature)
+        remaining = code_validator.validate(repaired, rules, language)
+        if len(remaining) >= len(violations):
+            code_validator.record_outcome(code_validator.UNREPAIRED)
+            return answer
+        code_validator.record_outcome(code_validator.PARTIAL if remaining else code_validator.REPAIRED)
+        return repaired
+
+    async def audit_response_async(self, question: str, temperature: float = 0.2) -> str:
+
+        review_prompt = self._build_review_prompt(question)
+        with metrics.timer("audit"):
+            return await generate_openai_chat_response_async(
+                review_prompt, self.model, temperature,
+                cache_key=self._cache_key(review_prompt, temperature),
+                error_prefix="Audit Error",
             )
-            audited_answer = response.choices[0].message.content
-            return audited_answer
-        except openai.error.OpenAIError as e:
-            raise OpenAIServiceError(f"Audit Error: {str(e)}")
-        except Exception as e:
-            raise OpenAIServiceError(f"Audit Error: {str(e)}")
-
-    def _build_review_prompt(self, question: str) -> str:
-
-        prompts = {
-             "service-contract": (
-                "You are an expert auditor of smart contracts written in Rust for the Vara Network.\n"
-                "Only analyze and revise the code in the section marked as 'User code'.\n"
-                "Never include or reintroduce the `Program` definition or its implementation, under any circumstances. It already exists and must not be duplicated."
-                "System: Do not generate the `Program` struct, the `#[program]` block, or any module-level declarations. These are already defined elsewhere. Only audit and correct the user-defined logic inside services or modules as provided."
-                "Do not change the existing layout, naming conventions, or structure. Do not reformat or restructure. Only modify exactly what is requested."
-                "Your task is to **only** review the Rust code provided and apply changes **strictly where necessary**.\n"
-                "- Preserve the module organization, import structure, and state definitions as shared by the user.\n"
-                "Ensure that the main state struct is annotated **only** with the macro `#[derive(Debug, Clone, Default)]`"
-                " Be aware that `exec::block_height()` returns a `u32`. If this value is assigned to a field or variable of a larger numeric type (e.g., `u64`, `u128`), cast it explicitly using `as`, such as `exec::block_height() as u64`, to avoid type mismatch errors."
-                "If you detect that a function is unnecessarily generic (e.g., uses trait bounds like `M: AsMut<T> + Default` or generic map access), simplify it to use **explicit and concrete types** defined in the service, unless generics are explicitly required by the rest of the codebase."
-                "Always ensure that events are emitted using the pattern `self.emit_event(...).expect(.....)` to guarantee proper error handling and avoid silent failures."
-                "- Do not change the overall architecture.\n"
-                "- Only correct logic errors, unsafe patterns, or missing elements required for correct functionality or security.\n"
-                "- Avoid over-engineering or unnecessary optimization.\n"
-                "- Replace all floating-point numbers with `u128`\n"
-                "- Use safe arithmetic operations (addition, multiplication, division)\n"
-                "- Validate all function inputs to avoid overflows or panics\n"
-                "- Replace all `&str` with `String`\n"
-                "-Ensure the main service struct is always public for example: pub struct Service;"
-                "Critical: Validate that all string inputs have a maximum character length limit and ensure there is no overflow and add a brief inline comment using the format `// Auditor: [explanation of the change]`."
-                "Critical: Integers (u128, etc.): guard against overflows using safe arithmetic (checked_*, saturating_*) and add a brief inline comment using the format `// Auditor: [explanation of the change]`."
-                "Critical: Maps or storage collections: limit the number of entries to avoid unbounded growth and add a brief inline comment using the format `// Auditor: [explanation of the change]`."
-                "Critical: Vectors (Vec<T>): limit the maximum number of elements to prevent DoS attacks and add a brief inline comment using the format `// Auditor: [explanation of the change]`. "
-                "Critical: Ensure that whenever encode_call(...) is used in any contract call, the import use sails_rs::calls::ActionIo; is included."
-                "Critical: Ensure that all arithmetic in the smart contract uses overflow-safe methods like checked_*, U256, and try_into() with proper validations. Automatically correct unsafe math or unchecked casts to prevent silent overflows and add a brief inline comment using the format `// Auditor: [explanation of the change]`. "
-                "Avoid Rust borrow conflicts (E0502): perform immutable borrows before mutable ones, and ensure they don't overlap."
-                "Ensure that all structs, especially those containing nested types (e.g. enums or tuples), include all necessary traits in the #[derive(...)] macro to guarantee correct compilation and compatibility with serialization and copying mechanisms."
-                "- Fix borrow checker conflicts (e.g., overlapping mutable/immutable borrows) by reordering, cloning, or temporary variables\n"
-                "When you make a change, add a brief inline comment using the format `// Auditor: [explanation of the change]`."
-                "Do not include explanations outside the code.\n"
-                "\nUser code:\n{question}\n\nOnly return the final corrected Rust code — no explanations, no extra text."
-),
-         "lib-contract": (
-                "Review the following Rust service code and correct any errors or biases.\n"
-                "- Replace floating-point numbers with `u128`\n"
-                "- Use safe arithmetic for addition/multiplication/division\n"
-                "- Validate all function inputs\n"
-                "- Ensure `#[service]` macro is present in the struct\n"
-                "- Replace all `&str` with `String`\n"
-                "- Only return code for `service.rs`\n"
-                "- Fix borrow checker conflicts by reordering, cloning, or storing values\n\n"
-                "Input:\n{question}\n\nReturn only the revised Rust code."
-        ),
-        "frontend": (
-            "Review the following answer and correct any errors or biases, ensuring it is accurate and neutral.\n\n"
-            "Original question: {question}\n"
-            "Return the final revised and corrected version."
-        ),
-        "server": (
-            "Review the following answer and correct any errors or biases, ensuring it is accurate and neutral.\n\n"
-            "Original question: {question}\n"
-            "Return the final revised and corrected version."
-        ),
-        "web3-abstraction": (
-            "Review the following answer and correct any errors or biases, ensuring it is accurate and neutral.\n\n"
-            "Original question: {question}\n"
-            "Return the final revised and corrected version."
-        ),
-        "default": (
-            "Please review and correct the following answer. Add clarifications if needed:\n\n"
-            "Original question: {question}\n"
-            "Return the final improved version."
-        ),
-    }
-
-        template = prompts.get(self.audit_mode, prompts["service-contract"])
-        return template.format(question=question)
 
+    def stream_audit_response(self, question: str, temperature: float = 0.2):
+        """
+        Stream the audited answer as `(event, data)` pairs, see `stream_openai_chat_response`.
+        """
+        review_prompt = self._build_review_prompt(question)
+        cache_key = self._cache_key(review_prompt, temperature)
+        return model_router.stream(self._models(review_prompt), lambda model: stream_openai_chat_response(
+            review_prompt, model, temperature,
+            error_prefix="Audit Error",
+            cache_key=cache_key,
+        ))
+
+    def _models(self, review_prompt: list) -> tuple:
+        # `self.model` is the default; routing rules for `audit:<mode>` can override it
+        system, *messages = review_prompt
+        prompt_tokens = token_counter.count_template(system["content"]) + sum(
+            token_counter.count(message["content"]) for message in messages
+        )
+        return model_router.route(f"audit:{self.audit_mode}", prompt_tokens, self.model)
+
+    def _cache_key(self, review_prompt: list, temperature: float) -> str:
+        # The review prompt already embeds both the audit template and the audited code
+        return make_cache_key(
+            agent=f"audit:{self.audit_mode}",
+            model=self.model,
+            temperature=temperature,
+            prompt=[content_version(message["content"]) for message in review_prompt],
+        )
+
+    def _build_review_prompt(self, question: str) -> list:
+        # The instructions are byte-identical for every call of a mode, so upstream can cache them
+        instructions, closing = _AUDIT_PROMPT_PARTS.get(self.audit_mode, _AUDIT_PROMPT_PARTS["service-contract"])
+        return [
+            {"role": "system", "content": instructions.rstrip()},
+            {"role": "user", "content": f"{question}{closing}"},
+        ]
+
+    def _build_repair_prompt(self, answer: str, violations: list, language: str) -> list:
+        name, fence = _LANGUAGES.get(language, _LANGUAGES["rust"])
+        problems = "\n".join(f"- {violation}" for violation in violations)
+        return [
+            {"role": "system", "content": REPAIR_PROMPT.format(language=name, fence=fence)},
+            {"role": "user", "content": f"Problems (line numbers refer to the answer below):\n{problems}\n\nAnswer:\n{answer}"},
+        ]
@@ -0,0 +1,258 @@
+import contextvars
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+import uuid
+
+from ..exceptions.exceptions import JobQueueFullError
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+
+class Job:
+
+    def __init__(self, fn, context: contextvars.Context, description: dict = None):
+        self.id = uuid.uuid4().hex
+        self.fn = fn
+        self.context = context
+        self.description = description or {}
+        self.status = QUEUED
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.done = threading.Event()
+
+    def to_dict(self) -> dict:
+        data = {
+            "job_id": self.id,
+            "status": self.status,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            **self.description,
+        }
+        if self.status == SUCCEEDED:
+            data["result"] = self.result
+        elif self.status == FAILED:
+            data["error"] = self.error
+        return data
+
+
+def _process_alive(pid) -> bool:
+    if pid is None:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class JobQueue:
+    """
+    Bounded in-process queue served by a pool of worker threads.
+
+    Workers start on the first submission. Finished jobs are kept for
+    `retention` seconds. When `store_path` is set, job snapshots are also
+    written to SQLite so any worker process on the host can answer a poll;
+    each row records the process running the job, and an unfinished job
+    whose process has exited is reported as failed.
+    """
+
+    def __init__(self, workers: int = 2, max_size: int = 100, retention: float = 3600, store_path: str = None):
+        self._lock = threading.Lock()
+        self._threads = []
+        self._jobs = {}
+        self._local = threading.local()
+        self._purged_at = 0.0
+        self.configure(workers, max_size, retention, store_path)
+
+    def configure(self, workers: int = 2, max_size: int = 100, retention: float = 3600, store_path: str = None) -> None:
+        """
+        Apply settings; must be called before the first submission starts the workers.
+        """
+        self.workers = workers
+        self.max_size = max_size
+        self.retention = retention
+        self.store_path = store_path
+        self._queue = queue.Queue(maxsize=max_size)
+        if store_path:
+            with self._store() as conn:
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS jobs ("
+                    " id TEXT PRIMARY KEY, data TEXT NOT NULL, updated_at REAL NOT NULL, pid INTEGER)"
+                )
+                if "pid" not in {row[1] for row in conn.execute("PRAGMA table_info(jobs)")}:
+                    conn.execute("ALTER TABLE jobs ADD COLUMN pid INTEGER")
+
+    def submit(self, fn, description: dict = None) -> Job:
+        """
+        Queue `fn` and return its job; raises `JobQueueFullError` when the queue is full.
+        """
+        job = Job(fn, contextvars.copy_context(), description)
+        self._start_workers()
+        # Registered and stored before a worker can see it, so its QUEUED row never replaces a later one
+        with self._lock:
+            self._jobs[job.id] = job
+        self._persist(job)
+        try:
+            self._queue.put_nowait(job)
+        except queue.Full:
+            with self._lock:
+                del self._jobs[job.id]
+            self._forget(job.id)
+            raise JobQueueFullError(f"Job queue is full ({self.max_size} pending jobs)")
+        return job
+
+    def get(self, job_id: str):
+        """
+        Return the job as a dict, or `None` if it is unknown or expired.
+        """
+        self._purge()
+        job = self._jobs.get(job_id)
+        if job is not None:
+            return job.to_dict()
+        return self._load(job_id)
+
+    def wait(self, job_id: str, timeout: float):
+        """
+        Like `get`, but block up to `timeout` seconds for the job to finish.
+        """
+        job = self._jobs.get(job_id)
+        if job is not None:
+            job.done.wait(timeout)
+            return job.to_dict()
+
+        deadline = time.monotonic() + timeout
+        data = self._load(job_id)
+        while data is not None and data["status"] in (QUEUED, RUNNING) and time.monotonic() < deadline:
+            time.sleep(min(0.25, max(0.0, deadline - time.monotonic())))
+            data = self._load(job_id)
+        return data
+
+    def shutdown(self, timeout: float = None) -> None:
+        """
+        Stop accepting work, let workers finish every queued job, then stop them.
+        """
+        with self._lock:
+            threads, self._threads = self._threads, []
+        for _ in threads:
+            self._queue.put(None)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for thread in threads:
+            thread.join(None if deadline is None else max(0.0, deadline - time.monotonic()))
+
+    def stats(self) -> dict:
+        with self._lock:
+            statuses = [job.status for job in self._jobs.values()]
+        return {
+            "workers": len(self._threads),
+            "pending": self._queue.qsize(),
+            "max_size": self.max_size,
+            **{status: statuses.count(status) for status in (QUEUED, RUNNING, SUCCEEDED, FAILED)},
+        }
+
+    def _start_workers(self) -> None:
+        if self._threads:
+            return
+        with self._lock:
+            while len(self._threads) < self.workers:
+                thread = threading.Thread(target=self._work, name=f"job-worker-{len(self._threads)}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def _work(self) -> None:
+        while True:
+            job = self._queue.get()
+            if job is None:
+                return
+            job.status = RUNNING
+            job.started_at = time.time()
+            self._persist(job)
+            try:
+                job.result = job.context.run(job.fn)
+                job.status = SUCCEEDED
+            except Exception as e:
+                job.error = str(e)
+                job.status = FAILED
+            job.finished_at = time.time()
+            job.fn = job.context = None
+            self._persist(job)
+            job.done.set()
+
+    def _purge(self) -> None:
+        now = time.time()
+        cutoff = now - self.retention
+        with self._lock:
+            expired = [
+                job_id for job_id, job in self._jobs.items()
+                if job.finished_at is not None and job.finished_at < cutoff
+            ]
+            for job_id in expired:
+                del self._jobs[job_id]
+            # Rows of every process expire here, at most once a minute
+            sweep = self.store_path and now - self._purged_at >= 60
+            if sweep:
+                self._purged_at = now
+        if sweep:
+            with self._store() as conn:
+                conn.execute("DELETE FROM jobs WHERE updated_at < ?", (cutoff,))
+
+    def _store(self) -> sqlite3.Connection:
+        # Connections are reopened after a fork: a preloaded master's one must not be shared
+        conn = getattr(self._local, "conn", None)
+        if conn is None or getattr(self._local, "key", None) != (self.store_path, os.getpid()):
+            os.makedirs(os.path.dirname(os.path.abspath(self.store_path)), exist_ok=True)
+            conn = sqlite3.connect(self.store_path, timeout=5.0)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+            self._local.key = (self.store_path, os.getpid())
+        return conn
+
+    def _persist(self, job: Job) -> None:
+        if not self.store_path:
+            return
+        with self._store() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO jobs (id, data, updated_at, pid) VALUES (?, ?, ?, ?)",
+                (job.id, json.dumps(job.to_dict()), time.time(), os.getpid()),
+            )
+
+    def _forget(self, job_id: str) -> None:
+        if not self.store_path:
+            return
+        with self._store() as conn:
+            conn.execute("DELETE FROM jobs WHERE id = ?", (job_id,))
+
+    def _load(self, job_id: str):
+        if not self.store_path:
+            return None
+        row = self._store().execute(
+            "SELECT data, pid FROM jobs WHERE id = ? AND updated_at >= ?", (job_id, time.time() - self.retention)
+        ).fetchone()
+        if not row:
+            return None
+        data, pid = json.loads(row[0]), row[1]
+        if data["status"] in (QUEUED, RUNNING) and pid != os.getpid() and not _process_alive(pid):
+            # The worker process exited (crash, restart, timeout) before finishing the job
+            now = time.time()
+            data.update(status=FAILED, error="The worker process running this job stopped", finished_at=now)
+            with self._store() as conn:
+                conn.execute(
+                    "UPDATE jobs SET data = ?, updated_at = ? WHERE id = ? AND pid IS ?",
+                    (json.dumps(data), now, job_id, pid),
+                )
+        return data
+
+
+job_queue = JobQueue()
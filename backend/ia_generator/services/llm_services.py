@@ -1,26 +1,293 @@
+import asyncio
+import contextvars
+import threading
+import time
+import weakref
+
 import openai
-from openai import OpenAI
+from openai import AsyncOpenAI, OpenAI
 from ..exceptions.exceptions import OpenAIServiceError
-from config import get_openai_api_key
+from .response_cache import model_cache_key, response_cache
+from .singleflight import single_flight
+from .upstream_policy import CircuitOpenError, upstream_policy
+from ..utils.metrics import metrics
+from config import get_openai_api_key, get_openai_base_url
+
+_client = None
+_client_lock = threading.Lock()
+# AsyncOpenAI connection pools are bound to the event loop that opened them
+_async_clients = weakref.WeakKeyDictionary()
+_last_usage = contextvars.ContextVar("upstream_usage", default=None)
+# Seconds of every upstream call of the current request; the list is shared with batch worker threads
+_upstream_calls = contextvars.ContextVar("upstream_calls", default=None)
+
+
+def get_openai_client() -> OpenAI:
+    """
+    Return the process-wide OpenAI client.
+
+    The client is created once and reused so its HTTP connection pool keeps
+    upstream connections alive across requests.
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                # Retries and timeouts are handled by `upstream_policy`
+                _client = OpenAI(api_key=get_openai_api_key(), base_url=get_openai_base_url(), max_retries=0)
+    return _client
+
+
+def get_async_openai_client() -> AsyncOpenAI:
+    """
+    Return the AsyncOpenAI client shared by every coroutine of the running event loop.
+    """
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        client = AsyncOpenAI(api_key=get_openai_api_key(), base_url=get_openai_base_url(), max_retries=0)
+        _async_clients[loop] = client
+    return client
+
+
+def reset_openai_clients() -> None:
+    """
+    Drop the shared clients, e.g. after a fork or when the configuration changed.
+    """
+    global _client
+    with _client_lock:
+        if _client is not None:
+            _client.close()
+        _client = None
+        _async_clients.clear()
+
+
+def classify_openai_error(error: Exception) -> str:
+    """
+    Coarse cause of an upstream failure, used as the `cause` of `OpenAIServiceError`.
+    """
+    if isinstance(error, CircuitOpenError):
+        return "circuit_open"
+    if isinstance(error, openai.APITimeoutError):
+        return "timeout"
+    if isinstance(error, openai.APIConnectionError):
+        return "connection"
+    if isinstance(error, openai.RateLimitError):
+        return "rate_limit"
+    if isinstance(error, (openai.AuthenticationError, openai.PermissionDeniedError)):
+        return "auth"
+    if isinstance(error, openai.APIStatusError):
+        return "server_error" if error.status_code >= 500 else "client_error"
+    if isinstance(error, openai.OpenAIError):
+        return "api_error"
+    return "unexpected"
+
+
+def _service_error(error_prefix: str, error: Exception) -> OpenAIServiceError:
+    cause = classify_openai_error(error)
+    metrics.record_error(cause)
+    if isinstance(error, openai.OpenAIError):
+        return OpenAIServiceError(f"{error_prefix}: {str(error)}", cause)
+    return OpenAIServiceError(f"Unexpected error: {str(error)}", cause)
+
+
+def _client_error(error: ValueError) -> OpenAIServiceError:
+    metrics.record_error("config")
+    return OpenAIServiceError(f"API key Error: {str(error)}", "config")
+
+
+def chat_messages(question) -> list:
+    """
+    `question` as chat messages: a plain string becomes a single user message.
+    """
+    if isinstance(question, str):
+        return [{"role": "user", "content": question}]
+    return list(question)
+
+
+def build_chat_request(question, model: str, temperature: float) -> dict:
+    return {
+        "model": model,
+        "temperature": temperature,
+        "store": True,
+        "messages": chat_messages(question),
+    }
+
+
+def cached_prompt_tokens(usage) -> int:
+    """
+    Prompt tokens upstream served from its prompt cache, 0 when not reported.
+    """
+    details = getattr(usage, "prompt_tokens_details", None)
+    return getattr(details, "cached_tokens", None) or 0
+
+
+def _record_usage(usage) -> None:
+    if usage is not None:
+        _last_usage.set({"prompt_tokens": usage.prompt_tokens or 0, "cached_tokens": cached_prompt_tokens(usage)})
+
+
+def _record_upstream_time(seconds: float) -> None:
+    calls = _upstream_calls.get()
+    if calls is not None:
+        calls.append(seconds)
+
+
+def begin_request() -> None:
+    _last_usage.set(None)
+    _upstream_calls.set([])
+
 
+def get_last_usage():
+    """
+    `{"prompt_tokens", "cached_tokens"}` of the last upstream answer in this context, if any.
+    """
+    return _last_usage.get()
 
-def generate_openai_chat_response(question: str, model: str = "gpt-4.1", temperature: float = 1.0) -> str:
-    api_key = get_openai_api_key()
-    if not api_key:
-        raise OpenAIServiceError("API key Error.")
 
-    openai.api_key = api_key
-    client = OpenAI()
+def get_upstream_calls() -> list:
+    """
+    Seconds spent in each upstream call answered in this request, in completion order.
+    """
+    return list(_upstream_calls.get() or ())
 
+
+def generate_openai_chat_response(question, model: str = "gpt-4.1", temperature: float = 1.0, cache_key: str = None, error_prefix: str = "OpenAI API error") -> str:
+    """
+    Return the completion of `question`, a prompt string or a list of chat messages.
+
+    With a `cache_key` the answer `model` gave is served from the response
+    cache when present, and concurrent calls with the same key and model
+    share one upstream request.
+    """
+    cache_key = model_cache_key(cache_key, model)
+    cached = response_cache.lookup(cache_key, temperature)
+    if cached is not None:
+        return cached
+
+    return single_flight.do(
+        cache_key,
+        lambda: _create_chat_completion(question, model, temperature, cache_key, error_prefix),
+    )
+
+
+def _create_chat_completion(question, model: str, temperature: float, cache_key: str, error_prefix: str) -> str:
+    try:
+        client = get_openai_client()
+    except ValueError as e:
+        raise _client_error(e)
+
+    metrics.record_prompt(chat_messages(question))
+    start = time.perf_counter()
+    try:
+        with metrics.timer("upstream"):
+            response = upstream_policy.call(
+                lambda timeout: client.chat.completions.create(**build_chat_request(question, model, temperature), timeout=timeout),
+                key=model,
+            )
+        answer = response.choices[0].message.content
+    except Exception as e:
+        raise _service_error(error_prefix, e)
+
+    _record_upstream_time(time.perf_counter() - start)
+    metrics.record_response(model, answer, response.usage)
+    _record_usage(response.usage)
+    response_cache.store(cache_key, temperature, answer)
+    return answer
+
+
+async def generate_openai_chat_response_async(question, model: str = "gpt-4.1", temperature: float = 1.0, cache_key: str = None, error_prefix: str = "OpenAI API error") -> str:
+    """
+    Async variant of `generate_openai_chat_response`; many calls can be in flight on one event loop.
+    """
+    cache_key = model_cache_key(cache_key, model)
+    cached = response_cache.lookup(cache_key, temperature)
+    if cached is not None:
+        return cached
+
+    try:
+        client = get_async_openai_client()
+    except ValueError as e:
+        raise _client_error(e)
+
+    metrics.record_prompt(chat_messages(question))
+    start = time.perf_counter()
+    try:
+        with metrics.timer("upstream"):
+            response = await upstream_policy.call_async(
+                lambda timeout: client.chat.completions.create(**build_chat_request(question, model, temperature), timeout=timeout),
+                key=model,
+            )
+        answer = response.choices[0].message.content
+    except Exception as e:
+        raise _service_error(error_prefix, e)
+
+    _record_upstream_time(time.perf_counter() - start)
+    metrics.record_response(model, answer, response.usage)
+    _record_usage(response.usage)
+    response_cache.store(cache_key, temperature, answer)
+    return answer
+
+
+def stream_openai_chat_response(question, model: str = "gpt-4.1", temperature: float = 1.0, error_prefix: str = "OpenAI API error", cache_key: str = None):
+    """
+    Stream a chat completion as `(event, data)` pairs.
+
+    Yields `("token", {"delta": text})` for every content fragment as it arrives
+    upstream, then a single `("done", {"model", "usage"})`. The cache is checked
+    immediately; the upstream call only starts when the stream is first iterated.
+    """
+    cache_key = model_cache_key(cache_key, model)
+    cached = response_cache.lookup(cache_key, temperature)
+    if cached is not None:
+        return iter([("token", {"delta": cached}), ("done", {"model": model, "usage": None, "cached": True})])
+    return _stream_chat_completion(question, model, temperature, error_prefix, cache_key)
+
+
+def _stream_chat_completion(question, model: str, temperature: float, error_prefix: str, cache_key: str):
+    try:
+        client = get_openai_client()
+    except ValueError as e:
+        raise _client_error(e)
+
+    metrics.record_prompt(chat_messages(question))
+    start = time.perf_counter()
     try:
-        response = client.chat.completions.create(
-            model=model,
-            temperature=temperature,
-            store=True,
-            messages=[{"role": "user", "content": question}],
+        # Only opening the stream is retried; tokens already sent cannot be taken back
+        stream = upstream_policy.call(
+            lambda timeout: client.chat.completions.create(
+                **build_chat_request(question, model, temperature),
+                stream=True,
+                stream_options={"include_usage": True},
+                timeout=timeout,
+            ),
+            key=model,
         )
-        return response.choices[0].message.content
-    except openai.error.OpenAIError as e:
-        raise OpenAIServiceError(f"OpenAI API error: {str(e)}")
     except Exception as e:
-        raise OpenAIServiceError(f"Unexpected error: {str(e)}")
+        raise _service_error(error_prefix, e)
+
+    try:
+        served_model = model
+        usage = None
+        parts = []
+        for chunk in stream:
+            served_model = chunk.model or served_model
+            if chunk.usage is not None:
+                usage = chunk.usage
+            for choice in chunk.choices:
+                if choice.delta is not None and choice.delta.content:
+                    if not parts:
+                        metrics.observe_stage("upstream_first_token", time.perf_counter() - start)
+                    parts.append(choice.delta.content)
+                    yield "token", {"delta": choice.delta.content}
+        answer = "".join(parts)
+        elapsed = time.perf_counter() - start
+        metrics.observe_stage("upstream", elapsed)
+        _record_upstream_time(elapsed)
+        metrics.record_response(served_model, answer, usage)
+        _record_usage(usage)
+        response_cache.store(cache_key, temperature, answer)
+        yield "done", {"model": served_model, "usage": usage.model_dump(exclude_none=True) if usage is not None else None}
+    except Exception as e:
+        upstream_policy.record_stream_failure(e, key=model)
+        raise _service_error(error_prefix, e)
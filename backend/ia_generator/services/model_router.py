@@ -0,0 +1,215 @@
+import contextvars
+import fnmatch
+import threading
+import time
+from collections import deque
+
+from ..exceptions.exceptions import OpenAIServiceError
+from .response_cache import HIT, get_cache_status
+
+STANDARD = "standard"
+
+# Failures worth retrying on another model; client errors would fail there too
+FALLBACK_CAUSES = {"timeout", "connection", "rate_limit", "server_error", "circuit_open"}
+
+# Small frontend, script and web3 prompts go to the faster model; everything else keeps the default
+DEFAULT_MODEL_ROUTES = [
+    {"agents": ["*"], "tiers": ["fast"], "model": "gpt-4.1-mini", "fallbacks": ["gpt-4.1"]},
+    {
+        "agents": ["*_frontend_agent", "script_server_agent", "*_web3abstraction_agent"],
+        "max_prompt_tokens": 8000,
+        "model": "gpt-4.1-mini",
+        "fallbacks": ["gpt-4.1"],
+    },
+]
+DEFAULT_MODEL_FALLBACKS = {"gpt-4.1": ["gpt-4.1-mini"], "gpt-4.1-mini": ["gpt-4.1"]}
+
+_tier = contextvars.ContextVar("model_router_tier", default=STANDARD)
+_served_model = contextvars.ContextVar("model_router_served_model", default=None)
+
+
+class ModelHealth:
+    """
+    Recent outcomes and latencies of one model, over a sliding time window.
+    """
+
+    def __init__(self, window: float = 300.0, max_samples: int = 200):
+        self.window = window
+        self._samples = deque(maxlen=max_samples)
+        self._lock = threading.Lock()
+
+    def record(self, ok: bool, seconds: float) -> None:
+        with self._lock:
+            self._samples.append((time.monotonic(), ok, seconds))
+
+    def snapshot(self) -> dict:
+        cutoff = time.monotonic() - self.window
+        with self._lock:
+            recent = [(ok, seconds) for at, ok, seconds in self._samples if at >= cutoff]
+        latencies = sorted(seconds for ok, seconds in recent if ok)
+        return {
+            "requests": len(recent),
+            "errors": sum(1 for ok, _ in recent if not ok),
+            "error_rate": sum(1 for ok, _ in recent if not ok) / len(recent) if recent else 0.0,
+            "p50_seconds": latencies[len(latencies) // 2] if latencies else 0.0,
+        }
+
+
+class ModelRouter:
+    """
+    Picks the models that serve an agent call and falls back between them.
+
+    Rules are checked in order; the first whose `agents` globs, `tiers` and
+    `max_prompt_tokens` match gives the model and its fallbacks. Without a
+    match the caller's default model is used with `fallbacks[default]`.
+    Models whose recent error rate exceeds `max_error_rate`, or whose median
+    latency exceeds the rule's `latency_slo`, are tried last.
+    """
+
+    def __init__(self, rules: list = None, fallbacks: dict = None, max_error_rate: float = 0.5, min_samples: int = 5, window: float = 300.0):
+        self.configure(rules, fallbacks, max_error_rate, min_samples, window)
+
+    def configure(self, rules: list = None, fallbacks: dict = None, max_error_rate: float = 0.5, min_samples: int = 5, window: float = 300.0) -> None:
+        self.rules = DEFAULT_MODEL_ROUTES if rules is None else rules
+        self.fallbacks = DEFAULT_MODEL_FALLBACKS if fallbacks is None else fallbacks
+        self.max_error_rate = max_error_rate
+        self.min_samples = min_samples
+        self.window = window
+        self._health = {}
+        self._lock = threading.Lock()
+
+    def route(self, agent: str, prompt_tokens: int, default_model: str) -> tuple:
+        """
+        Models to try for a call, best first.
+        """
+        tier = _tier.get()
+        slo = None
+        models = None
+        for rule in self.rules:
+            if not any(fnmatch.fnmatchcase(agent, pattern) for pattern in rule.get("agents", ["*"])):
+                continue
+            if "tiers" in rule and tier not in rule["tiers"]:
+                continue
+            if prompt_tokens > rule.get("max_prompt_tokens", float("inf")):
+                continue
+            models = [rule["model"], *rule.get("fallbacks", [])]
+            slo = rule.get("latency_slo")
+            break
+        if models is None:
+            models = [default_model, *self.fallbacks.get(default_model, [])]
+
+        models = list(dict.fromkeys(models))
+        healthy = [model for model in models if self._is_healthy(model, slo)]
+        return tuple(healthy + [model for model in models if model not in healthy])
+
+    def call(self, models: tuple, fn):
+        """
+        Return `fn(model)` for the first model that succeeds, falling back on upstream failures.
+        """
+        for index, model in enumerate(models):
+            start = time.perf_counter()
+            try:
+                result = fn(model)
+            except OpenAIServiceError as e:
+                self._record(model, False, time.perf_counter() - start)
+                if e.cause not in FALLBACK_CAUSES or index == len(models) - 1:
+                    raise
+                continue
+            if get_cache_status() != HIT:
+                self._record(model, True, time.perf_counter() - start)
+            _served_model.set(model)
+            return result
+
+    def stream(self, models: tuple, make_stream):
+        """
+        Stream `make_stream(model)`, switching models only while nothing has been sent yet.
+
+        Like the streams it wraps, nothing is requested until the first iteration.
+        """
+        for index, model in enumerate(models):
+            start = time.perf_counter()
+            events = iter(make_stream(model))
+            try:
+                first = next(events, None)
+            except OpenAIServiceError as e:
+                self._record(model, False, time.perf_counter() - start)
+                if e.cause not in FALLBACK_CAUSES or index == len(models) - 1:
+                    raise
+                continue
+
+            _served_model.set(model)
+            try:
+                if first is not None:
+                    yield first
+                yield from events
+            except OpenAIServiceError:
+                self._record(model, False, time.perf_counter() - start)
+                raise
+            if get_cache_status() != HIT:
+                self._record(model, True, time.perf_counter() - start)
+            return
+
+    def stats(self) -> dict:
+        with self._lock:
+            health = dict(self._health)
+        return {model: entry.snapshot() for model, entry in health.items()}
+
+    def health_samples(self) -> dict:
+        """
+        `{(model, stat): value}` for the metrics exposition.
+        """
+        return {
+            (model, stat): value
+            for model, snapshot in self.stats().items()
+            for stat, value in snapshot.items()
+        }
+
+    def _health_for(self, model: str) -> ModelHealth:
+        with self._lock:
+            health = self._health.get(model)
+            if health is None:
+                health = self._health[model] = ModelHealth(self.window)
+            return health
+
+    def _record(self, model: str, ok: bool, seconds: float) -> None:
+        self._health_for(model).record(ok, seconds)
+
+    def _is_healthy(self, model: str, slo: float = None) -> bool:
+        snapshot = self._health_for(model).snapshot()
+        if snapshot["requests"] < self.min_samples:
+            return True
+        if snapshot["error_rate"] > self.max_error_rate:
+            return False
+        return slo is None or snapshot["p50_seconds"] <= slo
+
+
+model_router = ModelRouter()
+
+
+def configure_model_router(config) -> None:
+    """
+    Set up the process-wide model router from the Flask config.
+    """
+    model_router.configure(
+        rules=config.get("MODEL_ROUTES"),
+        fallbacks=config.get("MODEL_FALLBACKS"),
+        max_error_rate=config.get("MODEL_MAX_ERROR_RATE", 0.5),
+        min_samples=config.get("MODEL_MIN_SAMPLES", 5),
+    )
+
+
+def begin_request(tier: str = None) -> None:
+    _tier.set(tier or STANDARD)
+    _served_model.set(None)
+
+
+def get_served_model():
+    return _served_model.get()
+
+
+def set_served_model(model: str) -> None:
+    """
+    Report the model of a call made in another context, e.g. a worker thread.
+    """
+    if model is not None:
+        _served_model.set(model)
@@ -0,0 +1,190 @@
+import contextvars
+import hashlib
+import random
+import re
+import threading
+import unicodedata
+from collections import OrderedDict
+
+from .response_cache import model_cache_key, response_cache
+
+NUM_PERMUTATIONS = 64
+LSH_BANDS = 16
+_ROWS = NUM_PERMUTATIONS // LSH_BANDS
+_MERSENNE_PRIME = (1 << 61) - 1
+_rng = random.Random(20240611)
+_PERMUTATIONS = [(_rng.randrange(1, _MERSENNE_PRIME), _rng.randrange(0, _MERSENNE_PRIME)) for _ in range(NUM_PERMUTATIONS)]
+
+_WORD = re.compile(r"[^\W_]+")
+# Politeness and filler words that do not change what is being asked for
+FILLER_WORDS = frozenset({"a", "an", "the", "please", "pls", "kindly", "can", "could", "would", "you", "me", "i", "just"})
+# Details a near-duplicate must share exactly: numbers, negations and code identifiers
+_NUMBER = re.compile(r"\d+(?:[.,_]\d+)*")
+_NEGATION = re.compile(r"\b(?:not|no|never|without|none|nor|cannot)\b|n['’]t\b")
+_IDENTIFIER = re.compile(r"`[^`]+`|[A-Za-z_$][\w$]*(?:(?:::|\.)[A-Za-z_$][\w$]*)*")
+_CODE_LIKE = re.compile(r"[_$\d]|[a-z][A-Z]|::|\.|`")
+
+_bypass = contextvars.ContextVar("near_duplicate_bypass", default=False)
+_similarity = contextvars.ContextVar("near_duplicate_similarity", default=None)
+
+
+def normalize_question(question: str) -> list:
+    """
+    Lowercase words of `question` without punctuation, whitespace differences or filler words.
+    """
+    text = unicodedata.normalize("NFKC", question).lower()
+    return [word for word in _WORD.findall(text) if word not in FILLER_WORDS]
+
+
+def exact_features(question: str) -> tuple:
+    """
+    Numbers, negations and identifiers of `question`, which a near-duplicate must repeat verbatim.
+
+    Identifiers are backquoted spans and words with an underscore, a digit,
+    a lower-to-upper case change or a `.`/`::` path.
+    """
+    text = unicodedata.normalize("NFKC", question)
+    numbers = [number.replace(",", "").replace("_", "") for number in _NUMBER.findall(text)]
+    negations = ["not" for _ in _NEGATION.finditer(text.lower())]
+    identifiers = [word.strip("`") for word in _IDENTIFIER.findall(_NUMBER.sub(" ", text)) if _CODE_LIKE.search(word)]
+    return tuple(sorted(numbers)), len(negations), tuple(sorted(identifiers))
+
+
+def minhash(question: str) -> tuple:
+    """
+    MinHash signature of the word bigrams (single words for one-word questions) of `question`.
+    """
+    words = normalize_question(question)
+    shingles = {" ".join(words[i:i + 2]) for i in range(max(1, len(words) - 1))} if words else {""}
+    hashes = [int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=8).digest(), "big") for s in shingles]
+    return tuple(min((a * h + b) % _MERSENNE_PRIME for h in hashes) for a, b in _PERMUTATIONS)
+
+
+def similarity(first: tuple, second: tuple) -> float:
+    """
+    Estimated Jaccard similarity of two signatures.
+    """
+    return sum(1 for x, y in zip(first, second) if x == y) / NUM_PERMUTATIONS
+
+
+class NearDuplicateCache:
+    """
+    Second cache tier: answers to questions that differ only in wording details.
+
+    Questions are indexed by MinHash signature with LSH buckets, per scope
+    (agent, model, template, corpus: everything in the cache key except the
+    question) and `exact_features`, so two questions can only match when
+    their numbers, negations and identifiers are the same. `resolve()` returns the response cache key of an indexed
+    question whose estimated similarity reaches the agent's threshold and
+    whose answer is still cached; otherwise it indexes the question under
+    its own key. Agents without a threshold are not indexed. The index keeps
+    the `max_entries` most recently used questions.
+    """
+
+    def __init__(self, thresholds: dict = None, max_entries: int = 2048):
+        self.configure(thresholds, max_entries)
+
+    def configure(self, thresholds: dict = None, max_entries: int = 2048) -> None:
+        self.thresholds = dict(thresholds or {})
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._buckets = {}
+        self.lookups = 0
+        self.hits = 0
+        self.bypassed = 0
+        self.evictions = 0
+
+    def resolve(self, agent: str, scope: str, question: str, key: str, temperature: float, model: str) -> str:
+        """
+        Cache key to look `question` up under: `key`, or that of a near-duplicate `model` has answered.
+        """
+        threshold = self.thresholds.get(agent)
+        if threshold is None or not response_cache.enabled or temperature > response_cache.max_temperature:
+            return key
+        if _bypass.get():
+            with self._lock:
+                self.bypassed += 1
+            return key
+
+        scope = (scope, exact_features(question))
+        signature = minhash(question)
+        with self._lock:
+            self.lookups += 1
+            candidates = {
+                candidate
+                for band in self._bands(scope, signature)
+                for candidate in self._buckets.get(band, ())
+                if candidate != key
+            }
+            scored = sorted(
+                ((similarity(signature, self._entries[candidate][1]), candidate) for candidate in candidates),
+                reverse=True,
+            )
+
+        for score, candidate in scored:
+            if score < threshold:
+                break
+            if response_cache.contains(model_cache_key(candidate, model)):
+                with self._lock:
+                    self.hits += 1
+                    if candidate in self._entries:
+                        self._entries.move_to_end(candidate)
+                _similarity.set(score)
+                return candidate
+
+        self._add(scope, signature, key)
+        return key
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "lookups": self.lookups,
+                "hits": self.hits,
+                "misses": self.lookups - self.hits,
+                "hit_rate": self.hits / self.lookups if self.lookups else 0.0,
+                "bypassed": self.bypassed,
+                "evictions": self.evictions,
+            }
+
+    @staticmethod
+    def _bands(scope: tuple, signature: tuple) -> list:
+        return [(scope, band, signature[band * _ROWS:(band + 1) * _ROWS]) for band in range(LSH_BANDS)]
+
+    def _add(self, scope: tuple, signature: tuple, key: str) -> None:
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return
+            self._entries[key] = (scope, signature)
+            for band in self._bands(scope, signature):
+                self._buckets.setdefault(band, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                old_key, (old_scope, old_signature) = self._entries.popitem(last=False)
+                for band in self._bands(old_scope, old_signature):
+                    bucket = self._buckets.get(band)
+                    if bucket is not None:
+                        bucket.discard(old_key)
+                        if not bucket:
+                            del self._buckets[band]
+                self.evictions += 1
+
+
+near_duplicate_cache = NearDuplicateCache()
+
+
+def configure_near_duplicate_cache(thresholds: dict = None, max_entries: int = 2048) -> None:
+    near_duplicate_cache.configure(thresholds, max_entries)
+
+
+def begin_request(bypass: bool = False) -> None:
+    _bypass.set(bypass)
+    _similarity.set(None)
+
+
+def get_similarity():
+    """
+    Similarity of the near-duplicate whose answer served this request, if any.
+    """
+    return _similarity.get()
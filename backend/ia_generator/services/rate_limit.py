@@ -0,0 +1,151 @@
+import math
+import os
+import sqlite3
+import threading
+import time
+
+from flask import current_app, request
+from limits.storage import Storage
+
+from ia_generator.constants.agents import AGENTS
+from ia_generator.utils.request_limits import exceeds_size_limit
+from ia_generator.utils.corpus_cache import corpus_cache
+from ia_generator.utils.token_budget import static_prompt_tokens, token_counter
+
+# Rough size of an audit pass (review template plus the audited answer) on top of the agent prompt
+AUDIT_OVERHEAD_TOKENS = 2000
+
+
+class SQLiteStorage(Storage):
+    """
+    Flask-Limiter storage shared by every worker process on the host.
+
+    Registered for `sqlite:///relative/path` and `sqlite:////absolute/path`
+    URIs. Supports the fixed-window strategy.
+    """
+
+    STORAGE_SCHEME = ["sqlite"]
+    PURGE_EVERY = 1000
+
+    def __init__(self, uri: str = None, wrap_exceptions: bool = False, **options):
+        path = uri.split("://", 1)[1]
+        self.path = path[1:] if path.startswith("/") else path
+        self._local = threading.local()
+        self._increments = 0
+        if os.path.dirname(self.path):
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        with self._connection() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS counters ("
+                " key TEXT PRIMARY KEY, value INTEGER NOT NULL, expires_at REAL NOT NULL)"
+            )
+        super().__init__(uri, wrap_exceptions=wrap_exceptions, **options)
+
+    @property
+    def base_exceptions(self):
+        return sqlite3.Error
+
+    def _connection(self) -> sqlite3.Connection:
+        # Connections are reopened after a fork: a preloaded master's one must not be shared
+        conn = getattr(self._local, "conn", None)
+        if conn is None or getattr(self._local, "pid", None) != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5.0)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def incr(self, key: str, expiry: int, amount: int = 1) -> int:
+        now = time.time()
+        with self._connection() as conn:
+            conn.execute(
+                "INSERT INTO counters (key, value, expires_at) VALUES (?, ?, ?)"
+                " ON CONFLICT(key) DO UPDATE SET"
+                "  value = CASE WHEN expires_at <= ? THEN excluded.value ELSE value + excluded.value END,"
+                "  expires_at = CASE WHEN expires_at <= ? THEN excluded.expires_at ELSE expires_at END",
+                (key, amount, now + expiry, now, now),
+            )
+            value = conn.execute("SELECT value FROM counters WHERE key = ?", (key,)).fetchone()[0]
+            self._increments += 1
+            if self._increments % self.PURGE_EVERY == 0:
+                conn.execute("DELETE FROM counters WHERE expires_at <= ?", (now,))
+        return value
+
+    def get(self, key: str) -> int:
+        row = self._connection().execute(
+            "SELECT value FROM counters WHERE key = ? AND expires_at > ?", (key, time.time())
+        ).fetchone()
+        return row[0] if row else 0
+
+    def get_expiry(self, key: str) -> float:
+        row = self._connection().execute(
+            "SELECT expires_at FROM counters WHERE key = ? AND expires_at > ?", (key, time.time())
+        ).fetchone()
+        return row[0] if row else time.time()
+
+    def check(self) -> bool:
+        try:
+            self._connection().execute("SELECT 1")
+            return True
+        except sqlite3.Error:
+            return False
+
+    def reset(self) -> int:
+        with self._connection() as conn:
+            return conn.execute("DELETE FROM counters").rowcount
+
+    def clear(self, key: str) -> None:
+        with self._connection() as conn:
+            conn.execute("DELETE FROM counters WHERE key = ?", (key,))
+
+
+def estimate_agent_tokens(agent: str, question: str = "", audit: bool = False, source: str = "") -> int:
+    """
+    Expected upstream input tokens of one call to `agent`; `source` is the file sent in patch mode.
+    """
+    spec = AGENTS[agent]
+    if agent in current_app.config.get("RETRIEVAL_AGENTS", []):
+        prompt_tokens = token_counter.count_template(spec.prompt) + current_app.config["RETRIEVAL_TOKEN_BUDGET"]
+    else:
+        prompt_tokens = static_prompt_tokens(
+            spec.prompt, corpus_cache.documents(spec.training_path), corpus_cache.fingerprint(spec.training_path),
+        )
+    question_tokens = sum(token_counter.count(text) for text in (question, source) if isinstance(text, str))
+    return prompt_tokens + question_tokens + (AUDIT_OVERHEAD_TOKENS if audit else 0)
+
+
+def estimate_request_tokens() -> int:
+    """
+    Expected upstream input tokens of the current request; 0 for requests that never reach upstream.
+    """
+    if request.method != "POST" or not request.blueprint:
+        return 0
+    if exceeds_size_limit(request):
+        # Rejected with 413 before its body is parsed
+        return 0
+    route = request.path.rsplit("/", 1)[-1]
+    data = request.get_json(silent=True)
+    data = data if isinstance(data, dict) else {}
+
+    if route in AGENTS:
+        return estimate_agent_tokens(route, data.get("question", ""), source=data.get("source", ""))
+    if route == "audit_smartcontract":
+        question = data.get("question", "")
+        return AUDIT_OVERHEAD_TOKENS + (token_counter.count(question) if isinstance(question, str) else 0)
+    if route in ("batch", "jobs"):
+        items = data.get("items") if route == "batch" else [data]
+        return sum(
+            estimate_agent_tokens(item["agent"], item.get("question", ""), bool(item.get("audit")), item.get("source", ""))
+            for item in (items if isinstance(items, list) else [])
+            if isinstance(item, dict) and item.get("agent") in AGENTS
+        )
+    return 0
+
+
+def request_cost() -> int:
+    """
+    Rate-limit cost of the current request in units of `RATELIMIT_TOKENS_PER_UNIT` tokens (at least 1).
+    """
+    tokens = estimate_request_tokens()
+    return max(1, math.ceil(tokens / current_app.config.get("RATELIMIT_TOKENS_PER_UNIT", 1000)))
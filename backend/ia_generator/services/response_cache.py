@@ -0,0 +1,255 @@
+import contextvars
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+HIT = "HIT"
+MISS = "MISS"
+BYPASS = "BYPASS"
+
+# Outcome of the last cache lookup and the bypass flag of the current request
+_cache_status = contextvars.ContextVar("response_cache_status", default=None)
+_cache_bypass = contextvars.ContextVar("response_cache_bypass", default=False)
+
+
+def make_cache_key(**parts) -> str:
+    """
+    Hash the parts that determine an answer (agent, model, temperature, template, corpus, question).
+    """
+    encoded = json.dumps(parts, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+def model_cache_key(key: str, model: str):
+    """
+    Key of the answer `model` gave to the call keyed `key`.
+
+    Calls are keyed independently of the model routing picked, so the
+    answers of a fast or fallback model are never served for another model.
+    """
+    return make_cache_key(call=key, model=model) if key is not None else None
+
+
+def content_version(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
+
+
+class MemoryCacheBackend:
+    """
+    In-process LRU store bounded by entry count and total answer size.
+    """
+
+    def __init__(self, max_entries: int = 512, max_bytes: int = 32 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at <= time.time():
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: str, ttl: float) -> None:
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (time.time() + ttl, value)
+            self._bytes += len(value)
+            while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+                self._remove(next(iter(self._entries)))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _remove(self, key: str) -> None:
+        _, value = self._entries.pop(key)
+        self._bytes -= len(value)
+
+
+class SQLiteCacheBackend:
+    """
+    On-disk store shared by every worker process on the host.
+
+    Expired rows are purged on write and the least recently read rows are
+    evicted beyond `max_entries`.
+    """
+
+    def __init__(self, path: str, max_entries: int = 4096):
+        self.path = path
+        self.max_entries = max_entries
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connection() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                " key TEXT PRIMARY KEY, value TEXT NOT NULL,"
+                " expires_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed_at)")
+
+    def _connection(self) -> sqlite3.Connection:
+        # Connections are reopened after a fork: a preloaded master's one must not be shared
+        conn = getattr(self._local, "conn", None)
+        if conn is None or getattr(self._local, "pid", None) != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5.0)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def get(self, key: str):
+        now = time.time()
+        with self._connection() as conn:
+            row = conn.execute(
+                "SELECT value FROM responses WHERE key = ? AND expires_at > ?", (key, now)
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+            return row[0]
+
+    def set(self, key: str, value: str, ttl: float) -> None:
+        now = time.time()
+        with self._connection() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO responses (key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, value, now + ttl, now),
+            )
+            conn.execute("DELETE FROM responses WHERE expires_at <= ?", (now,))
+            conn.execute(
+                "DELETE FROM responses WHERE key IN ("
+                " SELECT key FROM responses ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+
+    def clear(self) -> None:
+        with self._connection() as conn:
+            conn.execute("DELETE FROM responses")
+
+    def __len__(self):
+        return self._connection().execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+
+class ResponseCache:
+    """
+    Cache of upstream answers in front of the service layer.
+
+    Disabled until a backend is configured. Lookups record HIT, MISS or BYPASS
+    for the current request so routes can report it in the `X-Cache` header.
+    """
+
+    def __init__(self, backend=None, ttl: float = 3600, max_temperature: float = 0.5):
+        self.backend = backend
+        self.ttl = ttl
+        self.max_temperature = max_temperature
+        self.hits = 0
+        self.misses = 0
+        self.bypassed = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.backend is not None
+
+    def configure(self, backend, ttl: float = 3600, max_temperature: float = 0.5) -> None:
+        self.backend = backend
+        self.ttl = ttl
+        self.max_temperature = max_temperature
+
+    def lookup(self, key: str, temperature: float):
+        if key is None or self.backend is None or temperature > self.max_temperature:
+            return None
+        if _cache_bypass.get():
+            self.bypassed += 1
+            _cache_status.set(BYPASS)
+            return None
+
+        value = self.backend.get(key)
+        if value is None:
+            self.misses += 1
+            _cache_status.set(MISS)
+        else:
+            self.hits += 1
+            _cache_status.set(HIT)
+        return value
+
+    def contains(self, key: str) -> bool:
+        """
+        Whether an answer is stored under `key`, without recording a cache status.
+        """
+        return self.backend is not None and self.backend.get(key) is not None
+
+    def store(self, key: str, temperature: float, value: str) -> None:
+        if key is None or self.backend is None or temperature > self.max_temperature or not value:
+            return
+        self.backend.set(key, value, self.ttl)
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.backend is not None,
+            "backend": type(self.backend).__name__ if self.backend is not None else None,
+            "entries": len(self.backend) if self.backend is not None else 0,
+            "hits": self.hits,
+            "misses": self.misses,
+            "bypassed": self.bypassed,
+        }
+
+
+response_cache = ResponseCache()
+
+
+def configure_response_cache(config) -> None:
+    """
+    Set up the process-wide response cache from the Flask config.
+    """
+    kind = config.get("RESPONSE_CACHE_BACKEND", "none")
+    if kind == "memory":
+        backend = MemoryCacheBackend(config["RESPONSE_CACHE_MAX_ENTRIES"], config["RESPONSE_CACHE_MAX_BYTES"])
+    elif kind == "sqlite":
+        backend = SQLiteCacheBackend(config["RESPONSE_CACHE_PATH"], config["RESPONSE_CACHE_MAX_ENTRIES"])
+    elif kind == "none":
+        backend = None
+    else:
+        raise ValueError(f"Unknown RESPONSE_CACHE_BACKEND: {kind}")
+    response_cache.configure(
+        backend,
+        ttl=config.get("RESPONSE_CACHE_TTL", 3600),
+        max_temperature=config.get("RESPONSE_CACHE_MAX_TEMPERATURE", 0.5),
+    )
+
+
+def begin_request(bypass: bool = False) -> None:
+    _cache_status.set(None)
+    _cache_bypass.set(bypass)
+
+
+def get_cache_status():
+    return _cache_status.get()
+
+
+def merge_cache_status(statuses) -> None:
+    """
+    Record the combined status of lookups made in other contexts, e.g. worker threads.
+
+    The answer counts as a HIT only when every lookup hit.
+    """
+    statuses = {status for status in statuses if status is not None}
+    if statuses:
+        _cache_status.set(BYPASS if BYPASS in statuses else HIT if statuses == {HIT} else MISS)
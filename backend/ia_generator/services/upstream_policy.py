@@ -0,0 +1,257 @@
+import asyncio
+import email.utils
+import random
+import threading
+import time
+
+import openai
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+_STATE_CODES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+class CircuitOpenError(openai.OpenAIError):
+    """
+    Raised without calling upstream while the circuit breaker is open.
+    """
+    def __init__(self, retry_after: float):
+        super().__init__(f"upstream unavailable, circuit open for another {retry_after:.0f}s")
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """
+    Fails fast after `failure_threshold` consecutive upstream failures.
+
+    After `reset_timeout` seconds a single probe call is let through
+    (half-open); its outcome closes the circuit or opens it again.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self.failures = 0
+        self.opened = 0
+        self.rejected = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def before_call(self) -> None:
+        with self._lock:
+            if self.state == CLOSED:
+                return
+            remaining = self._opened_at + self.reset_timeout - time.monotonic()
+            if self.state == OPEN and remaining <= 0:
+                self.state = HALF_OPEN
+            if self.state == HALF_OPEN and not self._probing:
+                self._probing = True
+                return
+            self.rejected += 1
+            raise CircuitOpenError(max(remaining, 0.0))
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.state = CLOSED
+            self.failures = 0
+            self._probing = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            self._probing = False
+            if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != OPEN:
+                    self.opened += 1
+                self.state = OPEN
+                self._opened_at = time.monotonic()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "state": self.state,
+                "state_code": _STATE_CODES[self.state],
+                "consecutive_failures": self.failures,
+                "opened": self.opened,
+                "rejected": self.rejected,
+            }
+
+
+def is_retryable(error: Exception) -> bool:
+    if isinstance(error, (openai.APITimeoutError, openai.APIConnectionError, openai.RateLimitError)):
+        return True
+    return isinstance(error, openai.APIStatusError) and (error.status_code >= 500 or error.status_code in (408, 409))
+
+
+def is_upstream_failure(error: Exception) -> bool:
+    """
+    Errors that say upstream is unhealthy; these count towards opening the circuit.
+    """
+    if isinstance(error, (openai.APITimeoutError, openai.APIConnectionError)):
+        return True
+    return isinstance(error, openai.APIStatusError) and error.status_code >= 500
+
+
+def retry_after_seconds(error: Exception):
+    """
+    Delay requested by upstream through `retry-after-ms` or `retry-after`, if any.
+    """
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    headers = response.headers
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000
+        value = headers.get("retry-after")
+        if not value:
+            return None
+        try:
+            return float(value)
+        except ValueError:
+            return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class UpstreamPolicy:
+    """
+    Per-call deadline, jittered exponential retries and circuit breakers around upstream calls.
+
+    `call(fn, key)` invokes `fn(timeout)`, where `timeout` is the time left for
+    that attempt. Retries use full jitter unless upstream sent Retry-After,
+    and stop when the next attempt could not start before the deadline.
+    Each `key` (the model) has its own breaker, so a fallback model stays
+    usable while the primary one is failing.
+    """
+
+    def __init__(self, timeout: float = 120.0, deadline: float = 300.0, max_retries: int = 3, backoff_base: float = 0.5, backoff_max: float = 8.0, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.sleep = time.sleep
+        self.configure(timeout, deadline, max_retries, backoff_base, backoff_max, failure_threshold, reset_timeout)
+
+    def configure(self, timeout: float = 120.0, deadline: float = 300.0, max_retries: int = 3, backoff_base: float = 0.5, backoff_max: float = 8.0, failure_threshold: int = 5, reset_timeout: float = 30.0) -> None:
+        self.timeout = timeout
+        self.deadline = deadline
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.breakers = {}
+        self._breakers_lock = threading.Lock()
+        self.attempts = 0
+        self.retries = 0
+
+    def breaker(self, key: str = None) -> CircuitBreaker:
+        with self._breakers_lock:
+            breaker = self.breakers.get(key)
+            if breaker is None:
+                breaker = self.breakers[key] = CircuitBreaker(self.failure_threshold, self.reset_timeout)
+            return breaker
+
+    def call(self, fn, key: str = None):
+        breaker = self.breaker(key)
+        deadline = time.monotonic() + self.deadline
+        attempt = 0
+        while True:
+            breaker.before_call()
+            self.attempts += 1
+            try:
+                result = fn(self._attempt_timeout(deadline))
+            except Exception as e:
+                delay = self._after_failure(breaker, e, attempt, deadline)
+                if delay is None:
+                    raise
+                self.sleep(delay)
+                attempt += 1
+                continue
+            breaker.record_success()
+            return result
+
+    async def call_async(self, fn, key: str = None):
+        breaker = self.breaker(key)
+        deadline = time.monotonic() + self.deadline
+        attempt = 0
+        while True:
+            breaker.before_call()
+            self.attempts += 1
+            try:
+                result = await fn(self._attempt_timeout(deadline))
+            except Exception as e:
+                delay = self._after_failure(breaker, e, attempt, deadline)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+                attempt += 1
+                continue
+            breaker.record_success()
+            return result
+
+    def record_stream_failure(self, error: Exception, key: str = None) -> None:
+        """
+        Report a failure that happened after `call` returned, e.g. while reading a stream.
+        """
+        if is_upstream_failure(error):
+            self.breaker(key).record_failure()
+
+    def stats(self) -> dict:
+        """
+        Totals over every breaker; `state` is the worst state of any of them.
+        """
+        with self._breakers_lock:
+            breakers = [breaker.stats() for breaker in self.breakers.values()]
+        worst = max(breakers, key=lambda stats: stats["state_code"], default=CircuitBreaker().stats())
+        return {
+            "state": worst["state"],
+            "state_code": worst["state_code"],
+            "open_circuits": sum(1 for stats in breakers if stats["state"] == OPEN),
+            "opened": sum(stats["opened"] for stats in breakers),
+            "rejected": sum(stats["rejected"] for stats in breakers),
+            "attempts": self.attempts,
+            "retries": self.retries,
+        }
+
+    def _attempt_timeout(self, deadline: float) -> float:
+        return max(0.001, min(self.timeout, deadline - time.monotonic()))
+
+    def _after_failure(self, breaker: CircuitBreaker, error: Exception, attempt: int, deadline: float):
+        """
+        Record the failure and return the delay before the next attempt, or None to give up.
+        """
+        if is_upstream_failure(error):
+            breaker.record_failure()
+        else:
+            # Upstream answered (e.g. 400 or 429): it is reachable
+            breaker.record_success()
+
+        if not is_retryable(error) or attempt >= self.max_retries:
+            return None
+        delay = retry_after_seconds(error)
+        if delay is None:
+            delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+        if time.monotonic() + delay >= deadline:
+            return None
+        self.retries += 1
+        return delay
+
+
+upstream_policy = UpstreamPolicy()
+
+
+def configure_upstream_policy(config) -> None:
+    """
+    Set up the process-wide upstream policy from the Flask config.
+    """
+    upstream_policy.configure(
+        timeout=config.get("UPSTREAM_TIMEOUT", 120.0),
+        deadline=config.get("UPSTREAM_DEADLINE", 300.0),
+        max_retries=config.get("UPSTREAM_MAX_RETRIES", 3),
+        backoff_base=config.get("UPSTREAM_BACKOFF_BASE", 0.5),
+        backoff_max=config.get("UPSTREAM_BACKOFF_MAX", 8.0),
+        failure_threshold=config.get("CIRCUIT_FAILURE_THRESHOLD", 5),
+        reset_timeout=config.get("CIRCUIT_RESET_TIMEOUT", 30.0),
+    )
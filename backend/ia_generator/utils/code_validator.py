@@ -0,0 +1,241 @@
+import contextvars
+import re
+from dataclasses import dataclass
+
+from ia_generator.utils.metrics import metrics
+
+CLEAN = "clean"
+REPAIRED = "repaired"
+# The repair fixed some violations but not all; the repaired answer is returned
+PARTIAL = "partial"
+UNREPAIRED = "unrepaired"
+
+_FENCE = re.compile(r"^```([^\n]*)\n(.*?)^```", re.MULTILINE | re.DOTALL)
+_RUST_CHAR = re.compile(r"'(\\(x[0-9a-fA-F]{2}|u\{[0-9a-fA-F]+\}|.)|[^\\'\n])'")
+_RUST_RAW_STRING = re.compile(r'b?r(#*)"')
+_CLOSERS = {")": "(", "]": "[", "}": "{"}
+# A `/` after one of these starts a TypeScript regex literal rather than a division
+_REGEX_AFTER_CHARS = set("(,=:[!&|?{};+-*%~^")
+_REGEX_AFTER_WORDS = {"return", "typeof", "case", "do", "else", "in", "of", "new", "delete", "void", "throw", "yield", "await"}
+_LAST_WORD = re.compile(r"([A-Za-z_$][\w$]*)\s*$")
+
+# Outcome of the last validation of the current request, for the `X-Validation` header
+_outcome = contextvars.ContextVar("validation_outcome", default=None)
+
+
+@dataclass(frozen=True)
+class Violation:
+    rule: str
+    message: str
+    line: int = None
+
+    def __str__(self):
+        return f"line {self.line}: {self.message}" if self.line else self.message
+
+
+def code_blocks(answer: str) -> list:
+    """
+    `(first line, code)` of every fenced block of `answer`, or of the whole answer when it has none.
+    """
+    blocks = [
+        (answer.count("\n", 0, match.start(2)) + 1, match.group(2))
+        for match in _FENCE.finditer(answer)
+    ]
+    return blocks or [(1, answer)]
+
+
+def _regex_literal_end(code: str, i: int, before: str):
+    """
+    End of the TypeScript regex literal starting with the `/` at `i`, or None when that `/` is not one.
+
+    `before` is the (masked) code just before `i`. A regex literal ends on its line.
+    """
+    previous = before.rstrip()
+    word = _LAST_WORD.search(previous)
+    if previous and previous[-1] not in _REGEX_AFTER_CHARS and not (word and word.group(1) in _REGEX_AFTER_WORDS):
+        return None
+    j, in_class = i + 1, False
+    while j < len(code) and code[j] != "\n":
+        if code[j] == "\\":
+            j += 1
+        elif code[j] == "[":
+            in_class = True
+        elif code[j] == "]":
+            in_class = False
+        elif code[j] == "/" and not in_class:
+            j += 1
+            while j < len(code) and code[j].isalpha():
+                j += 1
+            return j
+        j += 1
+    return None
+
+
+def mask_literals(code: str, language: str = "rust"):
+    """
+    `code` with comments and string or char literals blanked out, plus an error for an unterminated one.
+
+    Line breaks are kept, so offsets and line numbers still match `code`.
+    Outside Rust, regex literals are blanked too, and a quote not closed on
+    its line is left as text, as in the JSX text `<p>Don't</p>`.
+    """
+    out = []
+    i, n = 0, len(code)
+    while i < n:
+        c = code[i]
+        if code.startswith("//", i):
+            end = code.find("\n", i)
+            end = n if end == -1 else end
+        elif code.startswith("/*", i):
+            end, depth, j = None, 1, i + 2
+            while j < n:
+                if code.startswith("*/", j):
+                    depth -= 1
+                    j += 2
+                    if depth == 0 or language != "rust":
+                        end = j
+                        break
+                elif language == "rust" and code.startswith("/*", j):
+                    depth += 1
+                    j += 2
+                else:
+                    j += 1
+            if end is None:
+                return "".join(out), "unterminated block comment"
+        else:
+            raw = _RUST_RAW_STRING.match(code, i) if language == "rust" and (i == 0 or not code[i - 1].isalnum() and code[i - 1] != "_") else None
+            char = _RUST_CHAR.match(code, i) if language == "rust" and c == "'" else None
+            regex = _regex_literal_end(code, i, "".join(out[-32:])) if language != "rust" and c == "/" else None
+            if raw:
+                closing = '"' + raw.group(1)
+                end = code.find(closing, raw.end())
+                if end == -1:
+                    return "".join(out), "unterminated raw string"
+                end += len(closing)
+            elif char:
+                end = char.end()
+            elif regex:
+                end = regex
+            elif c == '"' or (language != "rust" and c in "'`"):
+                j = i + 1
+                while j < n and code[j] != c:
+                    if code[j] == "\n" and c != "`" and language != "rust":
+                        break
+                    j += 2 if code[j] == "\\" else 1
+                if language != "rust" and c != "`" and (j >= n or code[j] == "\n"):
+                    out.append(c)
+                    i += 1
+                    continue
+                if j >= n or code[j] != c:
+                    return "".join(out), "unterminated string literal"
+                end = j + 1
+            else:
+                out.append(c)
+                i += 1
+                continue
+        out.append(re.sub(r"[^\n]", " ", code[i:end]))
+        i = end
+    return "".join(out), None
+
+
+def _line(code: str, offset: int, first_line: int) -> int:
+    return first_line + code.count("\n", 0, offset)
+
+
+def _check_balanced(masked: str, first_line: int) -> list:
+    stack = []
+    for i, c in enumerate(masked):
+        if c in "([{":
+            stack.append((c, i))
+        elif c in _CLOSERS:
+            if not stack or stack[-1][0] != _CLOSERS[c]:
+                return [Violation("balanced", f"unmatched `{c}`", _line(masked, i, first_line))]
+            stack.pop()
+    if stack:
+        c, i = stack[-1]
+        return [Violation("balanced", f"`{c}` is never closed", _line(masked, i, first_line))]
+    return []
+
+
+def _pattern(rule: str, pattern: str, message: str, forbidden: bool = True):
+    """
+    Rule over masked code: `pattern` must not occur (`forbidden`) or must occur at least once.
+    """
+    regex = re.compile(pattern, re.MULTILINE)
+
+    def check(masked: str, first_line: int) -> list:
+        if forbidden:
+            return [Violation(rule, message, _line(masked, match.start(), first_line)) for match in regex.finditer(masked)]
+        return [] if regex.search(masked) else [Violation(rule, message)]
+
+    return check
+
+
+# Rule name -> check of one code block (masked) or of the whole answer; `fence` looks at the answer
+RULES = {
+    "fence": None,
+    "balanced": _check_balanced,
+    "service_macro": _pattern("service_macro", r"#\[(\w+::)*service(\(.*\))?\]", "missing `#[service]` macro", forbidden=False),
+    "no_program": _pattern("no_program", r"#\[(\w+::)*program(\(.*\))?\]|\bstruct\s+Program\b", "`Program` must not be redefined"),
+    "no_std": _pattern("no_std", r"#!\[no_std\]", "missing `#![no_std]`", forbidden=False),
+    "program": _pattern("program", r"\bpub\s+struct\s+Program\s*;", "missing `pub struct Program;`", forbidden=False),
+    "no_str_ref": _pattern("no_str_ref", r"&\s*('\w+\s+)?(mut\s+)?str\b", "`&str` is not allowed, use `String`"),
+    "no_floats": _pattern("no_floats", r"\bf(32|64)\b|(?<![\w.])\d[\d_]*\.\d", "floating-point numbers are not allowed, use `u128`"),
+    "no_any": _pattern("no_any", r"(:|\bas|<|,|\|)\s*any\b", "`any` is not allowed, type the value explicitly"),
+}
+_ANSWER_RULES = {"service_macro", "no_std", "program"}
+
+
+def validate(answer: str, rules, language: str = "rust") -> list:
+    """
+    Violations of `rules` (names from RULES) in a generated answer, in answer line numbers.
+
+    Only the code is checked: the fenced blocks of the answer, or the whole
+    answer when it is not fenced. Presence rules pass when any block matches.
+    """
+    violations = []
+    blocks = code_blocks(answer)
+    masked_blocks = []
+    for first_line, code in blocks:
+        masked, error = mask_literals(code, language)
+        if error is not None:
+            if "balanced" in rules:
+                violations.append(Violation("balanced", error, _line(code, len(masked), first_line)))
+            masked = masked + re.sub(r"[^\n]", " ", code[len(masked):])
+        masked_blocks.append((first_line, masked))
+
+    for rule in rules:
+        if rule == "fence":
+            tags = ("rust",) if language == "rust" else ("typescript", "ts", "tsx")
+            if not any(match.group(1).strip() in tags for match in _FENCE.finditer(answer)):
+                violations.append(Violation("fence", f"the code is not in a ```{tags[0]} block"))
+        elif rule in _ANSWER_RULES:
+            joined = "\n".join(masked for _, masked in masked_blocks)
+            violations.extend(RULES[rule](joined, 1))
+        else:
+            for first_line, masked in masked_blocks:
+                violations.extend(RULES[rule](masked, first_line))
+    return violations
+
+
+def check_rules(rules) -> tuple:
+    """
+    `rules` as a tuple; raises `ValueError` for names missing from RULES.
+    """
+    unknown = set(rules) - set(RULES)
+    if unknown:
+        raise ValueError(f"Unknown validation rules: {', '.join(sorted(unknown))}")
+    return tuple(rules)
+
+
+def begin_request() -> None:
+    _outcome.set(None)
+
+
+def record_outcome(outcome: str) -> None:
+    _outcome.set(outcome)
+    metrics.record_validation(outcome)
+
+
+def get_outcome():
+    return _outcome.get()
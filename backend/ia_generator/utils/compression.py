@@ -0,0 +1,122 @@
+import gzip
+import threading
+
+try:
+    import brotli
+except ImportError:  # optional: `pip install brotli` adds `br` to the negotiated encodings
+    brotli = None
+
+COMPRESSIBLE_MIMETYPES = ("application/json", "text/plain", "text/html")
+
+
+def parse_accept_encoding(header: str) -> dict:
+    """
+    Encoding -> q-value of an `Accept-Encoding` header.
+    """
+    accepted = {}
+    for item in (header or "").split(","):
+        name, _, params = item.strip().partition(";")
+        if not name:
+            continue
+        quality = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        accepted[name.strip().lower()] = quality
+    return accepted
+
+
+class ResponseCompressor:
+    """
+    Negotiated gzip or brotli compression of buffered responses.
+
+    Brotli is offered only when the `brotli` package is installed and wins
+    ties with gzip. Streamed responses (SSE) and bodies under `min_bytes`
+    are sent as they are.
+    """
+
+    def __init__(self, enabled: bool = False, min_bytes: int = 1024, gzip_level: int = 6, brotli_quality: int = 5):
+        self.configure(enabled, min_bytes, gzip_level, brotli_quality)
+
+    def configure(self, enabled: bool = False, min_bytes: int = 1024, gzip_level: int = 6, brotli_quality: int = 5) -> None:
+        self.enabled = enabled
+        self.min_bytes = min_bytes
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self._lock = threading.Lock()
+        self.responses = 0
+        self.compressed = {"gzip": 0, "br": 0}
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+    def encodings(self) -> tuple:
+        return ("br", "gzip") if brotli is not None else ("gzip",)
+
+    def negotiate(self, accept_encoding: str):
+        """
+        Best supported encoding the client accepts, or None.
+        """
+        accepted = parse_accept_encoding(accept_encoding)
+        best, best_quality = None, 0.0
+        for encoding in self.encodings():
+            quality = accepted.get(encoding, accepted.get("*", 0.0))
+            if quality > best_quality:
+                best, best_quality = encoding, quality
+        return best
+
+    def compress(self, response, accept_encoding: str):
+        """
+        Compress `response` in place when worthwhile; returns it.
+        """
+        if not self.enabled or response.is_streamed or response.status_code in (204, 304) or "Content-Encoding" in response.headers:
+            return response
+        if response.mimetype not in COMPRESSIBLE_MIMETYPES:
+            return response
+        response.vary.add("Accept-Encoding")
+        body = response.get_data()
+        with self._lock:
+            self.responses += 1
+        encoding = self.negotiate(accept_encoding)
+        if encoding is None or len(body) < self.min_bytes:
+            return response
+
+        if encoding == "br":
+            compressed = brotli.compress(body, quality=self.brotli_quality)
+        else:
+            compressed = gzip.compress(body, compresslevel=self.gzip_level, mtime=0)
+        response.set_data(compressed)
+        response.headers["Content-Encoding"] = encoding
+        with self._lock:
+            self.compressed[encoding] += 1
+            self.bytes_in += len(body)
+            self.bytes_out += len(compressed)
+        return response
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "brotli": brotli is not None,
+                "responses": self.responses,
+                "gzip_responses": self.compressed["gzip"],
+                "br_responses": self.compressed["br"],
+                "bytes_in": self.bytes_in,
+                "bytes_out": self.bytes_out,
+                "bytes_saved": self.bytes_in - self.bytes_out,
+            }
+
+
+response_compressor = ResponseCompressor()
+
+
+def configure_response_compression(config) -> None:
+    response_compressor.configure(
+        enabled=config.get("RESPONSE_COMPRESSION", True),
+        min_bytes=config.get("RESPONSE_COMPRESSION_MIN_BYTES", 1024),
+        gzip_level=config.get("RESPONSE_COMPRESSION_GZIP_LEVEL", 6),
+        brotli_quality=config.get("RESPONSE_COMPRESSION_BROTLI_QUALITY", 5),
+    )
@@ -0,0 +1,159 @@
+import hashlib
+import os
+import re
+import threading
+
+_DIGITS = re.compile(r"(\d+)")
+
+
+def natural_sort_key(filename: str) -> tuple:
+    """
+    Sort key ordering `2.data.txt` before `10.data.txt`.
+    """
+    return tuple(int(part) if part.isdigit() else part for part in _DIGITS.split(filename))
+
+
+def corpus_fingerprint(documents: tuple) -> str:
+    """
+    SHA-256 digest of `(filename, content)` pairs, names included.
+    """
+    digest = hashlib.sha256()
+    for filename, content in documents:
+        digest.update(filename.encode("utf-8") + b"\0" + content.encode("utf-8") + b"\0")
+    return digest.hexdigest()
+
+
+class CorpusCache:
+    """
+    Process-wide cache of training corpora, keyed by directory.
+
+    Every lookup stats the directory's `.txt` files; a file is only re-read
+    when its mtime or size changed, and the joined corpus is only rebuilt
+    when at least one file was added, removed or modified. Files are kept
+    in natural filename order, so a corpus joins to the same bytes on every
+    host; upstream prompt caching relies on that.
+
+    With a snapshot attached (see `corpus_snapshot`), directories it holds
+    are served from it without touching the training files at all.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._snapshot = None
+        self.hits = 0
+        self.misses = 0
+        self.files_read = 0
+        self.snapshot_loads = 0
+
+    def attach_snapshot(self, snapshot) -> None:
+        """
+        Serve directories from `snapshot` (a `CorpusSnapshot`, or None to go back to the files).
+        """
+        with self._lock:
+            self._snapshot = snapshot
+            self._entries.clear()
+
+    def get(self, directory: str) -> str:
+        return self._load(directory)["text"]
+
+    def documents(self, directory: str) -> tuple:
+        """
+        Return `(filename, content)` pairs in corpus order.
+        """
+        return self._load(directory)["documents"]
+
+    def fingerprint(self, directory: str) -> str:
+        """
+        Return a SHA-256 digest of the corpus content and file names.
+        """
+        return self._load(directory)["fingerprint"]
+
+    def _load(self, directory: str) -> dict:
+        directory = os.path.abspath(directory)
+        snapshot = self._snapshot
+        if snapshot is not None and snapshot.has(directory):
+            return self._load_snapshot(snapshot, directory)
+        listing = self._scan(directory)
+
+        with self._lock:
+            entry = self._entries.get(directory)
+            if entry is not None and entry["signature"] == listing:
+                self.hits += 1
+                return entry
+            self.misses += 1
+            previous = entry["files"] if entry is not None else {}
+
+        files = {}
+        for filename, mtime_ns, size in listing:
+            cached = previous.get(filename)
+            if cached is not None and cached[0] == mtime_ns and cached[1] == size:
+                files[filename] = cached
+                continue
+            with open(os.path.join(directory, filename), "r", encoding="utf-8") as f:
+                files[filename] = (mtime_ns, size, f.read())
+            with self._lock:
+                self.files_read += 1
+
+        documents = tuple((filename, files[filename][2]) for filename, _, _ in listing)
+        entry = {
+            "signature": listing,
+            "files": files,
+            "documents": documents,
+            "text": "\n\n".join(content for _, content in documents),
+            "fingerprint": corpus_fingerprint(documents),
+        }
+        with self._lock:
+            self._entries[directory] = entry
+        return entry
+
+    def _load_snapshot(self, snapshot, directory: str) -> dict:
+        with self._lock:
+            entry = self._entries.get(directory)
+            if entry is not None and entry["signature"] is snapshot:
+                self.hits += 1
+                return entry
+            self.misses += 1
+            self.snapshot_loads += 1
+
+        documents = snapshot.documents(directory)
+        entry = {
+            "signature": snapshot,
+            "files": {},
+            "documents": documents,
+            "text": "\n\n".join(content for _, content in documents),
+            "fingerprint": snapshot.fingerprint(directory),
+        }
+        with self._lock:
+            self._entries[directory] = entry
+        return entry
+
+    def invalidate(self, directory: str = None) -> None:
+        with self._lock:
+            if directory is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(os.path.abspath(directory), None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "files_read": self.files_read,
+                "snapshot_loads": self.snapshot_loads,
+                "directories": len(self._entries),
+                "bytes": sum(len(entry["text"]) for entry in self._entries.values()),
+            }
+
+    @staticmethod
+    def _scan(directory: str) -> tuple:
+        listing = []
+        for filename in os.listdir(directory):
+            if filename.endswith(".txt"):
+                st = os.stat(os.path.join(directory, filename))
+                listing.append((filename, st.st_mtime_ns, st.st_size))
+        return tuple(sorted(listing, key=lambda item: natural_sort_key(item[0])))
+
+
+corpus_cache = CorpusCache()
@@ -0,0 +1,240 @@
+"""
+Precompiled snapshot of every agent corpus and prompt template.
+
+Reading dozens of training files on the first request of each agent is a
+large part of a cold start. The build step packs them into one file that
+the app memory-maps at startup:
+
+    python -m ia_generator.utils.corpus_snapshot --output .cache/corpus.snapshot [--compress]
+
+Layout: a fixed header (magic, format version, index length), a JSON index
+and the data region. The index maps each corpus directory to its files'
+spans in the data region, its fingerprint and the name, size and mtime of
+every file, and records a SHA-256 of the data region and a hash of every
+agent template.
+"""
+import argparse
+import hashlib
+import json
+import mmap
+import os
+import struct
+import time
+import zlib
+
+from ia_generator.constants.agents import AGENTS, TRAINING_DATA_DIR, configure_agents
+from ia_generator.exceptions.exceptions import CorpusSnapshotError
+from ia_generator.utils.corpus_cache import CorpusCache, corpus_cache
+
+SNAPSHOT_MAGIC = b"IACORPUS"
+SNAPSHOT_FORMAT_VERSION = 2
+DEFAULT_SNAPSHOT_PATH = os.path.abspath(
+    os.path.join(os.path.dirname(__file__), "..", "..", ".cache", "corpus.snapshot")
+)
+
+_HEADER = struct.Struct(">8sHQ")
+
+
+def _sha256(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def _directory_key(directory: str) -> str:
+    """
+    Directories under TRAINING_DATA_DIR are stored relative to it, so a snapshot survives a move.
+    """
+    directory = os.path.abspath(directory)
+    relative = os.path.relpath(directory, TRAINING_DATA_DIR)
+    if relative.startswith(os.pardir):
+        return directory
+    return relative.replace(os.sep, "/")
+
+
+def _file_signature(directory: str) -> list:
+    """
+    `[filename, size, mtime_ns]` of the corpus files of `directory`, from a stat scan only.
+    """
+    return [[filename, size, mtime_ns] for filename, mtime_ns, size in CorpusCache._scan(directory)]
+
+
+def build_snapshot(path: str = DEFAULT_SNAPSHOT_PATH, agents: dict = None, compress: bool = False) -> dict:
+    """
+    Write the snapshot of `agents` (default: the registry, with the agents of
+    `AGENTS_FILE` once `configure_agents` ran) to `path` and return its index.
+
+    With `compress` every file is stored zlib-compressed.
+    """
+    agents = AGENTS if agents is None else agents
+    loader = CorpusCache()
+    data = bytearray()
+
+    def store(text: str) -> list:
+        raw = text.encode("utf-8")
+        if compress:
+            raw = zlib.compress(raw, 9)
+        data.extend(raw)
+        return [len(data) - len(raw), len(raw)]
+
+    index = {
+        "created": time.time(),
+        "compression": "zlib" if compress else None,
+        "templates": {},
+        "directories": {},
+    }
+    for name, spec in sorted(agents.items()):
+        index["templates"][name] = _sha256(spec.prompt)
+        key = _directory_key(spec.training_path)
+        if key in index["directories"]:
+            continue
+        signature = _file_signature(spec.training_path)
+        index["directories"][key] = {
+            "fingerprint": loader.fingerprint(spec.training_path),
+            "signature": signature,
+            "files": [[filename, *store(content)] for filename, content in loader.documents(spec.training_path)],
+        }
+    index["sha256"] = hashlib.sha256(data).hexdigest()
+
+    encoded = json.dumps(index, separators=(",", ":")).encode("utf-8")
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(_HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_FORMAT_VERSION, len(encoded)))
+        f.write(encoded)
+        f.write(data)
+    os.replace(tmp_path, path)
+    return index
+
+
+class CorpusSnapshot:
+    """
+    Read-only, memory-mapped view of a snapshot file.
+
+    Opening checks the header and the data hash; file contents are only
+    decoded when a directory is first asked for.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        try:
+            with open(path, "rb") as f:
+                self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError) as e:
+            raise CorpusSnapshotError(f"Cannot open corpus snapshot {path}: {e}")
+
+        if len(self._mmap) < _HEADER.size:
+            raise CorpusSnapshotError(f"Corpus snapshot {path} is truncated")
+        magic, version, index_length = _HEADER.unpack_from(self._mmap, 0)
+        if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_FORMAT_VERSION:
+            raise CorpusSnapshotError(f"Corpus snapshot {path} has an unknown format")
+        self._data_start = _HEADER.size + index_length
+        try:
+            self.index = json.loads(self._mmap[_HEADER.size:self._data_start])
+        except ValueError:
+            raise CorpusSnapshotError(f"Corpus snapshot {path} has a corrupt index")
+
+        view = memoryview(self._mmap)[self._data_start:]
+        try:
+            intact = hashlib.sha256(view).hexdigest() == self.index["sha256"]
+        finally:
+            view.release()
+        if not intact:
+            raise CorpusSnapshotError(f"Corpus snapshot {path} does not match its content hash")
+
+    def has(self, directory: str) -> bool:
+        return _directory_key(directory) in self.index["directories"]
+
+    def documents(self, directory: str) -> tuple:
+        """
+        `(filename, content)` pairs of `directory`, in corpus order.
+        """
+        entry = self.index["directories"][_directory_key(directory)]
+        return tuple((filename, self._read(offset, length)) for filename, offset, length in entry["files"])
+
+    def fingerprint(self, directory: str) -> str:
+        return self.index["directories"][_directory_key(directory)]["fingerprint"]
+
+    def stale_agents(self, agents: dict = None) -> list:
+        """
+        Agents whose template or corpus is not in the snapshot as it is on disk.
+
+        A corpus is current when its files still have the names, sizes and
+        mtimes recorded at build time; only the directories are stat-scanned.
+        """
+        agents = AGENTS if agents is None else agents
+        current = {}
+
+        def corpus_current(directory: str) -> bool:
+            key = _directory_key(directory)
+            if key not in current:
+                entry = self.index["directories"].get(key)
+                try:
+                    current[key] = entry is not None and entry["signature"] == _file_signature(directory)
+                except OSError:
+                    current[key] = False
+            return current[key]
+
+        return sorted(
+            name for name, spec in agents.items()
+            if self.index["templates"].get(name) != _sha256(spec.prompt) or not corpus_current(spec.training_path)
+        )
+
+    def _read(self, offset: int, length: int) -> str:
+        start = self._data_start + offset
+        raw = self._mmap[start:start + length]
+        if self.index["compression"] == "zlib":
+            raw = zlib.decompress(raw)
+        return raw.decode("utf-8")
+
+    def close(self) -> None:
+        self._mmap.close()
+
+
+def load_corpus_snapshot(path: str, logger=None):
+    """
+    Attach the snapshot at `path` to the corpus cache and return it.
+
+    Returns None, leaving the directory loader in place, when the file is
+    absent, corrupt, or was built from other templates or training files.
+    """
+    if not os.path.exists(path):
+        if logger is not None:
+            logger.info("No corpus snapshot at %s, reading training directories", path)
+        return None
+    try:
+        snapshot = CorpusSnapshot(path)
+    except CorpusSnapshotError as e:
+        if logger is not None:
+            logger.warning("%s, reading training directories", e.message)
+        return None
+
+    stale = snapshot.stale_agents()
+    if stale:
+        if logger is not None:
+            logger.warning("Corpus snapshot %s is out of date for %s, reading training directories", path, ", ".join(stale))
+        snapshot.close()
+        return None
+
+    corpus_cache.attach_snapshot(snapshot)
+    if logger is not None:
+        logger.info("Serving corpora from snapshot %s (%d directories)", path, len(snapshot.index["directories"]))
+    return snapshot
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compile every agent corpus into one snapshot file.")
+    parser.add_argument("--output", default=DEFAULT_SNAPSHOT_PATH)
+    parser.add_argument("--compress", action="store_true", help="store files zlib-compressed")
+    parser.add_argument("--agents-file", default=os.getenv("AGENTS_FILE"), help="extra agents, as in AGENTS_FILE (default: $AGENTS_FILE)")
+    args = parser.parse_args()
+
+    configure_agents({"AGENTS_FILE": args.agents_file})
+    index = build_snapshot(args.output, compress=args.compress)
+    files = sum(len(entry["files"]) for entry in index["directories"].values())
+    print(
+        f"Wrote {args.output}: {len(index['directories'])} directories, {files} files, "
+        f"{os.path.getsize(args.output)} bytes, sha256 {index['sha256'][:16]}"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,205 @@
+import bisect
+import contextlib
+import contextvars
+import threading
+import time
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+SIZE_BUCKETS = (1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+_NOOP = contextlib.nullcontext()
+_current_agent = contextvars.ContextVar("metrics_agent", default="unknown")
+
+
+def _format_labels(names: tuple, values: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{str(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+
+    def __init__(self, name: str, documentation: str, labels: tuple = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount: float = 1) -> None:
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def expose(self) -> list:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for values, total in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labels, values)} {total}")
+        return lines
+
+
+class Histogram:
+
+    def __init__(self, name: str, documentation: str, labels: tuple = (), buckets: tuple = DURATION_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def expose(self) -> list:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for values, (counts, total) in sorted(self._series.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets + ("+Inf",), counts):
+                    cumulative += count
+                    labels = _format_labels(self.labels, values, f'le="{bound}"')
+                    lines.append(f"{self.name}_bucket{labels} {cumulative}")
+                lines.append(f"{self.name}_sum{_format_labels(self.labels, values)} {total}")
+                lines.append(f"{self.name}_count{_format_labels(self.labels, values)} {cumulative}")
+        return lines
+
+
+class CallbackGauge:
+    """
+    Gauge whose samples are read from `callback` at scrape time, as `{label_values: value}`.
+    """
+
+    def __init__(self, name: str, documentation: str, labels: tuple, callback):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self.callback = callback
+
+    def expose(self) -> list:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} gauge"]
+        for values, value in sorted(self.callback().items()):
+            lines.append(f"{self.name}{_format_labels(self.labels, values)} {value}")
+        return lines
+
+
+class Metrics:
+    """
+    Hot-path instrumentation exposed in the Prometheus text format.
+
+    Every recording method returns immediately while disabled, so the
+    instrumentation costs a single attribute check when metrics are off.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.stage_duration = Histogram(
+            "ia_stage_duration_seconds", "Time spent per request stage.", ("agent", "stage"))
+        self.request_duration = Histogram(
+            "ia_request_duration_seconds", "HTTP request latency.", ("endpoint",))
+        self.requests = Counter(
+            "ia_requests_total", "HTTP requests by endpoint and status code.", ("endpoint", "status"))
+        self.prompt_bytes = Histogram(
+            "ia_prompt_bytes", "Size of prompts sent upstream.", ("agent",), SIZE_BUCKETS)
+        self.response_bytes = Histogram(
+            "ia_response_bytes", "Size of answers received from upstream.", ("agent",), SIZE_BUCKETS)
+        self.upstream_tokens = Counter(
+            "ia_upstream_tokens_total", "Token usage reported by upstream.", ("agent", "model", "kind"))
+        self.upstream_errors = Counter(
+            "ia_upstream_errors_total", "Upstream failures by OpenAIServiceError cause.", ("agent", "cause"))
+        self.validations = Counter(
+            "ia_validations_total", "Offline validation outcomes of generated code.", ("agent", "outcome"))
+        self._collectors = {}
+        for collector in (
+            self.stage_duration, self.request_duration, self.requests,
+            self.prompt_bytes, self.response_bytes, self.upstream_tokens, self.upstream_errors,
+            self.validations,
+        ):
+            self.register(collector)
+
+    def register(self, collector) -> None:
+        """
+        Add `collector` to the exposition, replacing any collector of the same name.
+        """
+        self._collectors[collector.name] = collector
+
+    def register_stats(self, name: str, documentation: str, stats) -> None:
+        """
+        Expose the numeric fields of a component's `stats()` dict as `name{stat="..."}`.
+        """
+        def collect():
+            return {
+                (key,): value
+                for key, value in stats().items()
+                if isinstance(value, (int, float)) and not isinstance(value, bool)
+            }
+
+        self.register(CallbackGauge(name, documentation, ("stat",), collect))
+
+    def set_agent(self, agent: str) -> None:
+        if self.enabled:
+            _current_agent.set(agent)
+
+    def timer(self, stage: str):
+        if not self.enabled:
+            return _NOOP
+        return self._timer(stage, _current_agent.get())
+
+    @contextlib.contextmanager
+    def _timer(self, stage: str, agent: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stage_duration.observe(time.perf_counter() - start, agent, stage)
+
+    def observe_stage(self, stage: str, seconds: float) -> None:
+        if self.enabled:
+            self.stage_duration.observe(seconds, _current_agent.get(), stage)
+
+    def record_prompt(self, messages: list) -> None:
+        if self.enabled:
+            self.prompt_bytes.observe(sum(len(message["content"]) for message in messages), _current_agent.get())
+
+    def record_response(self, model: str, answer: str, usage) -> None:
+        if not self.enabled:
+            return
+        agent = _current_agent.get()
+        self.response_bytes.observe(len(answer or ""), agent)
+        if usage is None:
+            return
+        self.upstream_tokens.inc(agent, model, "prompt", amount=usage.prompt_tokens or 0)
+        self.upstream_tokens.inc(agent, model, "completion", amount=usage.completion_tokens or 0)
+        details = getattr(usage, "prompt_tokens_details", None)
+        cached = getattr(details, "cached_tokens", None) if details is not None else None
+        if cached:
+            self.upstream_tokens.inc(agent, model, "cached", amount=cached)
+
+    def record_error(self, cause: str) -> None:
+        if self.enabled:
+            self.upstream_errors.inc(_current_agent.get(), cause)
+
+    def record_validation(self, outcome: str) -> None:
+        if self.enabled:
+            self.validations.inc(_current_agent.get(), outcome)
+
+    def record_request(self, endpoint: str, status: int, seconds: float) -> None:
+        if self.enabled:
+            self.requests.inc(endpoint, str(status))
+            self.request_duration.observe(seconds, endpoint)
+
+    def expose(self) -> str:
+        lines = []
+        for collector in self._collectors.values():
+            lines.extend(collector.expose())
+        return "\n".join(lines) + "\n"
+
+
+metrics = Metrics()
@@ -0,0 +1,80 @@
+import difflib
+import re
+
+from ia_generator.exceptions.exceptions import PatchError
+
+_BLOCK = re.compile(
+    r"^<{5,9} SEARCH[ \t]*\n(.*?)^={5,9}[ \t]*\n(.*?)^>{5,9} REPLACE[ \t]*$",
+    re.MULTILINE | re.DOTALL,
+)
+_MARKER = re.compile(r"^(<{5,9} SEARCH|={5,9}|>{5,9} REPLACE)[ \t]*$", re.MULTILINE)
+
+
+def parse_patch(text: str) -> list:
+    """
+    `(search, replace)` pairs of the SEARCH/REPLACE blocks in a model answer.
+
+    Raises `PatchError` when there is no block, a block has an empty SEARCH
+    part or markers are left over outside complete blocks.
+    """
+    blocks = [(search, replace) for search, replace in _BLOCK.findall(text)]
+    if not blocks:
+        raise PatchError("The answer holds no SEARCH/REPLACE block")
+    if _MARKER.search(_BLOCK.sub("", text)):
+        raise PatchError("The answer holds an incomplete SEARCH/REPLACE block")
+    for search, _ in blocks:
+        if not search.strip():
+            raise PatchError("A SEARCH block is empty")
+    return blocks
+
+
+def _locate(source: str, search: str):
+    """
+    Span of the single occurrence of `search` in `source`.
+
+    Falls back to comparing lines without trailing whitespace, which models
+    often drop or add. Raises `PatchError` when the text is missing or ambiguous.
+    """
+    count = source.count(search)
+    if count == 1:
+        start = source.index(search)
+        return start, start + len(search)
+    if count > 1:
+        raise PatchError(f"SEARCH block matches {count} places: {search.strip().splitlines()[0]!r}")
+
+    lines = source.splitlines(keepends=True)
+    wanted = [line.rstrip() for line in search.splitlines()]
+    stripped = [line.rstrip() for line in lines]
+    matches = [
+        i for i in range(len(lines) - len(wanted) + 1)
+        if stripped[i:i + len(wanted)] == wanted
+    ]
+    if len(matches) != 1:
+        problem = "is not in the source" if not matches else f"matches {len(matches)} places"
+        raise PatchError(f"SEARCH block {problem}: {search.strip().splitlines()[0]!r}")
+    start = sum(map(len, lines[:matches[0]]))
+    return start, start + sum(map(len, lines[matches[0]:matches[0] + len(wanted)]))
+
+
+def apply_patch(source: str, blocks: list) -> str:
+    """
+    Apply `(search, replace)` blocks to `source` in order; each SEARCH part must match exactly once.
+    """
+    for search, replace in blocks:
+        start, end = _locate(source, search)
+        if source[start:end].endswith("\n") and replace and not replace.endswith("\n"):
+            replace += "\n"
+        source = source[:start] + replace + source[end:]
+    return source
+
+
+def unified_diff(before: str, after: str, filename: str = "service.rs") -> str:
+    def lines(text):
+        return (text if text.endswith("\n") or not text else text + "\n").splitlines(keepends=True)
+
+    return "".join(difflib.unified_diff(
+        lines(before),
+        lines(after),
+        fromfile=f"a/{filename}",
+        tofile=f"b/{filename}",
+    ))
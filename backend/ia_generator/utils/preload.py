@@ -0,0 +1,42 @@
+import os
+import time
+
+from ia_generator.constants.agents import AGENTS
+from ia_generator.utils import token_budget
+from ia_generator.utils.corpus_cache import corpus_cache
+from ia_generator.utils.retrieval import get_index
+from ia_generator.utils.utils import build_prompt_prefix
+
+
+def preload_agent_corpora(logger=None, retrieval_agents=(), index_dir: str = None) -> dict:
+    """
+    Load every agent corpus and pre-build its prompt prefix.
+
+    Agents in `retrieval_agents` also get their retrieval index loaded or built.
+    All directories are checked before anything is loaded so a missing one
+    fails the boot immediately. Returns `{agent: {"seconds", "bytes", "tokens"}}`.
+    """
+    missing = [spec.training_path for spec in AGENTS.values() if not os.path.isdir(spec.training_path)]
+    if missing:
+        raise FileNotFoundError(f"Missing training data directories: {', '.join(missing)}")
+
+    report = {}
+    for agent, spec in AGENTS.items():
+        start = time.perf_counter()
+        prefix = build_prompt_prefix(spec.prompt, spec.training_path)
+        # Also memoizes the token counts of the template and corpus for the first requests
+        tokens = token_budget.static_prompt_tokens(
+            spec.prompt, corpus_cache.documents(spec.training_path), corpus_cache.fingerprint(spec.training_path),
+        )
+        if agent in retrieval_agents:
+            get_index(spec.training_path, index_dir)
+        elapsed = time.perf_counter() - start
+
+        report[agent] = {"seconds": elapsed, "bytes": len(prefix.encode("utf-8")), "tokens": tokens}
+        if logger is not None:
+            logger.info(
+                "Preloaded %s: %d bytes, ~%d tokens in %.1f ms",
+                agent, report[agent]["bytes"], tokens, elapsed * 1000,
+            )
+
+    return report
@@ -0,0 +1,217 @@
+import hashlib
+import json
+import math
+import os
+import re
+import threading
+from collections import Counter
+
+from ia_generator.utils.corpus_cache import corpus_cache
+
+INDEX_FORMAT_VERSION = 1
+DEFAULT_INDEX_DIR = os.path.abspath(
+    os.path.join(os.path.dirname(__file__), "..", "..", ".cache", "retrieval")
+)
+
+# Target size of a chunk; training files are split on blank lines up to this size
+CHUNK_CHARS = 4000
+
+_IDENTIFIER = re.compile(r"[A-Za-z_][A-Za-z0-9_]*|[0-9]+")
+_CAMEL_CASE = re.compile(r"[A-Z]+(?![a-z])|[A-Z]?[a-z]+|[0-9]+")
+
+
+def tokenize(text: str) -> list:
+    """
+    Split code or prose into lowercase terms.
+
+    Identifiers are kept whole and also broken into their snake_case and
+    camelCase parts, so `useProgramQuery` matches a question about "program query".
+    """
+    terms = []
+    for identifier in _IDENTIFIER.findall(text):
+        lowered = identifier.lower()
+        if len(lowered) > 1:
+            terms.append(lowered)
+        parts = [p.lower() for piece in identifier.split("_") for p in _CAMEL_CASE.findall(piece)]
+        if len(parts) > 1:
+            terms.extend(p for p in parts if len(p) > 1)
+    return terms
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // 4 + 1
+
+
+def split_chunks(source: str, content: str, chunk_chars: int = CHUNK_CHARS) -> list:
+    """
+    Split a training file into `(source, start, end)` spans on blank lines.
+    """
+    spans = []
+    start = 0
+    end = 0
+    for match in re.finditer(r"\n\s*\n", content):
+        if match.start() - start > chunk_chars and end > start:
+            spans.append((source, start, end))
+            start = end
+        end = match.end()
+    if start < len(content):
+        spans.append((source, start, len(content)))
+    return spans
+
+
+class BM25Index:
+    """
+    Okapi BM25 over the chunks of one training directory.
+    """
+
+    def __init__(self, fingerprint: str, spans: list, term_freqs: list, k1: float = 1.5, b: float = 0.75):
+        self.fingerprint = fingerprint
+        self.spans = spans
+        self.term_freqs = term_freqs
+        self.k1 = k1
+        self.b = b
+
+        self.doc_lengths = [sum(tf.values()) for tf in term_freqs]
+        self.avg_length = (sum(self.doc_lengths) / len(self.doc_lengths)) if self.doc_lengths else 0.0
+        doc_freqs = Counter(term for tf in term_freqs for term in tf)
+        total = len(term_freqs)
+        self.idf = {
+            term: math.log(1 + (total - df + 0.5) / (df + 0.5))
+            for term, df in doc_freqs.items()
+        }
+
+    @classmethod
+    def build(cls, documents: tuple, fingerprint: str) -> "BM25Index":
+        spans = []
+        term_freqs = []
+        for source, content in documents:
+            for span in split_chunks(source, content):
+                spans.append(span)
+                term_freqs.append(Counter(tokenize(content[span[1]:span[2]])))
+        return cls(fingerprint, spans, term_freqs)
+
+    def scores(self, query: str) -> list:
+        terms = [t for t in set(tokenize(query)) if t in self.idf]
+        results = []
+        for tf, length in zip(self.term_freqs, self.doc_lengths):
+            score = 0.0
+            norm = self.k1 * (1 - self.b + self.b * length / (self.avg_length or 1))
+            for term in terms:
+                freq = tf.get(term)
+                if freq:
+                    score += self.idf[term] * freq * (self.k1 + 1) / (freq + norm)
+            results.append(score)
+        return results
+
+    def to_dict(self) -> dict:
+        return {
+            "version": INDEX_FORMAT_VERSION,
+            "fingerprint": self.fingerprint,
+            "spans": self.spans,
+            "term_freqs": [dict(tf) for tf in self.term_freqs],
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "BM25Index":
+        return cls(
+            data["fingerprint"],
+            [tuple(span) for span in data["spans"]],
+            [Counter(tf) for tf in data["term_freqs"]],
+        )
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def _index_file(index_dir: str, directory: str) -> str:
+    digest = hashlib.sha1(directory.encode("utf-8")).hexdigest()[:12]
+    return os.path.join(index_dir, f"{os.path.basename(directory)}-{digest}.json")
+
+
+def _read_index(path: str, fingerprint: str):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if data.get("version") != INDEX_FORMAT_VERSION or data.get("fingerprint") != fingerprint:
+        return None
+    return BM25Index.from_dict(data)
+
+
+def _write_index(path: str, index: BM25Index) -> None:
+    # The index is only an optimisation; read-only deploys simply rebuild it in memory.
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(index.to_dict(), f, separators=(",", ":"))
+        os.replace(tmp_path, path)
+    except OSError:
+        pass
+
+
+def get_index(directory: str, index_dir: str = None) -> BM25Index:
+    """
+    Return the BM25 index of `directory`, loading or building it when the corpus changed.
+
+    Indexes are kept in memory and persisted as JSON under `index_dir`, keyed by the
+    corpus fingerprint so a restart reuses them as long as the training files are unchanged.
+    """
+    directory = os.path.abspath(directory)
+    fingerprint = corpus_cache.fingerprint(directory)
+
+    index = _indexes.get(directory)
+    if index is not None and index.fingerprint == fingerprint:
+        return index
+
+    with _indexes_lock:
+        index = _indexes.get(directory)
+        if index is not None and index.fingerprint == fingerprint:
+            return index
+
+        path = _index_file(index_dir or DEFAULT_INDEX_DIR, directory)
+        index = _read_index(path, fingerprint)
+        if index is None:
+            index = BM25Index.build(corpus_cache.documents(directory), fingerprint)
+            _write_index(path, index)
+        _indexes[directory] = index
+        return index
+
+
+def select_training_examples(
+    training_path: str,
+    question: str,
+    top_k: int = 4,
+    token_budget: int = 12000,
+    index_dir: str = None,
+) -> str:
+    """
+    Return the `top_k` chunks of the corpus most relevant to `question`.
+
+    Chunks are taken by descending BM25 score while they fit in `token_budget`,
+    then emitted in their original corpus order.
+    """
+    index = get_index(training_path, index_dir)
+    contents = dict(corpus_cache.documents(training_path))
+
+    scores = index.scores(question)
+    ranked = sorted(range(len(scores)), key=lambda i: (-scores[i], i))
+
+    selected = []
+    used = 0
+    for i in ranked:
+        if len(selected) >= top_k:
+            break
+        source, start, end = index.spans[i]
+        cost = estimate_tokens(contents[source][start:end])
+        if used + cost > token_budget:
+            continue
+        selected.append(i)
+        used += cost
+
+    return "\n\n".join(
+        contents[index.spans[i][0]][index.spans[i][1]:index.spans[i][2]].strip()
+        for i in sorted(selected)
+    )
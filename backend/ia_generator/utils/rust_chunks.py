@@ -0,0 +1,182 @@
+import re
+
+_FENCE = re.compile(r"^```[^\n]*\n(.*?)^```", re.MULTILINE | re.DOTALL)
+_IMPL = re.compile(r"^(pub(\([^)]*\))?\s+)?(unsafe\s+)?impl\b")
+_RAW_STRING = re.compile(r'b?r(#*)"')
+_CHAR_LITERAL = re.compile(r"'(\\[^']+|[^\\'])'")
+_IDENT_CHAR = re.compile(r"\w")
+
+
+def extract_code(text: str):
+    """
+    The code of an answer: the body of its single fenced block, or the text itself without fences.
+
+    Returns `None` when the answer holds several fenced blocks.
+    """
+    blocks = _FENCE.findall(text)
+    if not blocks:
+        return text
+    return blocks[0] if len(blocks) == 1 else None
+
+
+class RustChunker:
+    """
+    Splits Rust source into chunks of whole top-level items, each ending with an `impl` block.
+
+    Text is fed incrementally, e.g. as tokens stream in, and a chunk is
+    returned as soon as its last `impl` block is closed and it holds at least
+    `chunk_chars` characters; `chunk_chars=0` splits after every `impl`,
+    `None` never splits. Items following the last `impl` form the final chunk.
+
+    Only the body of the first fenced block is kept when the text is fenced.
+    `clean` turns false when that cannot be done reliably (a second fenced
+    block, or chunks returned before the fence opened); callers should then
+    fall back to `extract_code` on the whole text.
+    """
+
+    def __init__(self, chunk_chars: int = 0):
+        self.chunk_chars = chunk_chars
+        self.clean = True
+        self.fenced = False
+        self._partial = ""
+        self._in_fence = False
+        self._after_fence = False
+        self._emitted = 0
+        self._chunk = []
+        self._item = []
+        self._item_is_impl = None
+        # Lexer state carried across lines
+        self._depth = 0
+        self._block_comment = 0
+        self._string = None
+
+    def feed(self, text: str) -> list:
+        """
+        Consume `text` and return the chunks it completed.
+        """
+        lines = (self._partial + text).split("\n")
+        self._partial = lines.pop()
+        chunks = []
+        for line in lines:
+            chunks.extend(self._line(line + "\n"))
+        return chunks
+
+    def close(self) -> list:
+        """
+        Return the remaining chunks once all text has been fed.
+        """
+        chunks = self._line(self._partial) if self._partial else []
+        self._partial = ""
+        self._chunk.extend(self._item)
+        self._item = []
+        rest = "".join(self._chunk)
+        self._chunk = []
+        if rest.strip() or not (chunks or self._emitted):
+            chunks.append(rest)
+            self._emitted += 1
+        return chunks
+
+    def split(self, text: str) -> list:
+        return self.feed(text) + self.close()
+
+    def _line(self, line: str) -> list:
+        if line.lstrip().startswith("```"):
+            if self._in_fence:
+                self._in_fence = False
+                self._after_fence = True
+            elif self.fenced:
+                self.clean = False
+            else:
+                # Anything before the opening fence was prose, not code
+                if self._emitted:
+                    self.clean = False
+                self.fenced = self._in_fence = True
+                self._chunk, self._item, self._item_is_impl = [], [], None
+                self._depth, self._block_comment, self._string = 0, 0, None
+            return []
+        if self._after_fence:
+            return []
+
+        self._item.append(line)
+        if self._item_is_impl is None and self._string is None and not self._block_comment:
+            code = line.strip()
+            if code and not code.startswith(("//", "#[", "#!", "/*", "*")):
+                self._item_is_impl = bool(_IMPL.match(code))
+
+        if not self._scan(line):
+            return []
+        self._chunk.extend(self._item)
+        is_impl, self._item, self._item_is_impl = self._item_is_impl, [], None
+        if not is_impl or self.chunk_chars is None or sum(map(len, self._chunk)) < self.chunk_chars:
+            return []
+        chunk, self._chunk = "".join(self._chunk), []
+        self._emitted += 1
+        return [chunk]
+
+    def _scan(self, line: str) -> bool:
+        """
+        Track brace depth through `line`; true when a top-level item ended on it.
+
+        `_string` is the terminator of the open string literal: `"` for
+        regular strings, `"#..#` for raw ones, which have no escapes.
+        """
+        ended = False
+        i = 0
+        n = len(line)
+        while i < n:
+            c = line[i]
+            if self._block_comment:
+                if line.startswith("*/", i):
+                    self._block_comment -= 1
+                    i += 2
+                elif line.startswith("/*", i):
+                    self._block_comment += 1
+                    i += 2
+                else:
+                    i += 1
+                continue
+            if self._string is not None:
+                if c == "\\" and self._string == '"':
+                    i += 2
+                elif line.startswith(self._string, i):
+                    i += len(self._string)
+                    self._string = None
+                else:
+                    i += 1
+                continue
+
+            if line.startswith("//", i):
+                break
+            if line.startswith("/*", i):
+                self._block_comment = 1
+                i += 2
+                continue
+            raw = _RAW_STRING.match(line, i) if i == 0 or not _IDENT_CHAR.match(line[i - 1]) else None
+            if raw:
+                self._string = '"' + raw.group(1)
+                i = raw.end()
+                continue
+            if c == '"':
+                self._string = '"'
+            elif c == "'":
+                # Char literal ('x', '\n', '{'); a lifetime ('a) has no closing quote
+                literal = _CHAR_LITERAL.match(line, i)
+                if literal:
+                    i = literal.end()
+                    continue
+            elif c == "{":
+                self._depth += 1
+            elif c == "}":
+                self._depth = max(0, self._depth - 1)
+                ended = ended or self._depth == 0
+            elif c == ";" and self._depth == 0:
+                ended = True
+            i += 1
+        return ended and self._depth == 0 and self._string is None and not self._block_comment
+
+
+def split_rust_code(code: str, chunk_chars: int = 0) -> list:
+    """
+    Split `code` into chunks of whole top-level items, see `RustChunker`.
+    """
+    return RustChunker(chunk_chars).split(code)
@@ -0,0 +1,197 @@
+import contextvars
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+
+from ia_generator.exceptions.exceptions import PromptBudgetError
+
+# Tokens added by the fixed wording around the template, corpus and question
+PROMPT_OVERHEAD_TOKENS = 16
+
+_PIECE = re.compile(r"[A-Za-z]+|[0-9]+|[^\sA-Za-z0-9]")
+_LEADING_NUMBER = re.compile(r"^(\d+)")
+
+_last_accounting = contextvars.ContextVar("prompt_accounting", default=None)
+
+
+class TokenCounter:
+    """
+    Count tokens with tiktoken when configured and available, else estimate them offline.
+
+    The estimate counts word pieces of up to four characters plus every
+    punctuation character, which tracks BPE tokenizers closely on code;
+    `factor` corrects it for a given model family. Only the static parts of
+    prompts (templates and training corpora) are memoized, by digest or
+    corpus fingerprint; per-request text is counted every time and never kept.
+    """
+
+    def __init__(self, tokenizer: str = "estimate", factor: float = 1.0, memo_entries: int = 256):
+        self.factor = factor
+        self.encoding = None
+        if tokenizer == "tiktoken":
+            try:
+                import tiktoken
+                self.encoding = tiktoken.get_encoding("o200k_base")
+            except Exception:
+                self.encoding = None
+        self.memo_entries = memo_entries
+        self._memo = OrderedDict()
+        self._lock = threading.Lock()
+
+    def count_template(self, text: str) -> int:
+        """
+        Tokens of a prompt template, memoized by its digest.
+        """
+        key = ("template", hashlib.sha256(text.encode("utf-8")).hexdigest())
+        return self._memoized(key, lambda: self.count(text))
+
+    def count_corpus(self, documents: tuple, fingerprint: str) -> dict:
+        """
+        Filename -> tokens of a training corpus, memoized by its fingerprint.
+        """
+        return self._memoized(("corpus", fingerprint), lambda: {
+            filename: self.count(content) for filename, content in documents
+        })
+
+    def _memoized(self, key: tuple, compute):
+        with self._lock:
+            if key in self._memo:
+                self._memo.move_to_end(key)
+                return self._memo[key]
+        value = compute()
+        with self._lock:
+            self._memo[key] = value
+            while len(self._memo) > self.memo_entries:
+                self._memo.popitem(last=False)
+        return value
+
+    def count(self, text: str) -> int:
+        if self.encoding is not None:
+            return len(self.encoding.encode(text, disallowed_special=()))
+        total = 0
+        for piece in _PIECE.findall(text):
+            total += (len(piece) + 3) // 4 if piece[0].isalnum() else 1
+        return int(total * self.factor)
+
+
+class PromptStats:
+    """
+    Per-agent totals of prompt sizes, for input-token cost per route.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._agents = {}
+
+    def record(self, accounting: dict) -> None:
+        with self._lock:
+            stats = self._agents.setdefault(accounting["agent"], {
+                "requests": 0, "total_tokens": 0, "max_tokens": 0,
+                "template_tokens": 0, "corpus_tokens": 0, "question_tokens": 0, "trimmed_requests": 0,
+            })
+            stats["requests"] += 1
+            stats["total_tokens"] += accounting["total_tokens"]
+            stats["max_tokens"] = max(stats["max_tokens"], accounting["total_tokens"])
+            for part in ("template_tokens", "corpus_tokens", "question_tokens"):
+                stats[part] += accounting[part]
+            if accounting["trimmed_files"]:
+                stats["trimmed_requests"] += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                agent: {**stats, "avg_tokens": stats["total_tokens"] / stats["requests"]}
+                for agent, stats in self._agents.items()
+            }
+
+
+token_counter = TokenCounter()
+prompt_stats = PromptStats()
+_budgets = {"default": None, "agents": {}}
+
+
+def configure_token_budgets(default: int = None, agents: dict = None, tokenizer: str = "estimate", factor: float = 1.0) -> None:
+    global token_counter
+    _budgets["default"] = default
+    _budgets["agents"] = dict(agents or {})
+    token_counter = TokenCounter(tokenizer, factor)
+
+
+def budget_for(agent: str):
+    return _budgets["agents"].get(agent, _budgets["default"])
+
+
+def static_prompt_tokens(prompt: str, documents: tuple, fingerprint: str) -> int:
+    """
+    Tokens of the system message of an agent: its template plus its whole training corpus.
+    """
+    return (
+        token_counter.count_template(prompt)
+        + sum(token_counter.count_corpus(documents, fingerprint).values())
+        + PROMPT_OVERHEAD_TOKENS
+    )
+
+
+def file_priority(filename: str) -> tuple:
+    """
+    Sort key from highest to lowest priority: `1.data.txt` outranks `15.data.txt`.
+    """
+    match = _LEADING_NUMBER.match(filename)
+    return (0, int(match.group(1)), filename) if match else (1, 0, filename)
+
+
+def account_prompt(agent: str, prompt: str, documents: tuple, question: str, budget: int = None, fingerprint: str = None):
+    """
+    Count the tokens of a prompt and trim training files to fit `budget`.
+
+    `fingerprint` identifies a whole training corpus, whose counts are then
+    memoized; retrieved chunks are counted on every call. Files are dropped
+    lowest priority first. Returns the kept `(filename, content)`
+    pairs in their original order and the accounting record, which is also
+    added to the per-agent stats. Raises `PromptBudgetError` when the template
+    and question alone exceed the budget.
+    """
+    template_tokens = token_counter.count_template(prompt)
+    question_tokens = token_counter.count(question)
+    if fingerprint is not None:
+        document_tokens = token_counter.count_corpus(documents, fingerprint)
+    else:
+        document_tokens = {filename: token_counter.count(content) for filename, content in documents}
+    fixed_tokens = template_tokens + question_tokens + PROMPT_OVERHEAD_TOKENS
+    total = fixed_tokens + sum(document_tokens.values())
+
+    trimmed = []
+    if budget is not None and total > budget:
+        for filename in sorted(document_tokens, key=file_priority, reverse=True):
+            if total <= budget:
+                break
+            total -= document_tokens[filename]
+            trimmed.append(filename)
+        if total > budget:
+            raise PromptBudgetError(
+                f"Prompt for `{agent}` needs {fixed_tokens} tokens without training data, budget is {budget}"
+            )
+
+    accounting = {
+        "agent": agent,
+        "template_tokens": template_tokens,
+        "corpus_tokens": total - fixed_tokens,
+        "question_tokens": question_tokens,
+        "total_tokens": total,
+        "budget": budget,
+        "trimmed_files": trimmed,
+    }
+    prompt_stats.record(accounting)
+    _last_accounting.set(accounting)
+
+    kept = tuple(doc for doc in documents if doc[0] not in trimmed) if trimmed else documents
+    return kept, accounting
+
+
+def begin_request() -> None:
+    _last_accounting.set(None)
+
+
+def get_last_accounting():
+    return _last_accounting.get()
@@ -0,0 +1,220 @@
+"""
+Opt-in capture of served requests, replayed by `benchmarks/replay.py`.
+
+Every captured POST is appended to a JSON-lines log as one compact record:
+
+    {"ts", "route", "agent", "stream", "headers", "request", "status", "latency_ms",
+     "upstream_ms", "prompt_tokens", "model", "cache", "response"}
+
+`upstream_ms` lists every upstream call of the request. When the log
+reaches `max_bytes` it is gzipped to `<path>.1.gz`, older segments shift to
+`.2.gz` and so on, and segments beyond `backups` are deleted.
+"""
+import contextvars
+import gzip
+import json
+import os
+import random
+import shutil
+import threading
+import time
+
+# Request headers that change how a request is served, kept so a replay sends them again
+REPLAYED_HEADERS = ("Accept", "Cache-Control", "X-Latency-Tier", "X-Near-Duplicate-Cache")
+
+_started = contextvars.ContextVar("capture_started", default=None)
+
+
+class TrafficCapture:
+    """
+    Thread-safe, size-rotated, append-only log of request records.
+
+    `path` may contain `{pid}` so that the worker processes of a host write
+    separate logs; it is resolved on the first write, after gunicorn forked
+    the workers. An empty path disables the capture.
+    """
+
+    def __init__(self, path: str = "", max_bytes: int = 64 * 1024 * 1024, backups: int = 5, sample_rate: float = 1.0):
+        self._lock = threading.Lock()
+        self._file = None
+        self.configure(path, max_bytes, backups, sample_rate)
+
+    def configure(self, path: str = "", max_bytes: int = 64 * 1024 * 1024, backups: int = 5, sample_rate: float = 1.0) -> None:
+        with self._lock:
+            self._close()
+            self.path_template = path or ""
+            self.path = None
+            self.max_bytes = max_bytes
+            self.backups = backups
+            self.sample_rate = sample_rate
+            self.records = 0
+            self.bytes = 0
+            self.rotations = 0
+            self.errors = 0
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.path_template)
+
+    def sampled(self) -> bool:
+        return self.enabled and (self.sample_rate >= 1.0 or random.random() < self.sample_rate)
+
+    def append(self, record: dict) -> None:
+        """
+        Write `record` as one line; a failed write is counted, never raised.
+        """
+        line = (json.dumps(record, separators=(",", ":"), ensure_ascii=False) + "\n").encode("utf-8")
+        with self._lock:
+            if not self.path_template:
+                return
+            try:
+                if self._file is None:
+                    self.path = self.path_template.replace("{pid}", str(os.getpid()))
+                    directory = os.path.dirname(self.path)
+                    if directory:
+                        os.makedirs(directory, exist_ok=True)
+                    self._file = open(self.path, "ab")
+                if self._file.tell() and self._file.tell() + len(line) > self.max_bytes:
+                    self._rotate()
+                self._file.write(line)
+                self._file.flush()
+            except OSError:
+                self.errors += 1
+                return
+            self.records += 1
+            self.bytes += len(line)
+
+    def _rotate(self) -> None:
+        self._close()
+        if self.backups > 0:
+            for index in range(self.backups - 1, 0, -1):
+                older = f"{self.path}.{index}.gz"
+                if os.path.exists(older):
+                    os.replace(older, f"{self.path}.{index + 1}.gz")
+            with open(self.path, "rb") as source, gzip.open(f"{self.path}.1.gz", "wb") as target:
+                shutil.copyfileobj(source, target)
+        self._file = open(self.path, "wb")
+        self.rotations += 1
+
+    def _close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "records": self.records,
+                "bytes": self.bytes,
+                "rotations": self.rotations,
+                "errors": self.errors,
+            }
+
+
+traffic_capture = TrafficCapture()
+
+
+def configure_traffic_capture(config) -> None:
+    traffic_capture.configure(
+        path=config.get("TRAFFIC_CAPTURE_PATH", ""),
+        max_bytes=config.get("TRAFFIC_CAPTURE_MAX_BYTES", 64 * 1024 * 1024),
+        backups=config.get("TRAFFIC_CAPTURE_BACKUPS", 5),
+        sample_rate=config.get("TRAFFIC_CAPTURE_SAMPLE_RATE", 1.0),
+    )
+
+
+def capture_files(path: str) -> list:
+    """
+    The segments of the capture at `path`, oldest first.
+    """
+    files = []
+    index = 1
+    while os.path.exists(f"{path}.{index}.gz"):
+        files.insert(0, f"{path}.{index}.gz")
+        index += 1
+    if os.path.exists(path):
+        files.append(path)
+    return files
+
+
+def read_capture(path: str):
+    """
+    Yield the records of every segment of the capture at `path`, oldest first.
+
+    A truncated last line, e.g. from a worker killed mid-write, is skipped.
+    """
+    for name in capture_files(path):
+        opener = gzip.open if name.endswith(".gz") else open
+        with opener(name, "rt", encoding="utf-8") as lines:
+            for line in lines:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    continue
+
+
+def begin_request() -> None:
+    _started.set((time.time(), time.perf_counter()))
+
+
+def sse_answer(body: bytes) -> str:
+    """
+    Answer assembled from the `token` events of a server-sent event stream.
+    """
+    parts = []
+    for event in body.decode("utf-8", errors="replace").split("\n\n"):
+        name, _, data = event.partition("\ndata: ")
+        if name == "event: token":
+            try:
+                parts.append(json.loads(data)["delta"])
+            except (ValueError, KeyError):
+                continue
+    return "".join(parts)
+
+
+def capture_response(response, record: dict, outcome):
+    """
+    Append `record` completed with the arrival time and outcome of `response`; returns the response.
+
+    `outcome()` returns the fields only known once the answer is complete
+    (upstream timings, prompt size, model, cache status). A streamed
+    response is captured after its last chunk has been sent.
+    """
+    arrived, started = _started.get() or (time.time(), None)
+
+    def complete(body: bytes) -> None:
+        elapsed = time.perf_counter() - started if started is not None else None
+        if response.is_streamed:
+            answer = {"answer": sse_answer(body)}
+        else:
+            try:
+                answer = json.loads(body) if body else None
+            except ValueError:
+                answer = None
+        traffic_capture.append({
+            "ts": round(arrived, 3),
+            **record,
+            "status": response.status_code,
+            "latency_ms": round(elapsed * 1000, 1) if elapsed is not None else None,
+            **outcome(),
+            "response": answer,
+        })
+
+    if not response.is_streamed:
+        complete(response.get_data())
+        return response
+
+    chunks = response.response
+
+    def tee():
+        sent = []
+        try:
+            for chunk in chunks:
+                sent.append(chunk if isinstance(chunk, bytes) else chunk.encode("utf-8"))
+                yield chunk
+        finally:
+            complete(b"".join(sent))
+
+    response.response = tee()
+    return response
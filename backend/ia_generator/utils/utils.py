@@ -1,12 +1,124 @@
 import os
 
+from ia_generator.constants.agents import agent_for_training_path
+from ia_generator.utils.corpus_cache import corpus_cache
+from ia_generator.utils.metrics import metrics
+from ia_generator.utils.retrieval import select_training_examples
+from ia_generator.utils.token_budget import account_prompt, budget_for, get_last_accounting
+from ia_generator.services.model_router import model_router
+from ia_generator.services.response_cache import content_version, make_cache_key
+
+# (prompt, directory) -> (corpus the prefix was built from, prefix)
+_prompt_prefixes = {}
+
+
 def load_training_files(directory: str) -> str:
- 
-    contents = []
-    for filename in os.listdir(directory):
-        if filename.endswith(".txt"):
-            filepath = os.path.join(directory, filename)
-            with open(filepath, "r", encoding="utf-8") as f:
-                contents.append(f.read())
-
-    return "\n\n".join(contents)
+    """
+    Return every `.txt` file in `directory` joined by blank lines.
+
+    Served from the process-wide corpus cache; files are only re-read from
+    disk when their mtime or size changed since the previous call.
+    """
+    return corpus_cache.get(directory)
+
+
+def build_prompt_prefix(prompt: str, training_path: str) -> str:
+    """
+    Return the static part of an agent prompt: the template plus its training data.
+
+    The prefix is rebuilt only when the corpus cache hands back a different
+    corpus string, i.e. when a training file changed on disk. It is sent as
+    the system message, byte-identical across requests, so upstream can
+    serve it from its prompt cache.
+    """
+    training_data = load_training_files(training_path)
+    key = (prompt, os.path.abspath(training_path))
+
+    cached = _prompt_prefixes.get(key)
+    if cached is not None and cached[0] is training_data:
+        return cached[1]
+
+    prefix = f"{prompt}\n\nHere is additional training data:\n{training_data}"
+    _prompt_prefixes[key] = (training_data, prefix)
+    return prefix
+
+
+def prompt_messages(prefix: str, question: str) -> list:
+    """
+    Chat messages for a static `prefix` followed by the dynamic `question`.
+    """
+    return [
+        {"role": "system", "content": prefix},
+        {"role": "user", "content": question},
+    ]
+
+
+def build_full_prompt(prompt: str, training_path: str, question: str, retrieval: dict = None) -> list:
+    """
+    Assemble the chat messages sent upstream.
+
+    Without `retrieval` the whole training directory is inlined ("all" mode).
+    With it, only the most relevant chunks are included ("top-k" mode);
+    `retrieval` holds the keyword arguments of `select_training_examples`.
+    Token counts are recorded for every prompt, and training files are
+    trimmed when the agent has a token budget the prompt would exceed.
+    The template and training data go in the system message and the
+    question in the user message, so only the latter varies between calls.
+    """
+    agent = agent_for_training_path(training_path)
+    metrics.set_agent(agent)
+    with metrics.timer("corpus_load"):
+        if retrieval:
+            documents = (("retrieved", select_training_examples(training_path, question, **retrieval)),)
+            fingerprint = None
+        else:
+            documents = corpus_cache.documents(training_path)
+            fingerprint = corpus_cache.fingerprint(training_path)
+
+    with metrics.timer("prompt_build"):
+        kept, accounting = account_prompt(agent, prompt, documents, question, budget_for(agent), fingerprint)
+
+        if retrieval or accounting["trimmed_files"]:
+            training_data = "\n\n".join(content for _, content in kept)
+            return prompt_messages(f"{prompt}\n\nHere is additional training data:\n{training_data}", question)
+        return prompt_messages(build_prompt_prefix(prompt, training_path), question)
+
+
+def agent_cache_key(prompt: str, training_path: str, question: str, model: str, temperature: float, retrieval: dict = None) -> str:
+    """
+    Key identifying an agent call, for the response cache and request coalescing.
+
+    The corpus fingerprint and template version make edits to training
+    files or prompts miss the cache.
+    """
+    return make_cache_key(**_agent_cache_parts(prompt, training_path, model, temperature, retrieval), question=question)
+
+
+def agent_cache_scope(prompt: str, training_path: str, model: str, temperature: float, retrieval: dict = None) -> str:
+    """
+    Key of everything but the question in `agent_cache_key`: calls in one scope may share near-duplicate answers.
+    """
+    return make_cache_key(**_agent_cache_parts(prompt, training_path, model, temperature, retrieval))
+
+
+def _agent_cache_parts(prompt: str, training_path: str, model: str, temperature: float, retrieval: dict = None) -> dict:
+    return {
+        "agent": agent_for_training_path(training_path),
+        "model": model,
+        "temperature": temperature,
+        "template": content_version(prompt),
+        "corpus": corpus_cache.fingerprint(training_path),
+        "retrieval": retrieval,
+    }
+
+
+def route_agent_models(training_path: str, default_model: str) -> tuple:
+    """
+    Models to try for the prompt just built by `build_full_prompt`, best first.
+
+    Agent cache keys use `default_model`; the model that actually answers is
+    added to them by the service layer (see `model_cache_key`).
+    """
+    accounting = get_last_accounting()
+    prompt_tokens = accounting["total_tokens"] if accounting else 0
+    return model_router.route(agent_for_training_path(training_path), prompt_tokens, default_model)
@@ -1,16 +1,35 @@
-from flask import Flask, Blueprint, jsonify, request, abort
+from flask import Flask, Blueprint, Response, g, jsonify, request, abort
 from flask_cors import CORS
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
 import os
+import time
 
 from ia_generator.routes.ia_routes import ia_generator_bp
+from ia_generator.constants.agents import agent_near_duplicate_thresholds, agent_token_budgets, configure_agents
+from ia_generator.utils.preload import preload_agent_corpora
+from ia_generator.utils.corpus_snapshot import load_corpus_snapshot
+from ia_generator.services.response_cache import configure_response_cache
+from ia_generator.services.job_queue import job_queue
+from ia_generator.services.near_duplicate_cache import configure_near_duplicate_cache, near_duplicate_cache
+from ia_generator.services.rate_limit import request_cost  # also registers the sqlite:// limiter storage
+from ia_generator.utils.token_budget import configure_token_budgets
+from ia_generator.utils.corpus_cache import corpus_cache
+from ia_generator.utils.compression import configure_response_compression, response_compressor
+from ia_generator.utils.traffic_capture import configure_traffic_capture, traffic_capture
+from ia_generator.utils.metrics import CallbackGauge, metrics
+from ia_generator.services.response_cache import response_cache
+from ia_generator.services.singleflight import single_flight
+from ia_generator.services.upstream_policy import configure_upstream_policy, upstream_policy
+from ia_generator.services.model_router import configure_model_router, model_router
+from ia_generator.services.auditservice import configure_audit_chunking, configure_audit_gate, configure_typescript_repair
 from config import config
 
 
 def create_app(config_name="development"):
     app = Flask(__name__)
     app.config.from_object(config[config_name])
+    app.logger.setLevel(app.config["LOG_LEVEL"])
 
     # === CORS ===
     CORS(app, resources={
@@ -20,10 +39,12 @@ def create_app(config_name="development"):
     })
 
     # === Rate Limiter ===
-    Limiter(
+    limiter = Limiter(
         get_remote_address,
         app=app,
         default_limits=[app.config["RATELIMIT_DEFAULT"]],
+        application_limits=[app.config["RATELIMIT_TOKENS"]],
+        application_limits_cost=request_cost,
         storage_uri=app.config["RATELIMIT_STORAGE_URI"]
     )
 
@@ -36,10 +57,112 @@ def create_app(config_name="development"):
         #        abort(403, description="Forbidden: Invalid or missing API token")
         pass
 
+    # === Agent registry ===
+    configure_agents(app.config)
+
+    # === Prompt token budgets ===
+    configure_token_budgets(
+        default=app.config["TOKEN_BUDGET_DEFAULT"],
+        agents={**agent_token_budgets(), **app.config["TOKEN_BUDGETS"]},
+        tokenizer=app.config["TOKENIZER"],
+        factor=app.config["TOKEN_ESTIMATE_FACTOR"],
+    )
+
+    # === Response cache ===
+    configure_response_cache(app.config)
+    configure_near_duplicate_cache(
+        thresholds={**agent_near_duplicate_thresholds(), **app.config["NEAR_DUPLICATE_THRESHOLDS"]},
+        max_entries=app.config["NEAR_DUPLICATE_MAX_ENTRIES"],
+    )
+
+    # === Response compression ===
+    configure_response_compression(app.config)
+
+    # === Traffic capture ===
+    configure_traffic_capture(app.config)
+
+    # === Upstream retries and circuit breaker ===
+    configure_upstream_policy(app.config)
+
+    # === Model routing ===
+    configure_model_router(app.config)
+
+    # === Chunked audits and validation gate ===
+    configure_audit_chunking(app.config)
+    configure_audit_gate(app.config)
+    configure_typescript_repair(app.config)
+
+    # === Background jobs ===
+    job_queue.configure(
+        workers=app.config["JOBS_WORKERS"],
+        max_size=app.config["JOBS_MAX_QUEUE"],
+        retention=app.config["JOBS_RETENTION"],
+        store_path=app.config["JOBS_STORE_PATH"],
+    )
+
+    # === Metrics ===
+    metrics.enabled = app.config["METRICS_ENABLED"]
+    if metrics.enabled:
+        metrics.register_stats("ia_corpus_cache", "Training corpus cache counters.", corpus_cache.stats)
+        metrics.register_stats("ia_response_cache", "Response cache counters.", response_cache.stats)
+        metrics.register_stats(
+            "ia_near_duplicate_cache", "Near-duplicate question lookups (hits reuse a cached answer).",
+            near_duplicate_cache.stats,
+        )
+        metrics.register_stats("ia_single_flight", "Coalesced upstream call counters.", single_flight.stats)
+        metrics.register_stats(
+            "ia_response_compression", "Compressed responses and bytes before and after compression.",
+            response_compressor.stats,
+        )
+        metrics.register_stats(
+            "ia_traffic_capture", "Captured request records, bytes written and log rotations.",
+            traffic_capture.stats,
+        )
+        metrics.register_stats("ia_jobs", "Background job queue state.", job_queue.stats)
+        metrics.register_stats(
+            "ia_upstream_circuit",
+            "Upstream retries and circuit breaker (state_code 0 closed, 1 half-open, 2 open).",
+            upstream_policy.stats,
+        )
+        metrics.register(CallbackGauge(
+            "ia_model_health", "Recent upstream outcomes and latency per model.", ("model", "stat"),
+            model_router.health_samples,
+        ))
+
+        @app.before_request
+        def start_request_timer():
+            g.request_started = time.perf_counter()
+
+        @app.after_request
+        def record_request_metrics(response):
+            started = g.get("request_started")
+            if started is not None:
+                endpoint = request.url_rule.rule if request.url_rule is not None else "unmatched"
+                metrics.record_request(endpoint, response.status_code, time.perf_counter() - started)
+            return response
+
+        @app.route("/metrics")
+        @limiter.exempt
+        def metrics_endpoint():
+            return Response(metrics.expose(), mimetype="text/plain; version=0.0.4")
+
     # === Routes ===
     app.register_blueprint(ia_generator_bp, url_prefix='/ia-generator')
 
+    # === Corpus snapshot ===
+    if app.config["CORPUS_SNAPSHOT_PATH"]:
+        load_corpus_snapshot(app.config["CORPUS_SNAPSHOT_PATH"], app.logger)
+
+    # === Corpus preloading ===
+    if app.config["PRELOAD_CORPORA"]:
+        preload_agent_corpora(
+            app.logger,
+            retrieval_agents=app.config["RETRIEVAL_AGENTS"],
+            index_dir=app.config["RETRIEVAL_INDEX_DIR"],
+        )
+
     @app.route("/")
+    @limiter.exempt
     def status_server():
         return f"✅ Running in {config_name} mode."
 
@@ -0,0 +1,36 @@
+import pytest
+
+from benchmarks.fake_llm_server import FakeLLMServer
+from ia_generator.services.llm_services import reset_openai_clients
+from ia_generator.services.model_router import model_router
+from ia_generator.services.upstream_policy import upstream_policy
+
+
+@pytest.fixture(autouse=True)
+def fresh_upstream_policy():
+    """
+    Start every test with a closed circuit and no real sleeping between retries.
+    """
+    upstream_policy.configure()
+    upstream_policy.sleep = lambda seconds: None
+    yield upstream_policy
+    upstream_policy.configure()
+
+
+@pytest.fixture(autouse=True)
+def fresh_model_router():
+    model_router.configure()
+    yield model_router
+    model_router.configure()
+
+
+@pytest.fixture
+def llm_stub(monkeypatch):
+    stub = FakeLLMServer()
+    stub.start()
+    monkeypatch.setenv("OPENAI_API_KEY", "sk-test")
+    monkeypatch.setenv("OPENAI_BASE_URL", stub.url)
+    reset_openai_clients()
+    yield stub
+    reset_openai_clients()
+    stub.stop()
@@ -0,0 +1,68 @@
+import threading
+import time
+from unittest.mock import patch
+
+import pytest
+from flask import Flask
+
+from ia_generator.routes.ia_routes import ia_generator_bp
+
+
+@pytest.fixture
+def client():
+    app = Flask(__name__)
+    app.config.update(BATCH_MAX_ITEMS=5, BATCH_MAX_PARALLELISM=3)
+    app.register_blueprint(ia_generator_bp, url_prefix="/ia")
+    return app.test_client()
+
+
+@patch("ia_generator.routes.ia_routes.frontend_agent_handler")
+@patch("ia_generator.routes.ia_routes.smart_contract_handler")
+def test_batch_returns_results_and_errors_in_order(mock_contract, mock_frontend, client):
+    mock_contract.return_value = "Rust code"
+    mock_frontend.side_effect = RuntimeError("upstream failed")
+
+    response = client.post("/ia/batch", json={"items": [
+        {"agent": "service_smartcontract_agent", "question": "Counter"},
+        {"agent": "gearjs_frontend_agent", "question": "Wallet"},
+        {"agent": "unknown_agent", "question": "?"},
+        {"agent": "lib_smartcontract_agent"},
+    ]})
+
+    assert response.status_code == 200
+    results = response.json["results"]
+    assert [r["index"] for r in results] == [0, 1, 2, 3]
+    assert results[0]["answer"] == "Rust code"
+    assert results[1]["error"] == "upstream failed"
+    assert "Unknown agent" in results[2]["error"]
+    assert "question" in results[3]["error"]
+    assert response.json["succeeded"] == 1 and response.json["failed"] == 3
+
+
+@patch("ia_generator.routes.ia_routes.server_agent_handler")
+def test_batch_parallelism_is_capped(mock_handler, client):
+    active = []
+    peak = []
+    lock = threading.Lock()
+
+    def slow(*args, **kwargs):
+        with lock:
+            active.append(1)
+            peak.append(len(active))
+        time.sleep(0.1)
+        with lock:
+            active.pop()
+        return "ok"
+
+    mock_handler.side_effect = slow
+    items = [{"agent": "script_server_agent", "question": f"q{i}"} for i in range(5)]
+    response = client.post("/ia/batch", json={"items": items, "parallelism": 10})
+
+    assert response.json["succeeded"] == 5
+    assert max(peak) == 3
+
+
+def test_batch_rejects_oversized_requests(client):
+    items = [{"agent": "script_server_agent", "question": "q"}] * 6
+    assert client.post("/ia/batch", json={"items": items}).status_code == 400
+    assert client.post("/ia/batch", json={}).status_code == 400
@@ -0,0 +1,39 @@
+import threading
+
+from flask import Flask
+from werkzeug.serving import make_server
+
+from benchmarks.cold_start import run_cold_start
+from benchmarks.load_test import percentile, run_load
+from ia_generator.routes.ia_routes import ia_generator_bp
+
+
+def test_percentile_uses_nearest_rank():
+    samples = [0.1 * i for i in range(1, 101)]
+    assert percentile(samples, 0.50) == samples[49]
+    assert percentile(samples, 0.99) == samples[98]
+    assert percentile([], 0.95) == 0.0
+
+
+def test_run_load_reports_every_route(llm_stub):
+    app = Flask(__name__)
+    app.register_blueprint(ia_generator_bp, url_prefix="/ia-generator")
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        report = run_load(f"http://127.0.0.1:{server.server_port}", ["script_server_agent", "audit_smartcontract"], 3, 2, False, True)
+    finally:
+        server.shutdown()
+
+    assert report["total"]["requests"] == 6
+    assert report["total"]["errors"] == 0
+    assert report["routes"]["audit_smartcontract"]["p99_ms"] > 0
+    assert report["total"]["body_bytes"] == report["total"]["wire_bytes"] > 0
+
+
+def test_cold_start_compares_directories_and_snapshot():
+    report = run_cold_start(repeats=1)
+
+    assert report["snapshot_bytes"] > 0
+    assert report["directories"]["prefix_bytes"] == report["snapshot"]["prefix_bytes"]
+    assert report["snapshot"]["load_seconds"] > 0
@@ -0,0 +1,187 @@
+import pytest
+from flask import Flask
+
+from ia_generator.constants.agents import AgentSpec, OPTIMIZATION_RULES, SERVICE_RULES
+from ia_generator.routes.ia_routes import ia_generator_bp
+from ia_generator.services.auditservice import configure_typescript_repair
+from ia_generator.utils.code_validator import mask_literals, validate
+from ia_generator.utils.traffic_capture import sse_answer
+
+CONTRACT = """```rust
+#![no_std]
+use sails_rs::prelude::*;
+
+pub struct Service;
+
+#[service]
+impl Service {
+    // A comment with &str, 1.5 and an unmatched }
+    pub fn greet(&mut self, name: String) -> String {
+        let template = "Hello, {}! {"; let open = '{';
+        let lifetime_free: &'static [u8] = b"}";
+        let raw = r#"a "quoted" } brace"#;
+        format!("{}{}{}", template, name, open)
+    }
+
+    pub fn pair(&self) -> u128 {
+        let pair = (1u128, (2u128, 3u128));
+        pair.1.0 + (0..10).len() as u128
+    }
+}
+```
+"""
+
+
+def test_clean_contract_passes():
+    assert validate(CONTRACT, OPTIMIZATION_RULES) == []
+
+
+def test_literals_and_comments_are_masked_without_moving_lines():
+    code = 'let a = "}"; /* { /* nested */ } */ let b = \'{\';\n// }\nlet c = 1;'
+    masked, error = mask_literals(code)
+    assert error is None
+    assert masked.count("\n") == code.count("\n")
+    assert "{" not in masked and "}" not in masked
+
+
+def test_path_qualified_service_macro_passes():
+    qualified = CONTRACT.replace("#[service]", "#[sails_rs::service(events = Event)]")
+    assert validate(qualified, SERVICE_RULES) == []
+    assert [violation.rule for violation in validate(qualified.replace("pub struct Service;", "pub struct Service;\n#[sails_rs::program]"), OPTIMIZATION_RULES)] == ["no_program"]
+
+@pytest.mark.parametrize("answer, rule, line", [
+    (CONTRACT.replace("```rust", "```"), "fence", None),
+    (CONTRACT.replace("#[service]\n", ""), "service_macro", None),
+    (CONTRACT.replace("name: String)", "name: &str)"), "no_str_ref", 10),
+    (CONTRACT.replace("-> u128 {", "-> f64 {"), "no_floats", 17),
+    (CONTRACT.replace("as u128\n    }", "as u128\n"), "balanced", 8),
+    (CONTRACT.replace("pub struct Service;", "pub struct Service;\n#[program]"), "no_program", 6),
+])
+def test_violations_name_the_rule_and_answer_line(answer, rule, line):
+    violations = validate(answer, OPTIMIZATION_RULES)
+
+    assert [(violation.rule, violation.line) for violation in violations] == [(rule, line)]
+
+
+def test_typescript_any_is_reported():
+    answer = "```typescript\nconst decode = (data: any): string => `${data}`;\nconst value = raw as any;\n```"
+    assert [violation.line for violation in validate(answer, ("balanced", "no_any"), "typescript")] == [2, 3]
+
+
+@pytest.mark.parametrize("code", [
+    "export const Notice = () => (\n  <p>Don't {label} the wallet</p>\n);",
+    "const brackets = /[(]/g.test(input) ? half / 2 : (total / count);",
+    "const path = url.replace(/\\/+$/, \"\");\nreturn /}/.test(path);",
+])
+def test_tsx_text_and_regex_literals_are_not_reported(code):
+    answer = f"```tsx\n{code}\n```"
+    assert validate(answer, ("balanced",), "typescript") == []
+
+
+def test_unmatched_typescript_bracket_is_still_reported():
+    answer = "```tsx\nexport const Notice = () => (\n  <p>Don't {label</p>\n);\n```"
+    assert [violation.rule for violation in validate(answer, ("balanced",), "typescript")] == ["balanced"]
+
+
+def test_unknown_rules_are_rejected_in_agent_config():
+    with pytest.raises(ValueError, match="no_tabs"):
+        AgentSpec.from_dict({"name": "a", "prompt": "p", "corpus": "c", "handler": "server", "validation": ["balanced", "no_tabs"]})
+
+
+@pytest.fixture
+def client():
+    app = Flask(__name__)
+    app.register_blueprint(ia_generator_bp, url_prefix="/ia")
+    return app.test_client()
+
+
+def test_clean_output_skips_the_audit(llm_stub, client):
+    llm_stub.answer = CONTRACT
+    response = client.post("/ia/batch", json={"items": [
+        {"agent": "service_smartcontract_agent", "question": "Greeter", "audit": True},
+    ]})
+
+    assert response.json["results"][0]["answer"] == CONTRACT
+    assert len(llm_stub.requests) == 1
+
+
+def test_violations_get_a_targeted_repair(llm_stub, client):
+    generated = CONTRACT.replace("name: String)", "name: &str)")
+    llm_stub.answer_next(generated, generated, CONTRACT)
+
+    response = client.post("/ia/service_smartcontract_agent", json={"question": "Greeter"})
+    audited = client.post("/ia/batch", json={"items": [
+        {"agent": "service_smartcontract_agent", "question": "Greeter", "audit": True},
+    ]})
+
+    # Without `audit` the answer is returned as generated
+    assert response.json["answer"] == generated
+    assert audited.json["results"][0]["answer"] == CONTRACT
+    generation, repair = llm_stub.requests[1:]
+    system, user = repair["messages"]
+    assert "fix specific problems" in system["content"] and "Rust" in system["content"]
+    assert "- line 10: `&str` is not allowed, use `String`" in user["content"]
+    assert generated in user["content"]
+
+
+TYPED = "```typescript\nconst decode = (data: Uint8Array): string => data.toString();\n```"
+
+
+@pytest.fixture
+def typescript_repair():
+    configure_typescript_repair({"TYPESCRIPT_REPAIR": True})
+    yield
+    configure_typescript_repair({})
+
+
+def test_typescript_agents_are_repaired_only_when_needed(llm_stub, client, typescript_repair):
+    llm_stub.answer_next(TYPED, TYPED.replace("Uint8Array", "any"), TYPED)
+
+    clean = client.post("/ia/client_server_agent", json={"question": "Client for the IDL"})
+    repaired = client.post("/ia/client_server_agent", json={"question": "Client for another IDL"})
+
+    assert clean.headers["X-Validation"] == "clean" and clean.json["answer"] == TYPED
+    assert repaired.headers["X-Validation"] == "repaired" and repaired.json["answer"] == TYPED
+    assert len(llm_stub.requests) == 3
+    assert "TypeScript" in llm_stub.requests[2]["messages"][0]["content"]
+
+
+def test_streamed_typescript_answers_are_repaired_too(llm_stub, client, typescript_repair):
+    llm_stub.answer_next(TYPED.replace("Uint8Array", "any"), TYPED)
+
+    response = client.post("/ia/client_server_agent?stream=1", json={"question": "Client for the IDL"})
+
+    assert response.headers["X-Validation"] == "repaired"
+    assert sse_answer(response.get_data()) == TYPED
+    assert len(llm_stub.requests) == 2
+
+
+def test_repair_that_fixes_nothing_keeps_the_original(llm_stub, client, typescript_repair):
+    untyped = TYPED.replace("Uint8Array", "any")
+    llm_stub.answer_next(untyped, TYPED.replace("toString()", "toString() as any"))
+
+    response = client.post("/ia/client_server_agent", json={"question": "Client for the IDL"})
+
+    assert response.headers["X-Validation"] == "unrepaired"
+    assert response.json["answer"] == untyped
+
+
+
+def test_partial_repair_is_returned_and_reported(llm_stub, client, typescript_repair):
+    untyped = TYPED.replace("Uint8Array", "any").replace("toString()", "toString() as any")
+    partly = TYPED.replace("toString()", "toString() as any")
+    llm_stub.answer_next(untyped, partly)
+
+    response = client.post("/ia/client_server_agent", json={"question": "Client for the IDL"})
+
+    assert response.headers["X-Validation"] == "partial"
+    assert response.json["answer"] == partly
+
+def test_typescript_repair_is_off_by_default(llm_stub, client):
+    untyped = TYPED.replace("Uint8Array", "any")
+    llm_stub.answer = untyped
+
+    response = client.post("/ia/client_server_agent", json={"question": "Client for the IDL"})
+
+    assert response.json["answer"] == untyped and "X-Validation" not in response.headers
+    assert len(llm_stub.requests) == 1
@@ -0,0 +1,78 @@
+import gzip
+import json
+
+import pytest
+from flask import Flask
+
+from ia_generator.routes.ia_routes import ia_generator_bp
+from ia_generator.utils import compression
+from ia_generator.utils.compression import parse_accept_encoding, response_compressor
+
+LONG_ANSWER = "fn handle() { let state = State::default(); }\n" * 100
+
+
+@pytest.fixture
+def client():
+    response_compressor.configure(enabled=True, min_bytes=512)
+    app = Flask(__name__)
+    app.config.update(REQUEST_SIZE_LIMIT_DEFAULT=4096, REQUEST_SIZE_LIMITS={"batch": 16384})
+    app.register_blueprint(ia_generator_bp, url_prefix="/ia")
+    yield app.test_client()
+    response_compressor.configure()
+
+
+def test_accept_encoding_is_negotiated(monkeypatch):
+    monkeypatch.setattr(compression, "brotli", None)
+    assert parse_accept_encoding("gzip;q=0.5, br, identity;q=0") == {"gzip": 0.5, "br": 1.0, "identity": 0.0}
+    assert response_compressor.negotiate("gzip, deflate, br") == "gzip"
+    assert response_compressor.negotiate("gzip;q=0, *;q=0.1") is None
+    assert response_compressor.negotiate("identity") is None
+
+
+def test_large_answers_are_gzipped(llm_stub, client):
+    llm_stub.answer = LONG_ANSWER
+    response = client.post("/ia/script_server_agent", json={"question": "q"}, headers={"Accept-Encoding": "gzip"})
+
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert "Accept-Encoding" in response.headers["Vary"]
+    assert int(response.headers["Content-Length"]) < len(LONG_ANSWER) / 10
+    assert json.loads(gzip.decompress(response.data))["answer"] == LONG_ANSWER
+    assert response_compressor.stats()["bytes_saved"] > 0
+
+
+def test_small_identity_and_streamed_responses_are_not_compressed(llm_stub, client):
+    small = client.post("/ia/script_server_agent", json={"question": "q"}, headers={"Accept-Encoding": "gzip"})
+    llm_stub.answer = LONG_ANSWER
+    identity = client.post("/ia/script_server_agent", json={"question": "q"})
+    streamed = client.post("/ia/script_server_agent?stream=1", json={"question": "q"}, headers={"Accept-Encoding": "gzip"})
+
+    assert "Content-Encoding" not in small.headers
+    assert "Content-Encoding" not in identity.headers
+    assert "Content-Encoding" not in streamed.headers and b"event: done" in streamed.data
+
+
+def test_question_echo_can_be_omitted(llm_stub, client):
+    echoed = client.post("/ia/script_server_agent", json={"question": "q"})
+    omitted = client.post("/ia/script_server_agent", json={"question": "q", "echo_question": False})
+
+    assert echoed.json == {"question": "q", "answer": "Stub answer"}
+    assert omitted.json == {"answer": "Stub answer"}
+
+
+
+@pytest.mark.parametrize("route", ["/ia/script_server_agent", "/ia/audit_smartcontract"])
+@pytest.mark.parametrize("value", ["false", "0", 0, ["no"]])
+def test_question_echo_must_be_a_boolean(llm_stub, client, route, value):
+    response = client.post(route, json={"question": "q", "echo_question": value})
+
+    assert response.status_code == 400 and "echo_question" in response.json["error"]
+    assert llm_stub.requests == []
+
+def test_oversized_bodies_are_refused_per_route(llm_stub, client):
+    body = {"question": "x" * 8000}
+    refused = client.post("/ia/script_server_agent", json=body)
+    batch = client.post("/ia/batch", json={"items": [{"agent": "script_server_agent", **body}]})
+
+    assert refused.status_code == 413 and "4096 byte limit" in refused.json["error"]
+    assert batch.status_code == 200
+    assert len(llm_stub.requests) == 1
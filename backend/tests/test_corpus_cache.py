@@ -0,0 +1,61 @@
+import os
+import pytest
+from ia_generator.utils.corpus_cache import CorpusCache
+
+
+@pytest.fixture
+def corpus_dir(tmp_path):
+    (tmp_path / "1.data.txt").write_text("first", encoding="utf-8")
+    (tmp_path / "2.data.txt").write_text("second", encoding="utf-8")
+    (tmp_path / "notes.md").write_text("ignored", encoding="utf-8")
+    return tmp_path
+
+
+def test_second_load_is_served_from_memory(corpus_dir):
+    cache = CorpusCache()
+    first = cache.get(str(corpus_dir))
+    second = cache.get(str(corpus_dir))
+
+    assert "first" in first and "second" in first and "ignored" not in first
+    assert second is first
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+    assert cache.stats()["files_read"] == 2
+
+
+def test_only_changed_files_are_reread(corpus_dir):
+    cache = CorpusCache()
+    cache.get(str(corpus_dir))
+
+    changed = corpus_dir / "2.data.txt"
+    changed.write_text("second, edited", encoding="utf-8")
+    st = os.stat(changed)
+    os.utime(changed, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000))
+
+    text = cache.get(str(corpus_dir))
+    assert "second, edited" in text
+    assert cache.stats()["files_read"] == 3
+
+
+def test_added_and_removed_files_invalidate(corpus_dir):
+    cache = CorpusCache()
+    cache.get(str(corpus_dir))
+
+    (corpus_dir / "3.data.txt").write_text("third", encoding="utf-8")
+    (corpus_dir / "1.data.txt").unlink()
+
+    text = cache.get(str(corpus_dir))
+    assert "third" in text and "first" not in text
+
+
+def test_missing_directory_raises(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        CorpusCache().get(str(tmp_path / "missing"))
+
+
+def test_documents_are_in_natural_filename_order(corpus_dir):
+    (corpus_dir / "10.data.txt").write_text("tenth", encoding="utf-8")
+    (corpus_dir / "a.txt").write_text("named", encoding="utf-8")
+
+    documents = CorpusCache().documents(str(corpus_dir))
+    assert [filename for filename, _ in documents] == ["1.data.txt", "2.data.txt", "10.data.txt", "a.txt"]
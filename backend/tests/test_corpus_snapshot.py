@@ -0,0 +1,93 @@
+import json
+import sys
+
+import pytest
+
+from ia_generator.constants.agents import AgentSpec, configure_agents
+from ia_generator.exceptions.exceptions import CorpusSnapshotError
+from ia_generator.utils.corpus_cache import CorpusCache, corpus_cache
+from ia_generator.utils import corpus_snapshot
+from ia_generator.utils.corpus_snapshot import CorpusSnapshot, build_snapshot, load_corpus_snapshot
+
+
+@pytest.fixture
+def agents(tmp_path):
+    corpus = tmp_path / "corpus"
+    corpus.mkdir()
+    (corpus / "1.data.txt").write_text("first", encoding="utf-8")
+    (corpus / "10.data.txt").write_text("tenth", encoding="utf-8")
+    (corpus / "2.data.txt").write_text("second ✓", encoding="utf-8")
+    return {"tiny_agent": AgentSpec("tiny_agent", "Template", str(corpus), "server")}
+
+
+@pytest.mark.parametrize("compress", [False, True])
+def test_snapshot_serves_the_same_corpus(agents, tmp_path, compress):
+    path = str(tmp_path / "corpus.snapshot")
+    build_snapshot(path, agents, compress=compress)
+    directory = agents["tiny_agent"].training_path
+
+    cache = CorpusCache()
+    cache.attach_snapshot(CorpusSnapshot(path))
+
+    assert cache.get(directory) == CorpusCache().get(directory)
+    assert cache.fingerprint(directory) == CorpusCache().fingerprint(directory)
+    assert cache.stats()["files_read"] == 0 and cache.stats()["snapshot_loads"] == 1
+
+
+def test_corrupt_snapshot_is_rejected(agents, tmp_path):
+    path = tmp_path / "corpus.snapshot"
+    build_snapshot(str(path), agents)
+    data = bytearray(path.read_bytes())
+    data[-1] ^= 0xFF
+    path.write_bytes(bytes(data))
+
+    with pytest.raises(CorpusSnapshotError):
+        CorpusSnapshot(str(path))
+
+
+def test_missing_or_stale_snapshot_falls_back_to_directories(agents, tmp_path):
+    path = str(tmp_path / "corpus.snapshot")
+    assert load_corpus_snapshot(path) is None
+
+    # Built for other agents and templates than the registry's
+    build_snapshot(path, agents)
+    assert load_corpus_snapshot(path) is None
+    assert corpus_cache.stats()["snapshot_loads"] == 0
+
+
+def test_registry_snapshot_is_attached(tmp_path):
+    path = str(tmp_path / "corpus.snapshot")
+    build_snapshot(path)
+    try:
+        assert load_corpus_snapshot(path) is not None
+        assert CorpusSnapshot(path).stale_agents() == []
+    finally:
+        corpus_cache.attach_snapshot(None)
+
+
+def test_edited_training_file_makes_the_snapshot_stale(agents, tmp_path):
+    path = str(tmp_path / "corpus.snapshot")
+    build_snapshot(path, agents)
+    snapshot = CorpusSnapshot(path)
+    assert snapshot.stale_agents(agents) == []
+
+    (tmp_path / "corpus" / "2.data.txt").write_text("second, edited", encoding="utf-8")
+    assert snapshot.stale_agents(agents) == ["tiny_agent"]
+    snapshot.close()
+
+
+def test_snapshot_build_covers_agents_file_agents(agents, tmp_path, monkeypatch):
+    agents_file = tmp_path / "agents.json"
+    spec = agents["tiny_agent"]
+    agents_file.write_text(json.dumps([{"name": spec.name, "prompt": spec.prompt, "corpus": spec.corpus, "handler": spec.handler}]))
+    path = str(tmp_path / "corpus.snapshot")
+    monkeypatch.setenv("AGENTS_FILE", str(agents_file))
+    monkeypatch.setattr(sys, "argv", ["corpus_snapshot", "--output", path])
+    try:
+        corpus_snapshot.main()
+        configure_agents({"AGENTS_FILE": str(agents_file)})
+        snapshot = load_corpus_snapshot(path)
+        assert snapshot is not None and snapshot.has(spec.training_path)
+    finally:
+        corpus_cache.attach_snapshot(None)
+        configure_agents({})
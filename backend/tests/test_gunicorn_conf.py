@@ -0,0 +1,36 @@
+import os
+import runpy
+
+from ia_generator.services import llm_services
+
+CONF_PATH = os.path.join(os.path.dirname(__file__), "..", "gunicorn.conf.py")
+
+
+def test_settings_follow_environment(monkeypatch):
+    monkeypatch.setenv("WEB_CONCURRENCY", "3")
+    monkeypatch.setenv("GUNICORN_PRELOAD", "false")
+    settings = runpy.run_path(CONF_PATH)
+
+    assert settings["workers"] == 3
+    assert settings["worker_class"] == "gthread"
+    assert settings["preload_app"] is False
+
+
+def test_graceful_timeout_covers_the_upstream_deadline(monkeypatch):
+    monkeypatch.delenv("GUNICORN_GRACEFUL_TIMEOUT", raising=False)
+    monkeypatch.delenv("UPSTREAM_DEADLINE", raising=False)
+    assert runpy.run_path(CONF_PATH)["graceful_timeout"] == 300
+
+    monkeypatch.setenv("UPSTREAM_DEADLINE", "450.5")
+    assert runpy.run_path(CONF_PATH)["graceful_timeout"] == 451
+
+
+def test_post_fork_drops_inherited_openai_client(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "sk-test")
+    settings = runpy.run_path(CONF_PATH)
+    inherited = llm_services.get_openai_client()
+
+    settings["post_fork"](None, None)
+
+    assert llm_services.get_openai_client() is not inherited
+    llm_services.reset_openai_clients()
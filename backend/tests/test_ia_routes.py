@@ -1,6 +1,9 @@
+import json
+
 import pytest
 from flask import Flask
 from unittest.mock import patch
+from ia_generator.constants import agents
 from ia_generator.routes.ia_routes import ia_generator_bp
 
 @pytest.fixture
@@ -154,4 +157,42 @@ def test_gearhooks_frontend_agent_success(mock_handler, client):
 def test_gearhooks_frontend_agent_missing_field(client):
     response = client.post("/ia/gearhooks_frontend_agent", json={})
     assert response.status_code == 400
-    assert "error" in response.json
\ No newline at end of file
+    assert "error" in response.json
+
+def test_unknown_agent_is_not_found(client):
+    response = client.post("/ia/unknown_agent", json={"question": "Prompt Test"})
+    assert response.status_code == 404
+
+
+@patch("ia_generator.routes.ia_routes.server_agent_handler")
+def test_agents_from_config_get_a_route(mock_handler, client, tmp_path):
+    agents_file = tmp_path / "agents.json"
+    agents_file.write_text(json.dumps([{
+        "name": "docs_server_agent", "prompt": "Answer about docs.", "corpus": str(tmp_path),
+        "handler": "server", "model": "gpt-4.1-mini", "temperature": 0.3,
+    }]), encoding="utf-8")
+    agents.configure_agents({"AGENTS_FILE": str(agents_file)})
+    try:
+        mock_handler.return_value = "Mocked response"
+        response = client.post("/ia/docs_server_agent", json={"question": "Prompt Test"})
+    finally:
+        agents.configure_agents({})
+
+    assert response.status_code == 200
+    args, kwargs = mock_handler.call_args
+    assert args == ("Answer about docs.", str(tmp_path), "Prompt Test")
+    assert (kwargs["model"], kwargs["temperature"]) == ("gpt-4.1-mini", 0.3)
+    assert "docs_server_agent" not in agents.AGENTS
+
+
+@pytest.mark.parametrize("route, body", [
+    ("/ia/script_server_agent", {"question": 123}),
+    ("/ia/script_server_agent", {"question": ["a"]}),
+    ("/ia/optimization_smartcontract_agent", {"question": "q", "mode": "patch", "source": {"lib.rs": "x"}}),
+    ("/ia/audit_smartcontract", {"question": {"code": "x"}}),
+    ("/ia/jobs", {"agent": "script_server_agent", "question": 123}),
+])
+def test_non_string_question_or_source_is_rejected(client, route, body):
+    response = client.post(route, json=body)
+    assert response.status_code == 400
+    assert "training files" not in response.json["error"]
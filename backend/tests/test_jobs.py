@@ -0,0 +1,138 @@
+import json
+import subprocess
+import sys
+import threading
+import time
+from unittest.mock import patch
+
+import pytest
+from flask import Flask
+
+from ia_generator.routes.ia_routes import ia_generator_bp
+from ia_generator.exceptions.exceptions import JobQueueFullError
+from ia_generator.services.job_queue import JobQueue
+
+
+@pytest.fixture
+def client(monkeypatch):
+    queue = JobQueue(workers=1, max_size=2)
+    monkeypatch.setattr("ia_generator.routes.ia_routes.job_queue", queue)
+    app = Flask(__name__)
+    app.register_blueprint(ia_generator_bp, url_prefix="/ia")
+    yield app.test_client()
+    queue.shutdown(timeout=5)
+
+
+@patch("ia_generator.routes.ia_routes.smart_contract_handler")
+def test_submit_then_long_poll_result(mock_handler, client):
+    mock_handler.return_value = "Audited code"
+    response = client.post("/ia/jobs", json={"agent": "service_smartcontract_agent", "question": "Counter", "audit": True})
+
+    assert response.status_code == 202
+    job_id = response.json["job_id"]
+    assert response.headers["Location"].endswith(f"/ia/jobs/{job_id}")
+
+    job = client.get(f"/ia/jobs/{job_id}?wait=5").json
+    assert job["status"] == "succeeded"
+    assert job["result"] == "Audited code"
+    assert mock_handler.call_args.kwargs["audit"] is True
+
+
+@patch("ia_generator.routes.ia_routes.server_agent_handler")
+def test_full_queue_returns_429(mock_handler, client):
+    started = threading.Event()
+    release = threading.Event()
+
+    def block(*args, **kwargs):
+        started.set()
+        release.wait(5)
+        return "done"
+
+    mock_handler.side_effect = block
+    item = {"agent": "script_server_agent", "question": "q"}
+    first = client.post("/ia/jobs", json=item)
+    started.wait(5)
+    statuses = [client.post("/ia/jobs", json=item).status_code for _ in range(3)]
+    release.set()
+
+    assert first.status_code == 202
+    assert statuses == [202, 202, 429]
+
+
+def test_invalid_requests(client):
+    assert client.post("/ia/jobs", json={"agent": "nope", "question": "q"}).status_code == 400
+    assert client.post("/ia/jobs", json={"agent": "gearjs_frontend_agent", "question": "q", "audit": True}).status_code == 400
+    assert client.get("/ia/jobs/unknown").status_code == 404
+
+
+def test_jobs_are_visible_from_another_process_store(tmp_path):
+    # The store directory is created on first use, like the production default under .cache/
+    path = str(tmp_path / "cache" / "jobs.sqlite3")
+    producer = JobQueue(workers=1, store_path=path)
+    job = producer.submit(lambda: "answer", description={"agent": "script_server_agent"})
+    job.done.wait(5)
+
+    other_process = JobQueue(store_path=path)
+    data = other_process.wait(job.id, timeout=1)
+    assert data["status"] == "succeeded" and data["result"] == "answer"
+    producer.shutdown(timeout=5)
+
+
+
+def test_jobs_are_stored_before_a_worker_can_take_them(tmp_path):
+    queue = JobQueue(workers=1, store_path=str(tmp_path / "jobs.sqlite3"))
+    enqueue = queue._queue.put_nowait
+    stored = []
+
+    def put_nowait(job):
+        stored.append(queue._load(job.id)["status"])
+        enqueue(job)
+
+    queue._queue.put_nowait = put_nowait
+    job = queue.submit(lambda: "answer")
+    job.done.wait(5)
+
+    assert stored == ["queued"]
+    assert JobQueue(store_path=queue.store_path).get(job.id)["status"] == "succeeded"
+    queue.shutdown(timeout=5)
+
+
+def test_rejected_jobs_leave_no_row(tmp_path):
+    queue = JobQueue(workers=0, max_size=1, store_path=str(tmp_path / "jobs.sqlite3"))
+    queue.submit(lambda: "first")
+    with pytest.raises(JobQueueFullError):
+        queue.submit(lambda: "second")
+
+    assert queue._store().execute("SELECT COUNT(*) FROM jobs").fetchone()[0] == 1
+
+
+def test_jobs_of_an_exited_worker_process_are_failed(tmp_path):
+    path = str(tmp_path / "jobs.sqlite3")
+    exited = subprocess.Popen([sys.executable, "-c", "pass"])
+    exited.wait()
+    store = JobQueue(store_path=path)
+    with store._store() as conn:
+        conn.execute(
+            "INSERT INTO jobs (id, data, updated_at, pid) VALUES (?, ?, ?, ?)",
+            ("orphan", json.dumps({"job_id": "orphan", "status": "running"}), time.time(), exited.pid),
+        )
+
+    data = JobQueue(store_path=path).wait("orphan", timeout=5)
+    assert data["status"] == "failed" and "stopped" in data["error"]
+    assert store.get("orphan")["status"] == "failed"
+
+def test_production_shares_jobs_between_workers():
+    from config import ProductionConfig
+
+    assert ProductionConfig.JOBS_STORE_PATH.endswith("jobs.sqlite3")
+
+
+def test_failed_jobs_report_error():
+    queue = JobQueue(workers=1)
+
+    def boom():
+        raise RuntimeError("upstream failed")
+
+    job = queue.submit(boom)
+    assert queue.wait(job.id, timeout=5)["error"] == "upstream failed"
+    queue.shutdown(timeout=5)
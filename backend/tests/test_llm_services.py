@@ -0,0 +1,62 @@
+import asyncio
+import time
+
+from flask import Flask
+
+from ia_generator.routes.ia_routes import ia_generator_bp
+from ia_generator.services.auditservice import AuditService
+from ia_generator.services.llm_services import (
+    generate_openai_chat_response,
+    generate_openai_chat_response_async,
+    get_openai_client,
+)
+
+
+def test_sync_calls_share_one_client_and_connection(llm_stub):
+    assert generate_openai_chat_response("first") == "Stub answer"
+    assert generate_openai_chat_response("second") == "Stub answer"
+
+    assert get_openai_client() is get_openai_client()
+    assert llm_stub.connections == 1
+    assert [r["messages"][0]["content"] for r in llm_stub.requests] == ["first", "second"]
+
+
+def test_async_calls_run_concurrently(llm_stub):
+    llm_stub.delay = 0.3
+
+    async def run():
+        return await asyncio.gather(*(
+            generate_openai_chat_response_async(f"question {i}") for i in range(5)
+        ))
+
+    start = time.perf_counter()
+    answers = asyncio.run(run())
+    elapsed = time.perf_counter() - start
+
+    assert answers == ["Stub answer"] * 5
+    assert elapsed < 5 * 0.3
+
+
+def test_audit_uses_shared_client(llm_stub):
+    auditor = AuditService(model="gpt-4.1-mini", audit_mode="lib-contract")
+    assert auditor.audit_response("fn main() {}") == "Stub answer"
+    assert asyncio.run(auditor.audit_response_async("fn main() {}")) == "Stub answer"
+    assert llm_stub.requests[0]["model"] == "gpt-4.1-mini"
+    system, user = llm_stub.requests[0]["messages"]
+    assert system["role"] == "system" and "fn main() {}" not in system["content"]
+    assert user["content"].startswith("fn main() {}")
+
+
+def test_agent_prompt_prefix_is_stable_and_reported_cached(llm_stub):
+    app = Flask(__name__)
+    app.register_blueprint(ia_generator_bp, url_prefix="/ia")
+    client = app.test_client()
+
+    first = client.post("/ia/script_server_agent", json={"question": "Counter"})
+    second = client.post("/ia/script_server_agent", json={"question": "Voting"})
+
+    (system_a, user_a), (system_b, user_b) = (r["messages"] for r in llm_stub.requests)
+    assert system_a == system_b and system_a["role"] == "system"
+    assert (user_a["content"], user_b["content"]) == ("Counter", "Voting")
+    assert first.headers["X-Cached-Prompt-Tokens"] == "0"
+    assert second.headers["X-Cached-Prompt-Tokens"] == "8"
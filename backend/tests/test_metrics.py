@@ -0,0 +1,60 @@
+import pytest
+from flask import Flask
+
+from ia_generator.routes.ia_routes import ia_generator_bp
+from ia_generator.utils.metrics import Histogram, Metrics, metrics
+
+
+@pytest.fixture
+def enabled_metrics():
+    metrics.enabled = True
+    yield metrics
+    metrics.enabled = False
+
+
+def test_histogram_exposes_cumulative_buckets():
+    histogram = Histogram("latency_seconds", "Latency.", ("stage",), buckets=(0.1, 1))
+    histogram.observe(0.05, "upstream")
+    histogram.observe(0.5, "upstream")
+    histogram.observe(5, "upstream")
+
+    lines = histogram.expose()
+    assert 'latency_seconds_bucket{stage="upstream",le="0.1"} 1' in lines
+    assert 'latency_seconds_bucket{stage="upstream",le="1"} 2' in lines
+    assert 'latency_seconds_bucket{stage="upstream",le="+Inf"} 3' in lines
+    assert 'latency_seconds_count{stage="upstream"} 3' in lines
+
+
+def test_disabled_metrics_record_nothing():
+    registry = Metrics()
+    with registry.timer("upstream"):
+        pass
+    registry.record_error("timeout")
+
+    assert "ia_stage_duration_seconds_count" not in registry.expose()
+    assert "ia_upstream_errors_total{" not in registry.expose()
+
+
+def test_agent_call_records_stages_and_usage(llm_stub, enabled_metrics):
+    app = Flask(__name__)
+    app.register_blueprint(ia_generator_bp, url_prefix="/ia")
+    response = app.test_client().post("/ia/script_server_agent", json={"question": "Prompt Test"})
+    assert response.status_code == 200
+
+    text = enabled_metrics.expose()
+    for stage in ("corpus_load", "prompt_build", "upstream"):
+        assert f'ia_stage_duration_seconds_count{{agent="script_server_agent",stage="{stage}"}}' in text
+    # Small script prompts are routed to the faster model
+    assert 'ia_upstream_tokens_total{agent="script_server_agent",model="gpt-4.1-mini",kind="completion"}' in text
+
+
+def test_upstream_failures_are_counted_by_cause(llm_stub, enabled_metrics, monkeypatch):
+    monkeypatch.setenv("OPENAI_BASE_URL", "http://127.0.0.1:9/v1")
+    from ia_generator.services.llm_services import reset_openai_clients
+    reset_openai_clients()
+
+    app = Flask(__name__)
+    app.register_blueprint(ia_generator_bp, url_prefix="/ia")
+    app.test_client().post("/ia/audit_smartcontract", json={"question": "fn main() {}"})
+
+    assert 'ia_upstream_errors_total{agent="audit_smartcontract_agent",cause="connection"}' in enabled_metrics.expose()
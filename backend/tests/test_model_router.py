@@ -0,0 +1,89 @@
+import pytest
+from flask import Flask
+
+from ia_generator.exceptions.exceptions import OpenAIServiceError
+from ia_generator.routes.ia_routes import ia_generator_bp
+from ia_generator.services import model_router as router_module
+from ia_generator.services.model_router import ModelRouter
+from ia_generator.services.response_cache import MemoryCacheBackend, response_cache
+
+
+@pytest.fixture
+def client():
+    app = Flask(__name__)
+    app.register_blueprint(ia_generator_bp, url_prefix="/ia")
+    return app.test_client()
+
+
+def test_rules_pick_models_by_agent_and_prompt_size():
+    router = ModelRouter()
+
+    assert router.route("gearjs_frontend_agent", 3000, "gpt-4.1") == ("gpt-4.1-mini", "gpt-4.1")
+    assert router.route("sailsjs_frontend_agent", 22000, "gpt-4.1") == ("gpt-4.1", "gpt-4.1-mini")
+    assert router.route("service_smartcontract_agent", 3000, "gpt-4.1") == ("gpt-4.1", "gpt-4.1-mini")
+
+
+def test_fast_tier_prefers_the_fast_model():
+    router = ModelRouter()
+    router_module.begin_request(tier="fast")
+    try:
+        assert router.route("service_smartcontract_agent", 50000, "gpt-4.1")[0] == "gpt-4.1-mini"
+    finally:
+        router_module.begin_request()
+
+
+def test_failing_models_are_tried_last():
+    router = ModelRouter(min_samples=2)
+    for _ in range(2):
+        router._record("gpt-4.1", False, 1.0)
+
+    assert router.route("service_smartcontract_agent", 3000, "gpt-4.1") == ("gpt-4.1-mini", "gpt-4.1")
+
+
+def test_call_falls_back_on_upstream_failure():
+    router = ModelRouter()
+
+    def generate(model):
+        if model == "primary":
+            raise OpenAIServiceError("down", "server_error")
+        return f"answer from {model}"
+
+    assert router.call(("primary", "backup"), generate) == "answer from backup"
+    assert router_module.get_served_model() == "backup"
+    assert router.stats()["primary"]["errors"] == 1
+
+
+def test_client_errors_do_not_fall_back():
+    router = ModelRouter()
+
+    def generate(model):
+        raise OpenAIServiceError("bad request", "client_error")
+
+    with pytest.raises(OpenAIServiceError):
+        router.call(("primary", "backup"), generate)
+    assert "backup" not in router.stats()
+
+
+def test_route_reports_serving_model(llm_stub, client):
+    llm_stub.fail_next(4, status=500)
+
+    response = client.post("/ia/service_smartcontract_agent", json={"question": "Prompt Test"})
+
+    assert response.status_code == 200
+    assert response.headers["X-Model"] == "gpt-4.1-mini"
+    assert [body["model"] for body in llm_stub.requests] == ["gpt-4.1"] * 4 + ["gpt-4.1-mini"]
+
+
+def test_cached_answers_are_kept_per_serving_model(llm_stub, client):
+    response_cache.configure(MemoryCacheBackend(), ttl=60, max_temperature=1.0)
+    try:
+        fast = client.post("/ia/service_smartcontract_agent", json={"question": "Counter"}, headers={"X-Latency-Tier": "fast"})
+        standard = client.post("/ia/service_smartcontract_agent", json={"question": "Counter"})
+        fast_again = client.post("/ia/service_smartcontract_agent", json={"question": "Counter"}, headers={"X-Latency-Tier": "fast"})
+    finally:
+        response_cache.configure(None)
+
+    # The fast model's answer is not served to a standard-tier request
+    assert standard.headers["X-Cache"] == "MISS" and standard.headers["X-Model"] == "gpt-4.1"
+    assert fast_again.headers["X-Cache"] == "HIT" and fast_again.headers["X-Model"] == fast.headers["X-Model"] == "gpt-4.1-mini"
+    assert [body["model"] for body in llm_stub.requests] == ["gpt-4.1-mini", "gpt-4.1"]
@@ -0,0 +1,103 @@
+import pytest
+from flask import Flask
+
+from ia_generator.routes.ia_routes import ia_generator_bp
+from ia_generator.services.near_duplicate_cache import NearDuplicateCache, begin_request, exact_features, minhash, near_duplicate_cache, similarity
+from ia_generator.services.response_cache import MemoryCacheBackend, model_cache_key, response_cache
+
+QUESTION = "Create a counter service with increment and decrement methods that emits an event on every change"
+
+
+@pytest.fixture
+def near_duplicate_client():
+    response_cache.configure(MemoryCacheBackend(), ttl=60, max_temperature=1.0)
+    near_duplicate_cache.configure({"gearhooks_frontend_agent": 0.9})
+    app = Flask(__name__)
+    app.register_blueprint(ia_generator_bp, url_prefix="/ia")
+    yield app.test_client()
+    near_duplicate_cache.configure()
+    response_cache.configure(None)
+
+
+def test_wording_details_do_not_change_the_signature():
+    variant = f"  please, {QUESTION.upper()}!!\n"
+    assert similarity(minhash(QUESTION), minhash(variant)) == 1.0
+    assert similarity(minhash(QUESTION), minhash("Write a staking contract with rewards per epoch")) < 0.5
+
+
+@pytest.mark.parametrize("first, second", [
+    ("Create a token with max supply 1000000", "Create a token with max supply 5000"),
+    ("Create a token where burn is allowed", "Create a token where burn is not allowed"),
+    ("Create a fungible token with 18 decimals", "Create a fungible token with 6 decimals"),
+    ("Add a hook that calls useAccount on mount", "Add a hook that calls useBalance on mount"),
+])
+def test_numbers_negations_and_identifiers_must_match_exactly(first, second):
+    assert exact_features(first) != exact_features(second)
+
+    begin_request()
+    response_cache.configure(MemoryCacheBackend(), ttl=60)
+    try:
+        cache = NearDuplicateCache({"agent": 0.5})
+        cache.resolve("agent", "scope", first, "first", 0.0, "model")
+        response_cache.store(model_cache_key("first", "model"), 0.0, "answer")
+
+        assert cache.resolve("agent", "scope", f"  please, {first}!", "variant", 0.0, "model") == "first"
+        assert cache.resolve("agent", "scope", second, "second", 0.0, "model") == "second"
+    finally:
+        response_cache.configure(None)
+
+
+def test_near_duplicate_is_served_from_cache(llm_stub, near_duplicate_client):
+    first = near_duplicate_client.post("/ia/gearhooks_frontend_agent", json={"question": QUESTION})
+    second = near_duplicate_client.post(
+        "/ia/gearhooks_frontend_agent", json={"question": f"Could you please {QUESTION.lower()}?"}
+    )
+
+    assert first.headers["X-Cache"] == "MISS"
+    assert second.headers["X-Cache"] == "HIT"
+    assert second.headers["X-Cache-Similarity"] == "1.00"
+    assert len(llm_stub.requests) == 1
+    assert near_duplicate_cache.stats()["hits"] == 1
+
+
+def test_different_question_and_agents_without_threshold_miss(llm_stub, near_duplicate_client):
+    near_duplicate_client.post("/ia/gearhooks_frontend_agent", json={"question": QUESTION})
+    other = near_duplicate_client.post(
+        "/ia/gearhooks_frontend_agent", json={"question": "Create a counter service that resets to zero every day"}
+    )
+    near_duplicate_client.post("/ia/sailsjs_frontend_agent", json={"question": QUESTION})
+    variant = near_duplicate_client.post("/ia/sailsjs_frontend_agent", json={"question": f"{QUESTION}."})
+
+    assert other.headers["X-Cache"] == "MISS" and "X-Cache-Similarity" not in other.headers
+    assert variant.headers["X-Cache"] == "MISS"
+    assert len(llm_stub.requests) == 4
+
+
+def test_bypass_header_requires_an_exact_match(llm_stub, near_duplicate_client):
+    near_duplicate_client.post("/ia/gearhooks_frontend_agent", json={"question": QUESTION})
+    response = near_duplicate_client.post(
+        "/ia/gearhooks_frontend_agent",
+        json={"question": f"{QUESTION}, please"},
+        headers={"X-Near-Duplicate-Cache": "off"},
+    )
+
+    assert response.headers["X-Cache"] == "MISS"
+    assert len(llm_stub.requests) == 2
+    assert near_duplicate_cache.stats()["bypassed"] == 1
+
+
+def test_index_evicts_least_recently_used_questions():
+    begin_request()
+    response_cache.configure(MemoryCacheBackend(), ttl=60)
+    try:
+        cache = NearDuplicateCache({"agent": 0.9}, max_entries=2)
+        for key, question in (("a", "first question here"), ("b", "second question here"), ("c", "third question here")):
+            assert cache.resolve("agent", "scope", question, key, 0.0, "model") == key
+            response_cache.store(model_cache_key(key, "model"), 0.0, "answer")
+
+        assert cache.stats()["evictions"] == 1
+        assert cache.resolve("agent", "scope", "First question here!", "a2", 0.0, "model") == "a2"
+        assert cache.resolve("agent", "scope", "Third question here!", "c2", 0.0, "model") == "c"
+        assert cache.resolve("agent", "other scope", "Third question here!", "c3", 0.0, "model") == "c3"
+    finally:
+        response_cache.configure(None)
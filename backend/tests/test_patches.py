@@ -0,0 +1,126 @@
+import pytest
+from flask import Flask
+
+from ia_generator.exceptions.exceptions import PatchError
+from ia_generator.routes.ia_routes import ia_generator_bp
+from ia_generator.utils.patches import apply_patch, parse_patch, unified_diff
+
+SOURCE = """use sails_rs::prelude::*;
+
+pub struct CounterService;
+
+#[service]
+impl CounterService {
+    pub fn increment(&mut self) -> u64 {
+        let state = State::get_mut();
+        state.value += 1;
+        state.value
+    }
+
+    pub fn value(&self) -> u64 {
+        State::get().value
+    }
+}
+"""
+
+PATCH = """<<<<<<< SEARCH
+        state.value += 1;
+=======
+        state.value = state.value.saturating_add(1);
+>>>>>>> REPLACE
+"""
+
+
+@pytest.fixture
+def client():
+    app = Flask(__name__)
+    app.register_blueprint(ia_generator_bp, url_prefix="/ia")
+    return app.test_client()
+
+
+def test_patch_is_applied_and_diffed():
+    patched = apply_patch(SOURCE, parse_patch(f"```\n{PATCH}```"))
+
+    assert "saturating_add(1);" in patched and "+= 1" not in patched
+    assert patched.count("\n") == SOURCE.count("\n")
+    diff = unified_diff(SOURCE, patched)
+    assert diff.startswith("--- a/service.rs\n+++ b/service.rs\n")
+    assert "-        state.value += 1;\n+        state.value = state.value.saturating_add(1);\n" in diff
+
+
+def test_trailing_whitespace_differences_still_apply():
+    patch = "<<<<<<< SEARCH\n    pub fn value(&self) -> u64 {   \n=======\n    pub fn current(&self) -> u64 {\n>>>>>>> REPLACE"
+    assert "pub fn current(&self)" in apply_patch(SOURCE, parse_patch(patch))
+
+
+@pytest.mark.parametrize("patch, error", [
+    ("Here is the whole file", "no SEARCH/REPLACE block"),
+    (f"{PATCH}\n<<<<<<< SEARCH\n    }}\n=======\n", "incomplete"),
+    ("<<<<<<< SEARCH\n    }\n=======\n    };\n>>>>>>> REPLACE", "matches"),
+    ("<<<<<<< SEARCH\n    fn missing() {}\n=======\n>>>>>>> REPLACE", "not in the source"),
+])
+def test_invalid_patches_are_rejected(patch, error):
+    with pytest.raises(PatchError, match=error):
+        apply_patch(SOURCE, parse_patch(patch))
+
+
+def test_patch_mode_returns_file_and_diff(llm_stub, client):
+    llm_stub.answer = PATCH
+    response = client.post("/ia/optimization_smartcontract_agent", json={
+        "question": "Avoid overflows in increment", "mode": "patch", "source": SOURCE,
+    })
+
+    assert response.status_code == 200
+    assert response.json["mode"] == "patch"
+    assert "saturating_add" in response.json["answer"]
+    assert "+        state.value = state.value.saturating_add(1);" in response.json["diff"]
+    assert len(llm_stub.requests) == 1
+    system, user = llm_stub.requests[0]["messages"]
+    assert "SEARCH/REPLACE" in system["content"] and SOURCE in user["content"]
+
+
+def test_patch_that_does_not_apply_falls_back_to_the_whole_file(llm_stub, client):
+    regenerated = SOURCE.replace("+= 1", "= state.value.checked_add(1).expect(\"overflow\")")
+    llm_stub.answer = f"```rust\n{regenerated}```"
+    response = client.post("/ia/optimization_smartcontract_agent", json={
+        "question": "Avoid overflows in increment", "mode": "patch", "source": SOURCE,
+    })
+
+    assert response.json["mode"] == "full"
+    assert "no SEARCH/REPLACE block" in response.json["patch_error"]
+    assert response.json["answer"] == regenerated
+    assert "checked_add" in response.json["diff"]
+    assert len(llm_stub.requests) == 2
+    assert "SEARCH/REPLACE" not in llm_stub.requests[1]["messages"][0]["content"]
+
+
+
+def test_patched_file_goes_through_validation(llm_stub, client):
+    unsafe = PATCH.replace("state.value.saturating_add(1);", "state.value + 1.5 as u64;")
+    repaired = SOURCE.replace("state.value += 1;", "state.value = state.value.saturating_add(1);")
+    llm_stub.answer_next(unsafe, f"```rust\n{repaired}```")
+    response = client.post("/ia/optimization_smartcontract_agent", json={
+        "question": "Avoid overflows in increment", "mode": "patch", "source": SOURCE,
+    })
+
+    assert response.headers["X-Validation"] == "repaired"
+    assert response.json["mode"] == "patch" and response.json["answer"] == repaired
+    assert "saturating_add" in response.json["diff"]
+    assert "floating-point" in llm_stub.requests[1]["messages"][1]["content"]
+
+
+def test_clean_patch_is_reported_clean(llm_stub, client):
+    llm_stub.answer = PATCH
+    response = client.post("/ia/optimization_smartcontract_agent", json={
+        "question": "Avoid overflows in increment", "mode": "patch", "source": SOURCE,
+    })
+
+    assert response.headers["X-Validation"] == "clean"
+    assert len(llm_stub.requests) == 1
+
+def test_patch_mode_is_validated(client):
+    missing_source = client.post("/ia/optimization_smartcontract_agent", json={"question": "q", "mode": "patch"})
+    other_agent = client.post("/ia/gearjs_frontend_agent", json={"question": "q", "mode": "patch", "source": SOURCE})
+
+    assert missing_source.status_code == 400 and "source" in missing_source.json["error"]
+    assert other_agent.status_code == 400
@@ -0,0 +1,21 @@
+import pytest
+from ia_generator.constants import agents
+from ia_generator.utils.preload import preload_agent_corpora
+from ia_generator.utils.utils import build_prompt_prefix
+
+
+def test_preload_reports_every_agent():
+    report = preload_agent_corpora()
+    assert set(report) == set(agents.AGENTS)
+    assert all(entry["bytes"] > 0 for entry in report.values())
+
+
+def test_prefix_is_reused_after_preload():
+    spec = agents.AGENTS["script_server_agent"]
+    assert build_prompt_prefix(spec.prompt, spec.training_path) is build_prompt_prefix(spec.prompt, spec.training_path)
+
+
+def test_preload_fails_fast_on_missing_directory(monkeypatch):
+    monkeypatch.setitem(agents.AGENTS, "ghost_agent", agents.AgentSpec("ghost_agent", "prompt", "does/not/exist", "server"))
+    with pytest.raises(FileNotFoundError):
+        preload_agent_corpora()
@@ -0,0 +1,73 @@
+from unittest.mock import patch
+
+import pytest
+from flask import Flask
+from flask_limiter import Limiter
+from flask_limiter.util import get_remote_address
+
+from ia_generator.routes.ia_routes import ia_generator_bp
+from ia_generator.services.rate_limit import SQLiteStorage, request_cost
+
+
+@pytest.fixture
+def storage_uri(tmp_path):
+    return f"sqlite:///{tmp_path / 'ratelimit.sqlite3'}"
+
+
+@pytest.fixture
+def client(storage_uri):
+    app = Flask(__name__)
+    app.config["RATELIMIT_TOKENS_PER_UNIT"] = 1000
+    limiter = Limiter(
+        get_remote_address,
+        app=app,
+        application_limits=["60/hour"],
+        application_limits_cost=request_cost,
+        storage_uri=storage_uri,
+    )
+    app.register_blueprint(ia_generator_bp, url_prefix="/ia")
+
+    @app.route("/")
+    @limiter.exempt
+    def status():
+        return "ok"
+
+    return app.test_client()
+
+
+def test_counters_are_shared_between_storage_instances(storage_uri):
+    first, second = SQLiteStorage(storage_uri), SQLiteStorage(storage_uri)
+
+    assert first.incr("key", 60, amount=5) == 5
+    assert second.incr("key", 60, amount=2) == 7
+    assert second.get("key") == 7
+    assert first.get_expiry("key") > 0
+
+    first.clear("key")
+    assert second.get("key") == 0
+
+
+def test_expired_window_starts_over(storage_uri):
+    storage = SQLiteStorage(storage_uri)
+    storage.incr("key", -1, amount=5)
+    assert storage.get("key") == 0
+    assert storage.incr("key", 60) == 1
+
+
+@patch("ia_generator.routes.ia_routes.server_agent_handler")
+def test_large_prompts_consume_more_quota(mock_handler, client):
+    mock_handler.return_value = "Mocked response"
+
+    # client_server_agent inlines ~56k tokens of training data, script_server_agent ~3.5k
+    assert client.post("/ia/client_server_agent", json={"question": "q"}).status_code == 200
+    assert client.post("/ia/client_server_agent", json={"question": "q"}).status_code == 429
+    assert client.get("/").status_code == 200
+
+
+@patch("ia_generator.routes.ia_routes.server_agent_handler")
+def test_small_prompts_share_the_quota(mock_handler, client):
+    mock_handler.return_value = "Mocked response"
+
+    statuses = [client.post("/ia/script_server_agent", json={"question": "q"}).status_code for _ in range(16)]
+    assert statuses.count(200) == 15
+    assert statuses[-1] == 429
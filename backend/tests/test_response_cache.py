@@ -0,0 +1,87 @@
+import time
+
+import pytest
+from flask import Flask
+
+from ia_generator.routes.ia_routes import ia_generator_bp
+from ia_generator.services.response_cache import MemoryCacheBackend, SQLiteCacheBackend, configure_response_cache, response_cache
+
+
+@pytest.fixture
+def cached_client():
+    response_cache.configure(MemoryCacheBackend(), ttl=60, max_temperature=1.0)
+    app = Flask(__name__)
+    app.register_blueprint(ia_generator_bp, url_prefix="/ia")
+    yield app.test_client()
+    response_cache.configure(None)
+
+
+def test_memory_backend_evicts_least_recently_used():
+    backend = MemoryCacheBackend(max_entries=2)
+    backend.set("a", "1", ttl=60)
+    backend.set("b", "2", ttl=60)
+    backend.get("a")
+    backend.set("c", "3", ttl=60)
+    assert backend.get("a") == "1"
+    assert backend.get("b") is None
+
+
+def test_memory_backend_honours_ttl_and_size():
+    backend = MemoryCacheBackend(max_bytes=5)
+    backend.set("short", "x", ttl=-1)
+    assert backend.get("short") is None
+    backend.set("a", "123", ttl=60)
+    backend.set("b", "456", ttl=60)
+    assert backend.get("a") is None and backend.get("b") == "456"
+
+
+def test_sqlite_backend_is_shared_and_bounded(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    first = SQLiteCacheBackend(path, max_entries=2)
+    first.set("a", "1", ttl=60)
+    time.sleep(0.01)
+    first.set("b", "2", ttl=60)
+    time.sleep(0.01)
+    first.set("c", "3", ttl=60)
+
+    second = SQLiteCacheBackend(path, max_entries=2)
+    assert second.get("a") is None
+    assert second.get("c") == "3"
+    assert len(second) == 2
+
+
+def test_repeated_question_is_served_from_cache(llm_stub, cached_client):
+    first = cached_client.post("/ia/script_server_agent", json={"question": "Same question"})
+    second = cached_client.post("/ia/script_server_agent", json={"question": "Same question"})
+
+    assert first.headers["X-Cache"] == "MISS"
+    assert second.headers["X-Cache"] == "HIT"
+    assert second.json["answer"] == "Stub answer"
+    assert len(llm_stub.requests) == 1
+
+
+def test_no_cache_header_bypasses(llm_stub, cached_client):
+    cached_client.post("/ia/audit_smartcontract", json={"question": "fn main() {}"})
+    response = cached_client.post(
+        "/ia/audit_smartcontract",
+        json={"question": "fn main() {}"},
+        headers={"Cache-Control": "no-cache"},
+    )
+    assert response.headers["X-Cache"] == "BYPASS"
+    assert len(llm_stub.requests) == 2
+
+
+def test_generated_answers_are_not_cached_by_default(llm_stub):
+    configure_response_cache({"RESPONSE_CACHE_BACKEND": "memory", "RESPONSE_CACHE_MAX_ENTRIES": 8, "RESPONSE_CACHE_MAX_BYTES": 1024})
+    app = Flask(__name__)
+    app.register_blueprint(ia_generator_bp, url_prefix="/ia")
+    client = app.test_client()
+    try:
+        for _ in range(2):
+            client.post("/ia/script_server_agent", json={"question": "Same question"})
+            client.post("/ia/audit_smartcontract", json={"question": "fn main() {}"})
+    finally:
+        response_cache.configure(None)
+
+    # Two generations, one audit
+    assert len(llm_stub.requests) == 3
@@ -0,0 +1,40 @@
+import os
+import pytest
+from ia_generator.utils import retrieval
+from ia_generator.utils.retrieval import BM25Index, select_training_examples, tokenize
+
+
+@pytest.fixture
+def corpus_dir(tmp_path):
+    corpus = tmp_path / "corpus"
+    corpus.mkdir()
+    (corpus / "1.data.txt").write_text("pub fn transfer_tokens(to: ActorId, amount: u128) {}", encoding="utf-8")
+    (corpus / "2.data.txt").write_text("const useProgramQuery = () => program.counter.value();", encoding="utf-8")
+    (corpus / "3.data.txt").write_text("fn mint_nft(owner: ActorId) -> NftId {}", encoding="utf-8")
+    return corpus
+
+
+def test_tokenize_splits_identifiers():
+    terms = tokenize("useProgramQuery transfer_tokens")
+    assert {"useprogramquery", "use", "program", "query", "transfer_tokens", "transfer", "tokens"} <= set(terms)
+
+
+def test_selects_most_relevant_chunk(corpus_dir, tmp_path):
+    text = select_training_examples(str(corpus_dir), "query the program counter", top_k=1, index_dir=str(tmp_path / "idx"))
+    assert "useProgramQuery" in text
+    assert "transfer_tokens" not in text
+
+
+def test_token_budget_limits_selection(corpus_dir, tmp_path):
+    text = select_training_examples(str(corpus_dir), "transfer tokens and mint nft", top_k=3, token_budget=16, index_dir=str(tmp_path / "idx"))
+    assert text.count("fn ") == 1
+
+
+def test_index_is_persisted_and_reused(corpus_dir, tmp_path, monkeypatch):
+    index_dir = tmp_path / "idx"
+    retrieval.get_index(str(corpus_dir), str(index_dir))
+    assert len(os.listdir(index_dir)) == 1
+
+    monkeypatch.setattr(retrieval, "_indexes", {})
+    monkeypatch.setattr(BM25Index, "build", classmethod(lambda cls, *a: pytest.fail("index rebuilt")))
+    assert retrieval.get_index(str(corpus_dir), str(index_dir)).spans
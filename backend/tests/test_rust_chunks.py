@@ -0,0 +1,83 @@
+import pytest
+
+from ia_generator.constants.agents import agent_training_path
+from ia_generator.constants.prompt_templates import SERVICE_SMART_CONTRACT_PROMPT
+from ia_generator.controllers.smart_contract_controller import smart_contract_handler
+from ia_generator.services import auditservice
+from ia_generator.utils.rust_chunks import RustChunker, extract_code, split_rust_code
+
+CONTRACT = """#![no_std]
+use sails_rs::prelude::*;
+
+pub struct Service;
+
+#[service]
+impl Service {
+    pub fn greet(&mut self) -> String {
+        let braces = "}{"; let open = '{';
+        // }
+        String::from(r#"}"#)
+    }
+}
+
+pub struct Program;
+
+#[program]
+impl Program {
+    pub fn new() -> Self { Self }
+}
+"""
+
+
+def test_code_is_split_after_impl_blocks():
+    chunks = split_rust_code(CONTRACT)
+
+    assert len(chunks) == 2
+    assert chunks[0].rstrip().endswith("}") and "impl Service" in chunks[0] and "Program" not in chunks[0]
+    assert chunks[1].strip().startswith("pub struct Program;")
+    assert "".join(chunks) == CONTRACT
+
+
+def test_small_chunks_are_merged_up_to_the_target_size():
+    assert split_rust_code(CONTRACT, chunk_chars=len(CONTRACT)) == [CONTRACT]
+    assert split_rust_code(CONTRACT, chunk_chars=None) == [CONTRACT]
+
+
+def test_streamed_fenced_answer_yields_only_code():
+    answer = f"Here is the contract:\n```rust\n{CONTRACT}```\nLet me know if you need more."
+    chunker = RustChunker()
+    chunks = []
+    for start in range(0, len(answer), 5):
+        chunks.extend(chunker.feed(answer[start:start + 5]))
+    chunks.extend(chunker.close())
+
+    assert chunker.clean and chunker.fenced
+    assert "".join(chunks) == CONTRACT == extract_code(answer)
+
+
+def test_several_code_blocks_are_not_chunked():
+    chunker = RustChunker()
+    chunker.split(f"```rust\n{CONTRACT}```\n\n```rust\n{CONTRACT}```\n")
+
+    assert not chunker.clean
+    assert extract_code(f"```rust\n{CONTRACT}```\n```toml\n[lib]\n```\n") is None
+
+
+@pytest.fixture
+def chunk_every_impl(monkeypatch):
+    monkeypatch.setitem(auditservice._chunking, "chunk_chars", 0)
+
+
+def test_generated_contract_is_audited_in_parallel_chunks(llm_stub, chunk_every_impl):
+    llm_stub.answer = CONTRACT
+
+    answer = smart_contract_handler(SERVICE_SMART_CONTRACT_PROMPT, agent_training_path("service_smartcontract_agent"), "Greeter", audit=True)
+
+    generation, *audits = llm_stub.requests
+    assert generation["stream"] is True
+    assert len(audits) == 2
+    audited_code = sorted(request["messages"][-1]["content"] for request in audits)
+    assert "impl Program" in audited_code[0] and "impl Service" not in audited_code[0]
+    assert "impl Service" in audited_code[1] and "impl Program" not in audited_code[1]
+    # The stub answers every audit with the whole contract; both answers are joined
+    assert answer == f"{CONTRACT.strip()}\n\n{CONTRACT.strip()}"
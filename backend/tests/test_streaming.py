@@ -0,0 +1,54 @@
+import json
+
+import pytest
+from flask import Flask
+
+from ia_generator.routes.ia_routes import ia_generator_bp
+
+
+@pytest.fixture
+def client():
+    app = Flask(__name__)
+    app.register_blueprint(ia_generator_bp, url_prefix="/ia")
+    return app.test_client()
+
+
+def parse_events(body: str) -> list:
+    events = []
+    for block in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.split("\n"))
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+def test_agent_streams_tokens_then_usage(llm_stub, client):
+    llm_stub.answer = "fn main() {}"
+    response = client.post("/ia/script_server_agent?stream=1", json={"question": "Prompt Test"})
+
+    assert response.status_code == 200
+    assert response.mimetype == "text/event-stream"
+    events = parse_events(response.get_data(as_text=True))
+    assert "".join(data["delta"] for event, data in events if event == "token") == "fn main() {}"
+    assert events[-1][0] == "done"
+    assert events[-1][1]["usage"]["prompt_tokens"] == 10
+    assert llm_stub.requests[0]["stream"] is True
+
+
+def test_audit_streams_with_accept_header(llm_stub, client):
+    response = client.post(
+        "/ia/audit_smartcontract",
+        json={"question": "fn main() {}"},
+        headers={"Accept": "text/event-stream"},
+    )
+    events = parse_events(response.get_data(as_text=True))
+    assert [event for event, _ in events] == ["token", "token", "done"]
+
+
+def test_upstream_failure_becomes_error_event(llm_stub, client, monkeypatch):
+    monkeypatch.setenv("OPENAI_BASE_URL", "http://127.0.0.1:9/v1")
+    from ia_generator.services.llm_services import reset_openai_clients
+    reset_openai_clients()
+
+    response = client.post("/ia/script_server_agent?stream=1", json={"question": "Prompt Test"})
+    events = parse_events(response.get_data(as_text=True))
+    assert events[-1][0] == "error"
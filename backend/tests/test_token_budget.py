@@ -0,0 +1,61 @@
+import pytest
+from flask import Flask
+
+from ia_generator.exceptions.exceptions import PromptBudgetError
+from ia_generator.routes.ia_routes import ia_generator_bp
+from ia_generator.utils import token_budget
+from ia_generator.utils.token_budget import TokenCounter, account_prompt
+
+
+@pytest.fixture(autouse=True)
+def reset_budgets():
+    yield
+    token_budget.configure_token_budgets()
+
+
+def test_estimator_counts_words_and_punctuation():
+    counter = TokenCounter()
+    assert counter.count("fn main() {}") == 6
+    assert counter.count("transfer") == 2
+
+
+def test_only_templates_and_corpora_are_memoized():
+    counter = TokenCounter(memo_entries=2)
+    counter.count("a user question " * 100)
+    assert counter.count_corpus((("1.data.txt", "fn main() {}"),), "fp1") == {"1.data.txt": 6}
+    # Same fingerprint: the memoized counts are reused without looking at the documents
+    assert counter.count_corpus((), "fp1") == {"1.data.txt": 6}
+    counter.count_template("template")
+    counter.count_template("another template")
+
+    # The question was never kept, and the corpus was evicted by the two templates
+    assert [kind for kind, _ in counter._memo] == ["template", "template"]
+    assert counter.count_corpus((), "fp1") == {}
+
+
+def test_lowest_priority_files_are_trimmed_first():
+    documents = (("10.data.txt", "word " * 100), ("2.data.txt", "word " * 100), ("1.data.txt", "word " * 100))
+    kept, accounting = account_prompt("agent", "template", documents, "question", budget=250)
+
+    assert accounting["trimmed_files"] == ["10.data.txt"]
+    assert [filename for filename, _ in kept] == ["2.data.txt", "1.data.txt"]
+    assert accounting["total_tokens"] <= 250
+
+
+def test_prompt_without_room_for_question_is_rejected():
+    with pytest.raises(PromptBudgetError):
+        account_prompt("agent", "template " * 50, (), "question", budget=20)
+
+
+def test_route_reports_prompt_tokens_and_rejects_over_budget(llm_stub):
+    app = Flask(__name__)
+    app.register_blueprint(ia_generator_bp, url_prefix="/ia")
+    client = app.test_client()
+
+    response = client.post("/ia/script_server_agent", json={"question": "Counter"})
+    assert int(response.headers["X-Prompt-Tokens"]) > 1000
+    assert token_budget.prompt_stats.snapshot()["script_server_agent"]["requests"] >= 1
+
+    token_budget.configure_token_budgets(agents={"script_server_agent": 10})
+    response = client.post("/ia/script_server_agent", json={"question": "Counter"})
+    assert response.status_code == 413
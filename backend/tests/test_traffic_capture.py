@@ -0,0 +1,93 @@
+import pytest
+from flask import Flask
+
+from benchmarks.replay import ReplayLLMServer, compare_reports, load_records, run_replay
+from ia_generator.routes.ia_routes import ia_generator_bp
+from ia_generator.services.llm_services import reset_openai_clients
+from ia_generator.utils.traffic_capture import TrafficCapture, capture_files, read_capture, traffic_capture
+
+
+@pytest.fixture
+def capture_path(tmp_path):
+    path = str(tmp_path / "capture.jsonl")
+    traffic_capture.configure(path)
+    yield path
+    traffic_capture.configure()
+
+
+@pytest.fixture
+def client():
+    app = Flask(__name__)
+    app.register_blueprint(ia_generator_bp, url_prefix="/ia")
+    return app.test_client()
+
+
+def test_posts_are_captured_with_upstream_timings(llm_stub, client, capture_path):
+    llm_stub.delay = 0.05
+    client.post("/ia/script_server_agent", json={"question": "Deploy script"}, headers={"X-Latency-Tier": "fast"})
+    client.post("/ia/script_server_agent?stream=1", json={"question": "Streamed script"}).get_data()
+    client.get("/ia/response_cache")
+
+    buffered, streamed = read_capture(capture_path)
+
+    assert buffered["route"] == buffered["agent"] == "script_server_agent"
+    assert buffered["request"] == {"question": "Deploy script"}
+    assert buffered["headers"] == {"X-Latency-Tier": "fast"}
+    assert buffered["status"] == 200 and buffered["prompt_tokens"] > 0 and buffered["model"]
+    assert buffered["response"] == {"question": "Deploy script", "answer": "Stub answer"}
+    assert len(buffered["upstream_ms"]) == 1 and buffered["upstream_ms"][0] >= 50
+    assert buffered["latency_ms"] >= buffered["upstream_ms"][0]
+    assert streamed["stream"] is True
+    assert streamed["response"] == {"answer": "Stub answer"}
+    assert len(streamed["upstream_ms"]) == 1
+    assert traffic_capture.stats()["records"] == 2
+
+
+def test_log_rotates_into_gzipped_segments(tmp_path):
+    path = str(tmp_path / "capture.jsonl")
+    capture = TrafficCapture(path, max_bytes=200, backups=2)
+    for index in range(20):
+        capture.append({"ts": index, "request": {"question": "x" * 40}})
+
+    assert [name.rsplit("/", 1)[-1] for name in capture_files(path)] == ["capture.jsonl.2.gz", "capture.jsonl.1.gz", "capture.jsonl"]
+    kept = [record["ts"] for record in read_capture(path)]
+    assert kept == list(range(20 - len(kept), 20))
+    assert capture.stats()["rotations"] > 2
+
+
+def test_replay_upstream_reproduces_recorded_calls():
+    records = [
+        {"ts": 1, "route": "script_server_agent", "request": {"question": "Deploy"}, "upstream_ms": [300, 500], "response": {"answer": "fn deploy()"}},
+        {"ts": 2, "route": "batch", "request": {"items": [{"agent": "a", "question": "One"}, {"agent": "a", "question": "Two"}]},
+         "upstream_ms": [100, 200], "response": {"results": [{"index": 0, "answer": "1"}, {"index": 1, "answer": "2"}]}},
+    ]
+    upstream = ReplayLLMServer(records, latency_scale=0.5)
+    try:
+        prompt = {"messages": [{"role": "system", "content": "..."}, {"role": "user", "content": "Review this: Deploy"}]}
+
+        assert upstream.answer_for(prompt) == "fn deploy()"
+        assert [upstream.delay_for(prompt) for _ in range(3)] == [0.15, 0.25, 0.2]
+        assert upstream.delay_for({"messages": [{"role": "user", "content": "Two"}]}) == 0.1
+        assert upstream.answer_for({"messages": [{"role": "user", "content": "Unknown"}]}) == "Stub answer"
+    finally:
+        upstream._server.server_close()
+
+
+def test_replay_drives_the_app_and_compares_builds(llm_stub, client, capture_path, monkeypatch):
+    llm_stub.answer = "Recorded answer"
+    for question in ("First", "Second", "Third"):
+        client.post("/ia/script_server_agent", json={"question": question})
+    traffic_capture.configure()
+
+    monkeypatch.setenv("OPENAI_BASE_URL", "")
+    try:
+        report = run_replay(capture_path, speed=0, latency_scale=0, concurrency=2, config_name="testing")
+    finally:
+        reset_openai_clients()
+
+    assert len(load_records(capture_path)) == report["records"] == 3
+    assert report["total"]["requests"] == 3 and report["total"]["errors"] == 0
+    assert report["upstream_requests"] == report["upstream_matched"] == 3
+    assert report["recorded"]["routes"]["script_server_agent"]["requests"] == 3
+    comparison = compare_reports(report, report)
+    assert comparison["total"]["p95_ms"]["change_pct"] == 0
@@ -0,0 +1,99 @@
+import time
+
+import pytest
+from flask import Flask
+
+from ia_generator.exceptions.exceptions import OpenAIServiceError
+from ia_generator.routes.ia_routes import ia_generator_bp
+from ia_generator.services.llm_services import generate_openai_chat_response, stream_openai_chat_response
+
+
+@pytest.fixture
+def sleeps(fresh_upstream_policy):
+    recorded = []
+    fresh_upstream_policy.sleep = recorded.append
+    return recorded
+
+
+def test_server_errors_are_retried(llm_stub, sleeps):
+    llm_stub.fail_next(2, status=500)
+
+    assert generate_openai_chat_response("question") == "Stub answer"
+    assert len(llm_stub.requests) == 3
+    assert len(sleeps) == 2
+
+
+def test_retry_after_is_honoured(llm_stub, sleeps):
+    llm_stub.fail_next(1, status=429, retry_after=2)
+
+    assert generate_openai_chat_response("question") == "Stub answer"
+    assert sleeps == [2.0]
+
+
+def test_client_errors_are_not_retried(llm_stub, sleeps):
+    llm_stub.fail_next(1, status=400)
+
+    with pytest.raises(OpenAIServiceError) as error:
+        generate_openai_chat_response("question")
+    assert error.value.cause == "client_error"
+    assert len(llm_stub.requests) == 1
+
+
+def test_circuit_opens_and_fails_fast(llm_stub, fresh_upstream_policy):
+    fresh_upstream_policy.configure(max_retries=0, failure_threshold=2, reset_timeout=60)
+    llm_stub.fail_next(2, status=503)
+
+    for _ in range(2):
+        with pytest.raises(OpenAIServiceError):
+            generate_openai_chat_response("question")
+    with pytest.raises(OpenAIServiceError) as error:
+        generate_openai_chat_response("question")
+
+    assert error.value.cause == "circuit_open"
+    assert len(llm_stub.requests) == 2
+    assert fresh_upstream_policy.stats()["state"] == "open"
+
+
+def test_half_open_probe_closes_the_circuit(llm_stub, fresh_upstream_policy):
+    fresh_upstream_policy.configure(max_retries=0, failure_threshold=1, reset_timeout=0)
+    llm_stub.fail_next(1, status=500)
+
+    with pytest.raises(OpenAIServiceError):
+        generate_openai_chat_response("question")
+    assert generate_openai_chat_response("question") == "Stub answer"
+    assert fresh_upstream_policy.stats()["state"] == "closed"
+
+
+def test_deadline_bounds_slow_upstream(llm_stub, fresh_upstream_policy):
+    fresh_upstream_policy.configure(timeout=0.2, deadline=0.5, backoff_base=0.01)
+    fresh_upstream_policy.sleep = time.sleep
+    llm_stub.delay = 1.0
+
+    start = time.monotonic()
+    with pytest.raises(OpenAIServiceError) as error:
+        generate_openai_chat_response("question")
+
+    assert error.value.cause == "timeout"
+    assert time.monotonic() - start < 1.0
+
+
+def test_stream_opening_is_retried(llm_stub, sleeps):
+    llm_stub.fail_next(1, status=502)
+
+    events = list(stream_openai_chat_response("question"))
+    assert events[-1][0] == "done"
+    assert len(llm_stub.requests) == 2
+
+
+def test_open_circuit_maps_to_503(llm_stub, fresh_upstream_policy):
+    fresh_upstream_policy.configure(max_retries=0, failure_threshold=1, reset_timeout=60)
+    # The audit model and its fallback both fail once, which opens both circuits
+    llm_stub.fail_next(2, status=500)
+    app = Flask(__name__)
+    app.register_blueprint(ia_generator_bp, url_prefix="/ia")
+    client = app.test_client()
+
+    assert client.post("/ia/audit_smartcontract", json={"question": "fn main() {}"}).status_code == 500
+    response = client.post("/ia/audit_smartcontract", json={"question": "fn main() {}"})
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "30"
@@ -0,0 +1,10 @@
+"""
+WSGI entry point for production servers, e.g. `gunicorn -c gunicorn.conf.py wsgi:app`.
+
+Defaults to the production config unless FLASK_ENV says otherwise.
+"""
+import os
+
+os.environ.setdefault("FLASK_ENV", "production")
+
+from index import app  # noqa: E402